@@ -0,0 +1,164 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from collections import OrderedDict
+import re
+
+import git
+
+
+# Past this many entries, the rest are only counted.
+MAX_ENTRIES = 500
+
+MERGE_SUBJECTS = [
+    re.compile(r"^Merge pull request #\d+ from [^/\s]+/(?P<branch>\S+)"),
+    re.compile(r"^Merge (?:remote-tracking )?branch '(?P<branch>[^']+)'"),
+]
+ISSUE_REFERENCE = re.compile(r'#(\d+)\b')
+ISSUE_BRANCH = re.compile(r'^(\d+)(?:[-_](.*))?$')
+
+FEATURES = 'Features'
+OTHER = 'Other changes'
+
+
+def previous_tag(repo, rev):
+    """The most recent tag rev's history contains, if there is one."""
+    try:
+        return repo.git.describe(str(rev), tags=True, abbrev=0)
+    except git.GitCommandError:
+        return None
+
+
+def first_parent_log(repo, revision_range):
+    """Streams (parents, subject) for the commits on revision_range's mainline.
+
+    git's output is read a line at a time, so memory use doesn't grow with
+    the size of the range.
+    """
+    process = repo.git.log(
+        revision_range,
+        first_parent=True,
+        format='%P%x09%s',
+        as_process=True,
+    )
+    for line in process.stdout:
+        parents, _, subject = line.rstrip('\n').partition('\t')
+        yield parents.split(), subject
+    process.wait()
+
+
+class Changelog(object):
+    """Commits grouped by the issue they're for, or the feature they merged.
+
+    Merges of a feature branch stand in for the commits they bring along;
+    commits that mention an issue (#12) are filed under it. Merges of the
+    trunk branches (ignore) are left out.
+    """
+
+    def __init__(self, prefixes=(), ignore=(), limit=MAX_ENTRIES):
+        self.prefixes = [p for p in prefixes if p]
+        self.ignore = set(ignore)
+        self.limit = limit
+        self.groups = OrderedDict()
+        self.count = 0
+        self.dropped = 0
+
+    def _branch_entry(self, branch):
+        for prefix in self.prefixes:
+            if branch.startswith(prefix):
+                name = branch[len(prefix):]
+                break
+        else:
+            if branch.split('/')[-1] in self.ignore:
+                return None, None
+            name = branch.split('/')[-1]
+
+        match = ISSUE_BRANCH.match(name)
+        if match:
+            title = (match.group(2) or '').replace('-', ' ').replace('_', ' ')
+            return int(match.group(1)), "{} ({})".format(title or name, branch)
+
+        return None, "{} ({})".format(name.replace('-', ' ').replace('_', ' '), branch)
+
+    def add(self, parents, subject):
+        entry = subject
+        issue = None
+        group = OTHER
+
+        if len(parents) > 1:
+            branch = None
+            for pattern in MERGE_SUBJECTS:
+                match = pattern.match(subject)
+                if match:
+                    branch = match.group('branch')
+                    break
+
+            if branch is not None:
+                issue, entry = self._branch_entry(branch)
+                if entry is None:
+                    return
+                group = FEATURES
+
+        else:
+            match = ISSUE_REFERENCE.search(subject)
+            if match:
+                issue = int(match.group(1))
+
+        if issue is not None:
+            group = issue
+
+        self.count += 1
+        if self.count > self.limit:
+            self.dropped += 1
+            return
+
+        self.groups.setdefault(group, []).append(entry)
+
+    def render(self, since=None):
+        if not self.count:
+            return ""
+
+        lines = ["Changes since {}:".format(since) if since else "Changes:"]
+        issues = sorted(g for g in self.groups if not isinstance(g, basestring))
+        for group in issues + [FEATURES, OTHER]:
+            if group not in self.groups:
+                continue
+            lines += [""]
+            lines += ["Issue #{}".format(group) if group in issues else group]
+            # git log is newest-first; changelogs read better oldest-first.
+            lines += [" - {}".format(e) for e in reversed(self.groups[group])]
+
+        if self.dropped:
+            lines += ["", "...and {} more".format(self.dropped)]
+
+        return "\n".join(lines)
+
+
+def changelog(repo, branch, prefixes=(), ignore=()):
+    """A changelog of branch's work since the last tag it contains."""
+    since = previous_tag(repo, branch)
+    revision_range = "{}..{}".format(since, branch) if since else str(branch)
+
+    log = Changelog(prefixes, ignore)
+    for parents, subject in first_parent_log(repo, revision_range):
+        log.add(parents, subject)
+
+    return log.render(since)
@@ -23,12 +23,18 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 import argparse
 import argcomplete
 import git
-import os
+import json
 import subprocess
+import sys
 import tempfile
 
 from engine import Engine
+from events import JSONLinesRenderer, TextRenderer
+from hooks import HookContext
 from managers import TagInfo
+from multi import report, run_multi
+from profiling import PROFILE_PATH, Profile, profile_option
+from train import run_train
 
 
 __version__ = "0.6.2"
@@ -38,30 +44,111 @@ def future_proof_print(x):
     print(x)
 
 
-def do_hook(args, engine, hook_name, *hook_args):
+def do_hook(args, engine, hook_name, *hook_args, **context):
+    """Runs the hooks for hook_name; returns whether flowhub should carry on.
+
+    context may give the branch and tag the hook is about; the branch
+    defaults to the checked-out one.
+    """
     if args.no_verify:
         return True
 
-    try:
-        hook_args = tuple(str(a) for a in hook_args)
-        subprocess.check_call((os.path.join(engine._repo.git_dir, 'hooks', hook_name),) + hook_args)
-        return True
-    except OSError as e:
+    hooks = engine.hooks
+    if not hooks.defines(hook_name):
         if args.verbosity > 2:
             print "No such hook: {}".format(hook_name)
-            print "({})".format(e)
         return True
-    except subprocess.CalledProcessError:
+
+    branch = context.get('branch')
+    if branch is None:
+        try:
+            branch = engine._repo.head.reference.name
+        except TypeError:
+            # detached HEAD
+            pass
+
+    return hooks.run(HookContext(
+        name=hook_name,
+        args=tuple(str(a) for a in hook_args),
+        branch=branch,
+        tag=context.get('tag'),
+        summary=engine.summary,
+        engine=engine,
+    ))
+
+
+def interrupted(args, log):
+    """Whether there's an unfinished publish in log that we weren't asked to
+    resume, or to give up on and start over (--restart)."""
+    if not log.started or args.resume:
+        return False
+
+    if args.restart:
+        log.finish()
+        print "Gave up the interrupted publish of {}; starting over.".format(log.branch)
         return False
 
+    print (
+        "Publishing {} was interrupted {}.\n"
+        "Publish again with --resume to pick up where it left off, or with\n"
+        "--restart to start over (say, after a `git merge --abort`).\n"
+        "Its progress is kept in {}."
+    ).format(
+        log.branch,
+        "after '{}'".format(log.last_step) if log.last_step else "before any step completed",
+        log.path,
+    )
+    return True
+
+
+def version_name(args, engine, input_func, kind, part):
+    """The name (and tag) for a new release or hotfix.
+
+    That's args.name, or else the next version - bumping part of the
+    latest one - unless the user picks another. Returns None, having said
+    why, if the name's already tagged.
+    """
+    index = engine.tag_index
+    name = args.name
+    if name is None:
+        suggestions = index.suggestions()
+        print "Latest version: {}; next {}".format(
+            index.latest() or "(none)",
+            ", ".join("{} {}".format(p, version) for p, version in suggestions),
+        )
+        default = dict(suggestions)[part]
+        name = input_func("{} name [{}]: ".format(kind, default)) or default
+
+    if index.taken(name):
+        print "{} has already been tagged; please pick another name.".format(name)
+        return None
+
+    return name
+
 
-def create_tag_info(args, input_func, default_label=""):
+def publish_tag_info(args, engine, input_func, log, default_label="", template=""):
+    """The tag for a publish: the one it was first given, if it's being resumed.
+
+    Returns None, having said why, if the label's already tagged.
+    """
+    if args.resume and log.started and log.tag_info:
+        return TagInfo(*log.tag_info)
+
+    tag_info = create_tag_info(args, input_func, default_label, template=template)
+    if engine.tag_index.taken(tag_info.label):
+        print "{} has already been tagged; please pick another label.".format(tag_info.label)
+        return None
+
+    return tag_info
+
+
+def create_tag_info(args, input_func, default_label="", template=""):
     label = input_func("Tag Label [{}]: ".format(default_label)) or default_label
 
     # Open the $EDITOR, if you can...
     descr_f = tempfile.NamedTemporaryFile(delete=False)
     descr_f.file.write(
-        "\n\n# Write the tag description above"
+        template + "\n\n# Write the tag description above"
     )
     if args.verbosity > 3:
         print "Temp file: ", descr_f.name
@@ -89,13 +176,13 @@ def create_tag_info(args, input_func, default_label=""):
         if body[-1].startswith('# Write the tag description'):
             body = body[:-1]
 
-        body = " ".join(body)
+        body = "\n".join(line.rstrip("\n") for line in body)
 
         fnew.close()
     else:
         body = input_func(
             "Tag message:\n"
-        )
+        ) or template
 
     return TagInfo(label.strip(), body.strip())
 
@@ -161,20 +248,37 @@ def handle_feature_call(args, engine):
             engine.work_feature(issue=args.identifier)
 
     elif args.action == 'publish':
-        if not do_hook(args, engine, "pre-feature-publish"):
+        branch = None
+        if args.name:
+            branch = "{}{}".format(engine.feature_manager._prefix, args.name)
+        if not do_hook(args, engine, "pre-feature-publish", branch=branch):
             return False
         engine.publish_feature(name=args.name)
 
+    elif args.action == 'bulk-publish':
+        if not do_hook(args, engine, "pre-feature-publish"):
+            return False
+        for result in engine.publish_features(names=args.names):
+            print json.dumps(result, sort_keys=True)
+
     elif args.action == 'abandon':
         engine.abandon_feature(
             name=args.name,
         )
 
     elif args.action == 'accepted':
-        engine.accept_feature(
-            name=args.name,
-            delete_feature_branch=(not args.no_delete),
-        )
+        if args.merged:
+            if args.name:
+                print "Give a feature name or --merged, not both."
+                return False
+            engine.accept_merged_features(
+                delete_feature_branches=(not args.no_delete),
+            )
+        else:
+            engine.accept_feature(
+                name=args.name,
+                delete_feature_branch=(not args.no_delete),
+            )
 
     elif args.action == 'list':
         engine.list_features()
@@ -187,27 +291,41 @@ def handle_hotfix_call(args, engine, input_func=raw_input):
         print "handling hotfix"
 
     if args.action == 'start':
+        name = version_name(args, engine, input_func, "Hotfix", 'patch')
+        if name is None:
+            return False
+
         engine.start_hotfix(
-            name=args.name,
+            name=name,
             issues=args.issue_numbers,
         )
-        do_hook(args, engine, "post-hotfix-start", args.name)
+        do_hook(args, engine, "post-hotfix-start", name)
     elif args.action == 'publish':
         if not engine.hotfix:
             return False
 
-        if not do_hook(args, engine, "pre-hotfix-publish"):
+        log = engine.publish_log(engine.hotfix)
+        if interrupted(args, log):
+            return False
+
+        if not do_hook(args, engine, "pre-hotfix-publish", branch=engine.hotfix.name):
             return False
 
         default_tag = engine.hotfix.name.replace(
             engine.hotfix_manager._prefix, ""
         )
+        tag_info = publish_tag_info(
+            args, engine, input_func, log, default_tag, template=engine.changelog(engine.hotfix),
+        )
+        if tag_info is None:
+            return False
         results = engine.publish_hotfix(
             name=args.name,
-            tag_info=create_tag_info(args, input_func, default_tag),
+            tag_info=tag_info,
+            resume=args.resume,
         )
 
-        do_hook(args, engine, "post-hotfix-publish", results)
+        do_hook(args, engine, "post-hotfix-publish", results, tag=tag_info.label)
 
     elif args.action == 'contribute':
         engine.contribute_hotfix()
@@ -220,27 +338,44 @@ def handle_release_call(args, engine, input_func=raw_input):
         print "handling release"
 
     if args.action == 'start':
+        name = version_name(args, engine, input_func, "Release", 'minor')
+        if name is None:
+            return False
+
         engine.start_release(
-            name=args.name,
+            name=name,
         )
-        do_hook(args, engine, "post-release-start", args.name)
+        do_hook(args, engine, "post-release-start", name)
 
     elif args.action == 'publish':
         if not engine.release:
             return False
 
-        if not do_hook(args, engine, "pre-release-publish"):
+        log = engine.publish_log(engine.release)
+        if interrupted(args, log):
+            return False
+
+        if not do_hook(args, engine, "pre-release-publish", branch=engine.release.name):
             return False
 
         default_tag = engine.release.name.replace(
             engine.release_manager._prefix, ""
         )
+        template = engine.changelog(engine.release)
+        if args.pr_notes:
+            template = "\n\n".join(t for t in (template, engine.release_notes(engine.release)) if t)
+        tag_info = publish_tag_info(
+            args, engine, input_func, log, default_tag, template=template,
+        )
+        if tag_info is None:
+            return False
         results = engine.publish_release(
             name=args.name,
-            tag_info=create_tag_info(args, input_func, default_tag),
+            tag_info=tag_info,
             with_delete=(not args.no_cleanup),
+            resume=args.resume,
         )
-        do_hook(args, engine, "post-release-publish", results)
+        do_hook(args, engine, "post-release-publish", results, tag=tag_info.label)
 
     elif args.action == 'contribute':
         engine.contribute_release()
@@ -287,14 +422,66 @@ def handle_issue_call(args, engine):
         )
 
 
-def run():
+def handle_sync_call(args, engine):
+    if args.verbosity > 2:
+        print "handling sync call"
+
+    return engine.sync()
+
+
+def handle_multi_call(args):
+    if args.verbosity > 2:
+        print "handling multi call"
+
+    if not args.command:
+        print "Please give a flowhub command to run in each repository."
+        return False
+
+    results = run_multi(args.manifest, args.command, jobs=args.jobs)
+    print report(args.command, results)
+    return all(r.ok for r in results)
+
+
+def handle_train_call(args):
+    if args.verbosity > 2:
+        print "handling train call"
+
+    results, checked = run_train(
+        args.manifest,
+        jobs=args.jobs,
+        message=args.message,
+        with_delete=(not args.no_cleanup),
+        no_verify=args.no_verify,
+    )
+    print report(['train', args.manifest], results)
+    if not checked:
+        print "\nNot every repository is ready, so nothing was published."
+    return checked and all(r.ok for r in results)
+
+
+def run(argv=None, sessions=None):
+    argv, profile_path = profile_option(sys.argv[1:] if argv is None else argv)
+    if profile_path is None:
+        return run_command(argv, sessions)
+
+    profile = Profile(profile_path)
+    with profile:
+        result = run_command(argv, sessions)
+    print "\nProfile written to {} (pstats) and {} (trace)".format(
+        profile.path, profile.trace_path,
+    )
+    return result
+
+
+def run_command(argv=None, sessions=None):
     parser = argparse.ArgumentParser()
     try:
         offline_engine = Engine(debug=0, offline=True)
         repo =  git.Repo()
 
         FEATURE_PREFIX = offline_engine._cr.flowhub.prefix.feature
-    except AttributeError:
+    except (AttributeError, git.InvalidGitRepositoryError):
+        # not in a flowhub repository; `flowhub multi` runs from anywhere.
         offline_engine = None
 
     parser.add_argument('-v', '--verbosity', action="store", type=int, default=0)
@@ -302,6 +489,18 @@ def run():
         help='do not talk to GitHub',)
     parser.add_argument('--no-verify', action='store_true', default=False,
         help='do not call any hooks',)
+    parser.add_argument('--stats', action='store_const', const='text',
+        dest='stats', default=None,
+        help='report the GitHub requests made, after the summary',)
+    parser.add_argument('--stats-json', action='store_const', const='json',
+        dest='stats',
+        help='report the GitHub requests made, as json',)
+    parser.add_argument('--output', choices=['text', 'jsonl'], default='text',
+        help='how to report what was done: a summary at the end (text), or '
+        'a line of json as each step finishes (jsonl)',)
+    parser.add_argument('--profile', metavar='PATH', nargs='?', const=PROFILE_PATH,
+        help='profile the command, writing pstats to PATH (default {}) and '
+        'a trace for speedscope or chrome://tracing next to it'.format(PROFILE_PATH),)
     parser.add_argument('--version', action='version',
         version=('flowhub v{}'.format(__version__)))
 
@@ -318,6 +517,14 @@ def run():
         help="do repository-cleanup related things",)
     issue = subparsers.add_parser('issue',
         help="do issue-related things",)
+    subparsers.add_parser('status',
+        help="show how far each branch is ahead of and behind develop (or master)",)
+    subparsers.add_parser('sync',
+        help="replay everything that was recorded while offline",)
+    multi = subparsers.add_parser('multi',
+        help="run a flowhub command in many repositories at once",)
+    train = subparsers.add_parser('train',
+        help="publish the releases of many repositories, in dependency order",)
 
     #
     # Features
@@ -357,6 +564,17 @@ def run():
                 if branch.name.startswith(FEATURE_PREFIX)],
         )
 
+    fbulk = feature_subs.add_parser('bulk-publish',
+        help="publish many features at once, opening any missing pull-requests")
+    fbulk_names = fbulk.add_argument('names', nargs='*',
+        help='names of the features to publish. If none are given, publishes every feature',
+    )
+    if offline_engine is not None:
+        fbulk_names.completer = argcomplete.completers.ChoicesCompleter(
+            [branch.name.split(FEATURE_PREFIX)[1] for branch in repo.branches
+                if branch.name.startswith(FEATURE_PREFIX)],
+        )
+
     fabandon = feature_subs.add_parser('abandon',
         help="remove a feature branch completely"
     )
@@ -384,6 +602,8 @@ def run():
 
     faccepted.add_argument('--no-delete', action='store_true', default=False,
         help="don't delete the accepted feature branch")
+    faccepted.add_argument('--merged', action='store_true', default=False,
+        help="accept every feature branch already merged into the trunk")
     feature_subs.add_parser('list',
         help='list the feature names on this repository')
 
@@ -394,8 +614,8 @@ def run():
 
     hstart = hotfix_subs.add_parser('start',
         help="start a new hotfix branch")
-    hstart.add_argument('name',
-        help="name (and tag) for the hotfix")
+    hstart.add_argument('name', nargs='?',
+        help="name (and tag) for the hotfix. If not given, suggests the next version.")
     hstart.add_argument('--issue-numbers', '-i', type=int,
         default=None, nargs='+',
         help="specifies the issues this hotfix addresses")
@@ -403,6 +623,15 @@ def run():
         help="publish the hotfix to production and trunk")
     hpublish.add_argument('name', nargs='?',
         help="name of hotfix to publish. If not given, uses current branch.")
+    hpublish_log = hpublish.add_mutually_exclusive_group()
+    hpublish_log.add_argument('--resume', action='store_true',
+        default=False,
+        help="pick up an interrupted publish where it left off",
+    )
+    hpublish_log.add_argument('--restart', action='store_true',
+        default=False,
+        help="give up an interrupted publish, and start it over",
+    )
     hotfix_subs.add_parser('contribute',
         help='send this branch as a pull request to the current hotfix')
     #
@@ -412,7 +641,8 @@ def run():
 
     rstart = release_subs.add_parser('start',
         help="start a new release branch")
-    rstart.add_argument('name', help="name (and tag) of the release branch.")
+    rstart.add_argument('name', nargs='?',
+        help="name (and tag) of the release branch. If not given, suggests the next version.")
 
     release_subs.add_parser('stage',
         help="send a release branch to a staging environment")
@@ -425,6 +655,19 @@ def run():
         default=False,
         help="do not delete the release branch after a successful publish",
     )
+    rpublish.add_argument('--pr-notes', action='store_true',
+        default=False,
+        help="add the pull-requests merged since the last release to the tag message",
+    )
+    rpublish_log = rpublish.add_mutually_exclusive_group()
+    rpublish_log.add_argument('--resume', action='store_true',
+        default=False,
+        help="pick up an interrupted publish where it left off",
+    )
+    rpublish_log.add_argument('--restart', action='store_true',
+        default=False,
+        help="give up an interrupted publish, and start it over",
+    )
     release_subs.add_parser('contribute')
 
     # rabandon = release_subs.add_parser('abandon',
@@ -457,8 +700,31 @@ def run():
     istart.add_argument('--create-branch', '-b', default=False, action='store_true',
         help="Create a feature branch for this issue.")
 
+    #
+    # Multi
+    #
+    multi.add_argument('manifest',
+        help="file listing the repositories, one path per line")
+    multi.add_argument('--jobs', '-j', type=int, default=None,
+        help="how many repositories to work on at once (default: twice the CPUs)")
+    multi.add_argument('command', nargs=argparse.REMAINDER,
+        help="the flowhub command to run in each repository")
+
+    #
+    # Train
+    #
+    train.add_argument('manifest',
+        help="file listing the repositories, one path per line, "
+        "each followed by a colon and the repositories it depends on")
+    train.add_argument('--jobs', '-j', type=int, default=None,
+        help="how many repositories to work on at once (default: twice the CPUs)")
+    train.add_argument('--message', '-m', default=None,
+        help="message for the release tags (default: 'Release <tag>')")
+    train.add_argument('--no-cleanup', action='store_true', default=False,
+        help="do not delete the release branches afterwards")
+
     argcomplete.autocomplete(parser)
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     if args.verbosity > 2:
         print "Args: ", args
 
@@ -468,8 +734,23 @@ def run():
         handle_init_call(args, e)
         return
 
+    elif args.subparser == 'multi':
+        handle_multi_call(args)
+        return
+
+    elif args.subparser == 'train':
+        handle_train_call(args)
+        return
+
+    else:
+        e = Engine(debug=args.verbosity, offline=args.offline, sessions=sessions)
+
+    if args.output == 'jsonl':
+        renderer = None
+        e.summary.listen(JSONLinesRenderer(sys.stdout))
     else:
-        e = Engine(debug=args.verbosity, offline=args.offline)
+        renderer = TextRenderer()
+        e.summary.listen(renderer)
 
     if args.subparser == 'feature':
         handle_feature_call(args, e)
@@ -486,12 +767,24 @@ def run():
     elif args.subparser == 'issue':
         handle_issue_call(args, e)
 
+    elif args.subparser == 'status':
+        e.status()
+
+    elif args.subparser == 'sync':
+        handle_sync_call(args, e)
+
     else:
         raise RuntimeError("Unrecognized command: {}".format(args.subparser))
 
-    if e.summary:
-        summary = ['\nSummary of actions:'] + e.summary
-        print "\n - ".join(summary)
+    if renderer is not None and renderer.lines:
+        print renderer.render()
+
+    if args.stats == 'json':
+        print json.dumps(e.stats.as_dict())
+    elif args.stats:
+        print "\n" + e.stats.report()
+
+    return e
 
 
 if __name__ == "__main__":
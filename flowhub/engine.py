@@ -19,6 +19,7 @@ along with this program; if not, write to the Free Software
 Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """
 
+import datetime
 import getpass
 import subprocess
 import tempfile
@@ -27,12 +28,29 @@ import warnings
 import git
 from github import Github, GithubException
 
+from background import in_background
+import changelog
 from configurator import Configurator, ImproperlyConfigured
 from decorators import online_only
+from events import Event, Summary
+from github_index import DEFAULT_MAX_AGE, GitHubIndex
+from hooks import Hooks
+from journal import (
+    CLOSE_ISSUE, Journal, OPEN_ISSUE, PULL_REQUEST, PUSH, plan,
+)
 from managers.feature import FeatureManager
+from managers.graphql import (
+    GraphQLClient, GraphQLError, GraphQLPullRequestManager, graphql_url,
+)
 from managers.hotfix import HotfixManager
 from managers.pull_request import PullRequestManager
 from managers.release import ReleaseManager
+from publish_log import PublishLog
+import release_notes
+import status
+from state import HOTFIX, RELEASE, State, refs_stamp
+from stats import RequestStats
+from tag_index import TagIndex
 
 
 class NoSuchObject(Exception):
@@ -47,18 +65,30 @@ class NoSuchRemote(NoSuchObject):
     pass
 
 
+DEFAULT_API_URL = "https://api.github.com"
+
+
 class Engine(object):
-    def __init__(self, debug=0, init=False, offline=False, input_func=raw_input):
+    def __init__(self, debug=0, init=False, offline=False, input_func=raw_input, sessions=None):
         self.DEBUG = debug
         if self.DEBUG > 2:
             print "initing engine"
 
         # assume flowhub is called from within a git repository
-        self.summary = []
+        self.summary = Summary()
+        self.stats = RequestStats()
         self._repo = git.Repo(".")
         self._cr = Configurator(self._repo.config_reader())
 
         self._gh = None
+        self._sessions = sessions
+        self._journal = None
+        self._hooks = None
+        self._tag_index = None
+        self._github_index = None
+        self._state = None
+        self._graphql = None
+        self._gh_bootstrap = None
 
         self.offline = offline
         if not self.offline:
@@ -68,18 +98,44 @@ class Engine(object):
                 print "Authorization failed! Exiting."
                 return
 
-            try:
-                self._gh_repo = self._gh.get_user().get_repo(
-                    self._cr.flowhub.structure.name
+            if self._setting_enabled('api', 'graphql'):
+                if self.DEBUG > 0:
+                    print "Using the GitHub GraphQL API"
+                self._graphql = GraphQLClient(
+                    self._token,
+                    graphql_url(self._api_url),
+                    stats=self.stats,
                 )
-            except GithubException:
-                raise ImproperlyConfigured(
-                    "No repo with given name: {}".format(
+                try:
+                    self._gh_bootstrap = self._graphql.bootstrap(
                         self._cr.flowhub.structure.name,
                     )
+                except GraphQLError:
+                    raise ImproperlyConfigured(
+                        "No repo with given name: {}".format(
+                            self._cr.flowhub.structure.name,
+                        )
+                    )
+                self._gh_repo = self._gh.get_repo(
+                    self._gh_bootstrap['viewer']['repository']['nameWithOwner'],
+                    lazy=True,
                 )
+                remaining_rate = self._gh_bootstrap['rateLimit']['remaining']
 
-            if self._gh.rate_limiting[0] < 100:
+            else:
+                try:
+                    self._gh_repo = self._gh.get_user().get_repo(
+                        self._cr.flowhub.structure.name
+                    )
+                except GithubException:
+                    raise ImproperlyConfigured(
+                        "No repo with given name: {}".format(
+                            self._cr.flowhub.structure.name,
+                        )
+                    )
+                remaining_rate = self._gh.rate_limiting[0]
+
+            if remaining_rate < 100:
                 warnings.warn(
                     "You are close to exceeding your GitHub access rate!",
                 )
@@ -100,6 +156,7 @@ class Engine(object):
                 repo=self._repo,
                 gh=self._gh,
                 offline=self.offline,
+                stats=self.stats,
             )
 
             self.release_manager = ReleaseManager(
@@ -114,6 +171,7 @@ class Engine(object):
                 repo=self._repo,
                 gh=self._gh,
                 offline=self.offline,
+                stats=self.stats,
             )
 
             self.hotfix_manager = HotfixManager(
@@ -128,9 +186,19 @@ class Engine(object):
                 repo=self._repo,
                 gh=self._gh,
                 offline=self.offline,
+                stats=self.stats,
             )
 
-            self.pull_manager = PullRequestManager(
+            pull_manager_class = PullRequestManager
+            pull_manager_kwargs = {}
+            if self._graphql is not None:
+                pull_manager_class = GraphQLPullRequestManager
+                pull_manager_kwargs = {
+                    'graphql': self._graphql,
+                    'bootstrap': self._gh_bootstrap,
+                }
+
+            self.pull_manager = pull_manager_class(
                 debug=self.DEBUG,
                 prefix=self._cr.flowhub.structure.name,
                 origin=self.origin,
@@ -142,13 +210,35 @@ class Engine(object):
                 repo=self._repo,
                 gh=self._gh,
                 offline=self.offline,
+                stats=self.stats,
+                index=self.github_index,
+                new_client=self._new_client,
+                **pull_manager_kwargs
             )
 
+    def _get_setting(self, section, name, default=None):
+        """Reads flowhub.<section>.<name>, falling back to default."""
+        try:
+            return getattr(getattr(self._cr.flowhub, section), name)
+        except AttributeError:
+            return default
+
+    def _setting_enabled(self, section, name):
+        value = self._get_setting(section, name)
+        return str(value).strip().lower() in ('true', 'yes', 'on', '1')
+
+    @property
+    def _api_url(self):
+        url = self._get_setting('api', 'url', DEFAULT_API_URL)
+        if not isinstance(url, basestring):
+            url = DEFAULT_API_URL
+        return url
+
     def do_auth(self, input_func):
         """Generates the authorization to do things with github."""
         try:
-            token = self._cr.flowhub.auth.token
-            self._gh = Github(token)
+            self._token = self._cr.flowhub.auth.token
+            self._gh = self._session(self._token)
             if self.DEBUG > 0:
                 print "GitHub Engine authorized by token in settings."
         except AttributeError:
@@ -164,10 +254,30 @@ class Engine(object):
 
         return True
 
+    def _session(self, token):
+        """A GitHub client for token, shared with other engines given the same sessions."""
+        key = (token, self._api_url)
+        if self._sessions is not None and key in self._sessions:
+            gh = self._sessions[key]
+        else:
+            gh = Github(token, base_url=self._api_url)
+            if self._sessions is not None:
+                self._sessions[key] = gh
+
+        return self.stats.instrument(gh)
+
+    def _new_client(self):
+        """A GitHub client of its own, for requests made on another thread."""
+        return self.stats.instrument(Github(self._token, base_url=self._api_url))
+
     def _create_token(self, input_func):
         # Don't store the users' information.
         for i in range(3):
-            self._gh = Github(input_func("Username: "), getpass.getpass())
+            self._gh = self.stats.instrument(Github(
+                input_func("Username: "),
+                getpass.getpass(),
+                base_url=self._api_url,
+            ))
 
             try:
                 auth = self._gh.get_user().create_authorization(
@@ -180,7 +290,7 @@ class Engine(object):
                 if i == 2:
                     return False
 
-        token = auth.token
+        token = self._token = auth.token
         if self.DEBUG > 2:
             print "Token generated: ", token
         # set the token globally, rather than on the repo level.
@@ -237,6 +347,106 @@ class Engine(object):
         # Refresh the read-only reader.
         self._cr = Configurator(self._repo.config_reader())
 
+    @property
+    def journal(self):
+        if self._journal is None:
+            self._journal = Journal(self._repo.git_dir)
+        return self._journal
+
+    @property
+    def hooks(self):
+        if self._hooks is None:
+            try:
+                configured = dict(self._cr.flowhub.hooks._values)
+            except AttributeError:
+                configured = {}
+            self._hooks = Hooks(
+                self._repo.git_dir,
+                configured,
+                working_dir=self._repo.working_tree_dir,
+                debug=self.DEBUG,
+            )
+        return self._hooks
+
+    @property
+    def state(self):
+        if self._state is None:
+            self._state = State(self._repo.git_dir)
+        return self._state
+
+    @property
+    def tag_index(self):
+        if self._tag_index is None:
+            self._tag_index = TagIndex(self._repo)
+        return self._tag_index
+
+    @property
+    def github_index(self):
+        """The local copy of GitHub's pull-requests and issues that `sync` keeps.
+
+        It answers lookups for flowhub.index.maxage seconds after a sync
+        (0 turns it off).
+        """
+        if self._github_index is None:
+            try:
+                max_age = int(self._get_setting('index', 'maxage', DEFAULT_MAX_AGE))
+            except (TypeError, ValueError):
+                max_age = DEFAULT_MAX_AGE
+            self._github_index = GitHubIndex(self._repo.git_dir, max_age=max_age)
+        return self._github_index
+
+    def changelog(self, branch):
+        """What's new on branch since the last tag, for its tag message."""
+        prefix = self._cr.flowhub.prefix
+        structure = self._cr.flowhub.structure
+        return changelog.changelog(
+            self._repo,
+            branch,
+            prefixes=[prefix.feature, prefix.release, prefix.hotfix],
+            ignore=[structure.master, structure.develop],
+        )
+
+    def publish_log(self, branch):
+        """The steps an unfinished publish of branch got through."""
+        return PublishLog(self._repo.git_dir, str(branch))
+
+    def release_notes(self, branch):
+        """The pull-requests merged into develop since branch's last tag.
+
+        They're looked up once per tag range; offline, there are none.
+        """
+        if self.offline:
+            return ""
+
+        since = changelog.previous_tag(self._repo, branch)
+        head = self._repo.commit(str(branch)).hexsha
+        cache = release_notes.NotesCache(self._repo.git_dir)
+
+        pulls = cache.get(since, head)
+        if pulls is None:
+            since_time = None
+            if since is not None:
+                since_time = datetime.datetime.utcfromtimestamp(
+                    self._repo.commit(since).committed_date,
+                )
+            pulls = self.pull_manager.merged_since(self.develop, since_time)
+            cache.put(since, head, pulls)
+
+        return release_notes.render(pulls, since)
+
+    def _record_pull_request(self, base, head, summary):
+        self.journal.record(PULL_REQUEST, base=base.name, head=head.name)
+        summary += [
+            Event(
+                "Recorded pull-request: {} into {}"
+                "\n\t(run `flowhub sync` when you're back online)".format(
+                    head.name,
+                    base.name,
+                ),
+                'pull-request', refs=[head.name, base.name], recorded=True,
+            ),
+        ]
+
     def _branch_exists(self, branch_name):
         if self.DEBUG > 2:
             print "Checking for existence of branch {}".format(branch_name)
@@ -297,33 +507,148 @@ class Engine(object):
 
         return gh_parent
 
+    def _scan(self, kind):
+        """Every local branch with kind's (release's or hotfix's) prefix."""
+        prefix = getattr(self._cr.flowhub.prefix, kind)
+        return [x for x in self._repo.branches if x.name.startswith(prefix)]
+
+    def _active(self, kind):
+        """The release or hotfix branch in the works.
+
+        It's looked up from the state file; the branches are only scanned
+        when that's missing or out of date (branches made or deleted outside
+        of flowhub), and the state's corrected from what's found.
+        """
+        common_dir = getattr(self._repo, 'common_dir', self._repo.git_dir)
+        stamp = refs_stamp(common_dir, getattr(self._cr.flowhub.prefix, kind))
+
+        recorded = self.state.get(kind)
+        if recorded is not None and recorded['name'] is not None:
+            head = git.Head(self._repo, git.Head.to_full_path(recorded['name']))
+            if head.is_valid():
+                return head
+        elif recorded is not None and recorded.get('refs') == stamp:
+            # none in the works, and no branches made since we looked.
+            return None
+
+        branches = self._scan(kind)
+        if len(branches) > 1:
+            warnings.warn("Several {} branches: {}; using {}".format(
+                kind, ", ".join(b.name for b in branches), branches[0].name,
+            ))
+
+        with self.state.update() as state:
+            state[kind] = {
+                'name': branches[0].name if branches else None,
+                'base': None,
+                'started_at': None,
+                'refs': stamp,
+            }
+
+        return branches[0] if branches else None
+
     @property
     def release(self):
         # official version releases are named release/#.#.#
-        releases = [x for x in self._repo.branches if x.name.startswith(
-            self._cr.flowhub.prefix.release,
-        )]
-
-        if releases:
-            return releases[0]
-        else:
-            return None
+        return self._active(RELEASE)
 
     @property
     def hotfix(self):
-        # official version hotfixes are named release/#.#.#
-        hotfixes = [x for x in self._repo.branches if x.name.startswith(
-            self._cr.flowhub.prefix.hotfix,
-        )]
+        return self._active(HOTFIX)
+
+    def _return_branch(self, prefix, name):
+        """The branch to go back to once prefix+name is done with: the one
+        checked out now, unless that's the branch about to be deleted."""
+        current = self._repo.head.reference
+        if current.name == "{}{}".format(prefix, name):
+            return self.develop
+        return current
+
+    def _find_pull_or_issue(self, base, head):
+        """head's open pull-request, or else the issue it's named for."""
+        pr = self.pull_manager.find_pull(base, head)
+        if pr:
+            return pr, None
+        return None, self.pull_manager.issue_for_branch(head)
+
+    def _publish_to_pull_request(self, base, head, push, summary):
+        """Runs push() while head's pull-request and issue are looked up on
+        another thread, then adds head to its pull-request, or opens one.
+
+        The lookups share one GitHub client, so they're made one after the
+        other; only the push, a git process, runs alongside them.
+        """
+        lookup = in_background(self._find_pull_or_issue, base, head)
+
+        push()
+
+        pr, issue = lookup.result()
+        if pr:
+            return self.pull_manager.add_to_pull(base, head, summary, pr=pr)
+
+        return self._create_pull_request(base, head, summary, issue=issue)
+
+    def publish_features(self, names=None, summary=None):
+        """Publishes many features at once, and opens their missing pull-requests.
+
+        Nothing is asked: pull-requests are titled after their branches, or
+        attached to the issue a branch is named for. With no names, every
+        feature is published. Returns a dict per branch describing the
+        outcome.
+        """
+        if summary is None:
+            summary = self.summary
 
-        if hotfixes:
-            return hotfixes[0]
+        prefix = self._cr.flowhub.prefix.feature
+        results = {}
+        if names:
+            names = [n[len(prefix):] if n.startswith(prefix) else n for n in names]
+            branches = []
+            for name in names:
+                branch = self.feature_manager.get(name)
+                if branch is None:
+                    results[prefix + name] = {'status': 'failed', 'error': 'no such feature'}
+                else:
+                    branches.append(branch)
         else:
-            return None
+            branches = [b for b in self._repo.branches if b.name.startswith(prefix)]
+
+        if branches and self.offline:
+            self.feature_manager.publish_many(branches, summary)
+            for branch in branches:
+                self._record_pull_request(self.develop, branch, summary)
+                results[branch.name] = {'status': 'recorded'}
+
+        elif branches:
+            pulls = in_background(self.pull_manager.open_pulls_by_head)
+            self.feature_manager.publish_many(branches, summary)
+            for result in self.pull_manager.create_pulls(
+                self.develop,
+                branches,
+                summary,
+                pulls=pulls.result(),
+            ):
+                results[result.head] = {'status': result.status}
+                if result.pr is not None:
+                    results[result.head].update(number=result.pr.number, url=result.pr.html_url)
+                if result.error is not None:
+                    results[result.head]['error'] = result.error
+
+        order = [prefix + n for n in names] if names else [b.name for b in branches]
+        return [
+            dict(branch=branch, **results[branch])
+            for branch in order
+            if branch in results
+        ]
 
-    def _create_pull_request(self, base, head, summary):
+    def _create_pull_request(self, base, head, summary, issue=None):
         # try to glean issue numbers from branch
-        pr_from_issue = self.pull_manager.create_from_branch_name(base, head, summary)
+        pr_from_issue = self.pull_manager.create_from_branch_name(
+            base,
+            head,
+            summary,
+            issue=issue,
+        )
         if pr_from_issue:
             return pr_from_issue
 
@@ -376,7 +701,7 @@ class Engine(object):
         branch.checkout()
 
         summary += [
-            "Checked out branch {}".format(branch.name),
+            Event("Checked out branch {}".format(branch.name), 'checkout', refs=[branch.name]),
         ]
 
         return True
@@ -422,6 +747,9 @@ class Engine(object):
             name = name.replace(self._cr.flowhub.prefix.feature, '')
             return_branch = self.develop
 
+        else:
+            return_branch = self._return_branch(self._cr.flowhub.prefix.feature, name)
+
         self.feature_manager.accept(
             name,
             summary=summary,
@@ -430,7 +758,26 @@ class Engine(object):
 
         return_branch.checkout()
         summary += [
-            "Checked out branch {}".format(return_branch.name),
+            Event("Checked out branch {}".format(return_branch.name), 'checkout', refs=[return_branch.name]),
+        ]
+
+        return True
+
+    def accept_merged_features(self, delete_feature_branches=True, summary=None):
+        if summary is None:
+            summary = self.summary
+        return_branch = self._repo.head.reference
+
+        accepted = self.feature_manager.accept_merged(
+            summary=summary,
+            with_delete=delete_feature_branches,
+        )
+
+        if delete_feature_branches and return_branch.name in accepted:
+            return_branch = self.develop
+        return_branch.checkout()
+        summary += [
+            Event("Checked out branch {}".format(return_branch.name), 'checkout', refs=[return_branch.name]),
         ]
 
         return True
@@ -453,6 +800,9 @@ class Engine(object):
             name = name.replace(self._cr.flowhub.prefix.feature, '')
             return_branch = self.develop
 
+        else:
+            return_branch = self._return_branch(self._cr.flowhub.prefix.feature, name)
+
         if self.DEBUG > 0:
             print "Abandoning feature branch..."
 
@@ -462,8 +812,11 @@ class Engine(object):
 
         return_branch.checkout()
         summary += [
-            "Checked out branch {}".format(
-                return_branch.name,
+            Event(
+                "Checked out branch {}".format(
+                    return_branch.name,
+                ),
+                'checkout', refs=[return_branch.name],
             ),
         ]
 
@@ -473,7 +826,6 @@ class Engine(object):
         )
         return True
 
-    @online_only
     def publish_feature(self, name=None, summary=None):
         if summary is None:
             summary = self.summary
@@ -490,15 +842,24 @@ class Engine(object):
 
             name = name.replace(self._cr.flowhub.prefix.feature, '')
 
-        branch = self.feature_manager.publish(name, summary)
-
+        base = self.develop
         # we don't have access to gh_canon if we're offline
-        if not self.offline:
-            base = self.develop
-            pr = self.pull_manager.add_to_pull(base, branch, summary)
+        if self.offline:
+            branch = self.feature_manager.publish(name, summary)
+            self._record_pull_request(base, branch, summary)
+            return True
+
+        branch = self.feature_manager.get(name)
+        if branch is None:
+            print "No feature named {}".format(name)
+            return False
 
-            if not pr:
-                pr = self._create_pull_request(base, branch, summary)
+        self._publish_to_pull_request(
+            base,
+            branch,
+            lambda: self.feature_manager.publish(name, summary),
+            summary,
+        )
 
         return True
 
@@ -527,6 +888,27 @@ class Engine(object):
 
         return features
 
+    def status(self):
+        """Shows how every feature, release and hotfix branch stands against
+        the branch it'll be merged into, and against its upstream.
+
+        Features and releases are compared with develop, hotfixes with
+        master; one for-each-ref and one rev-list cover all of them.
+        """
+        prefix = self._cr.flowhub.prefix
+        structure = self._cr.flowhub.structure
+        statuses = status.branch_status(self._repo, [
+            (prefix.feature, structure.develop),
+            (prefix.release, structure.develop),
+            (prefix.hotfix, structure.master),
+        ])
+        if not statuses:
+            print "There are no feature, release or hotfix branches."
+            return []
+
+        print status.format_status(statuses)
+        return statuses
+
     def start_release(self, name=None, summary=None):
         # checkout develop
         # if already release branch, abort.
@@ -539,10 +921,7 @@ class Engine(object):
             print "Please provide a release name."
             return False
 
-        if any([
-            x for x in self._repo.branches
-                if x.name.startswith(self._cr.flowhub.prefix.release)
-        ]):
+        if self.release is not None:
             print "You already have a release in the works - please finish that one."
             return False
 
@@ -554,19 +933,38 @@ class Engine(object):
         branch.checkout()
 
         summary += [
-            "Checked out branch {}",
+            Event("Checked out branch {}".format(branch.name), 'checkout', refs=[branch.name]),
         ]
 
         return True
 
-    def stage_release(self):
-        self.summary += [
-            "Release branch sent off to stage",
-        ]
-        self.summary += [
-            "Release branch checked out and refreshed on stage."
-            "\n\nLOL just kidding, this doesn't do anything."
-        ]
+    def stage_release(self, summary=None):
+        """Pushes the release branch to every remote in flowhub.stage.remotes at once.
+
+        Returns whether it made it to all of them.
+        """
+        if summary is None:
+            summary = self.summary
+
+        if not self.release:
+            print "There's no release branch to stage."
+            return False
+
+        remotes = str(self._get_setting('stage', 'remotes', '')).replace(',', ' ').split()
+        if not remotes:
+            print (
+                "No staging remotes are configured; list them with\n"
+                "\tgit config flowhub.stage.remotes \"<remote> ...\""
+            )
+            return False
+
+        results = self.release_manager.stage(
+            self.release,
+            remotes,
+            summary,
+            concurrency=int(self._get_setting('stage', 'jobs', 4)),
+        )
+        return all(r.status != 'failed' for r in results)
 
     def publish_release(
         self,
@@ -574,6 +972,7 @@ class Engine(object):
         with_delete=True,
         summary=None,
         tag_info=None,
+        resume=False,
     ):
         # fetch canon
         # checkout master
@@ -605,15 +1004,17 @@ class Engine(object):
             name = name.replace(self._cr.flowhub.prefix.release, '')
             return_branch = self.develop
 
-        self.release_manager.publish(name, with_delete, tag_info, summary)
+        else:
+            return_branch = self._return_branch(self._cr.flowhub.prefix.release, name)
+
+        self.release_manager.publish(name, with_delete, tag_info, summary, resume=resume)
 
         return_branch.checkout()
         summary += [
-            "Checked out branch {}".format(return_branch.name),
+            Event("Checked out branch {}".format(return_branch.name), 'checkout', refs=[return_branch.name]),
         ]
         return name
 
-    @online_only
     def contribute_release(self, summary=None):
         if summary is None:
             summary = self.summary
@@ -628,12 +1029,19 @@ class Engine(object):
             return False
 
         branch = self._repo.head.reference
+        release = self.release
 
-        self.release_manager.contribute(branch, summary)
+        if self.offline:
+            self.release_manager.contribute(branch, summary)
+            self._record_pull_request(release, branch, summary)
+            return True
 
-        pr = self.pull_manager.add_to_pull(self.release, branch, summary)
-        if not pr:
-            pr = self._create_pull_request(self.release, branch, summary)
+        self._publish_to_pull_request(
+            release,
+            branch,
+            lambda: self.release_manager.contribute(branch, summary),
+            summary,
+        )
 
         return True
 
@@ -671,13 +1079,17 @@ class Engine(object):
                     else:
                         self._repo.delete_head(branch.name)
                     self.summary += [
-                        "Deleted local branch {}".format(branch.name)
+                        Event(
+                            "Deleted local branch {}".format(branch.name),
+                            'delete', refs=[branch.name],
+                        ),
                     ]
 
                     if remote_branch:
                         # get rid of the 'origin/' part of the remote name
                         remote_name = '/'.join(remote_branch.name.split('/')[1:])
-                        self.origin.push(
+                        self.feature_manager.push(
+                            self.origin,
                             remote_name,
                             delete=True,
                         )
@@ -686,7 +1098,8 @@ class Engine(object):
                         # Sometimes the tracking isn't set properly (at least for empty featuers?)
                         # so, we brute it here.
                         if hasattr(self.origin.refs, branch.name):
-                            self.origin.push(
+                            self.feature_manager.push(
+                                self.origin,
                                 branch.name,
                                 delete=True,
                             )
@@ -710,10 +1123,7 @@ class Engine(object):
             print "Please provide a release name."
             return
 
-        if any([
-            x for x in self._repo.branches
-                if x.name.startswith(self._cr.flowhub.prefix.hotfix)
-        ]):
+        if self.hotfix is not None:
             print (
                 "You already have a hotfix in the works - please finish that one."
             )
@@ -730,8 +1140,11 @@ class Engine(object):
         # Checkout the branch.
         branch.checkout()
         summary += [
-            "Checked out branch {}"
-            "\n\nBump the release version now!".format(branch),
+            Event(
+                "Checked out branch {}"
+                "\n\nBump the release version now!".format(branch),
+                'checkout', refs=[branch.name],
+            ),
         ]
         return True
 
@@ -741,6 +1154,7 @@ class Engine(object):
         summary=None,
         with_delete=True,
         tag_info=None,
+        resume=False,
     ):
         # fetch canon
         # checkout master
@@ -765,16 +1179,18 @@ class Engine(object):
             name = name.replace(self._cr.flowhub.prefix.hotfix, '')
             return_branch = self.develop
 
-        self.hotfix_manager.publish(name, tag_info, with_delete, summary)
+        else:
+            return_branch = self._return_branch(self._cr.flowhub.prefix.hotfix, name)
+
+        self.hotfix_manager.publish(name, tag_info, with_delete, summary, resume=resume)
 
         return_branch.checkout()
         summary += [
-            "Checked out branch {}".format(return_branch.name),
+            Event("Checked out branch {}".format(return_branch.name), 'checkout', refs=[return_branch.name]),
         ]
 
         return name
 
-    @online_only
     def contribute_hotfix(self, summary=None):
         if not (self.hotfix and self.hotfix.commit in self._repo.head.reference.object.iter_parents()):
             # Don't allow random branches to be contributed.
@@ -785,17 +1201,26 @@ class Engine(object):
             )
             return False
 
+        if summary is None:
+            summary = self.summary
+
         branch = self._repo.head.reference
+        hotfix = self.hotfix
 
-        self.release_manager.contribute(branch, summary)
-        pr = self.pull_manager.add_to_pull(self.hotfix, branch, summary)
+        if self.offline:
+            self.release_manager.contribute(branch, summary)
+            self._record_pull_request(hotfix, branch, summary)
+            return True
 
-        if not pr:
-            self._create_pull_request(self.hotfix, branch, summary)
+        self._publish_to_pull_request(
+            hotfix,
+            branch,
+            lambda: self.release_manager.contribute(branch, summary),
+            summary,
+        )
 
         return True
 
-    @online_only
     def open_issue(
         self,
         title=None,
@@ -857,15 +1282,111 @@ class Engine(object):
         if self.DEBUG > 3:
             print "Description used:\n", body
 
-        issue = self.pull_manager.open_issue(title, body, labels, summary)
-
-        if create_branch:
+        if self.offline:
+            self.journal.record(OPEN_ISSUE, title=title, body=body, labels=labels)
+            summary += [
+                "Recorded issue: {}"
+                "\n\t(run `flowhub sync` when you're back online)".format(title),
+            ]
+            issue = None
+            feature_name = title.replace(' ', '-').lower()
+        else:
+            issue = self.pull_manager.open_issue(title, body, labels, summary)
             feature_name = "{}-{}".format(
                 issue.number,
                 title.replace(' ', '-').lower(),
             )
-            self.feature_manager.start(feature_name, summary, with_tracking=False)
+
+        if create_branch:
+            self.feature_manager.start(feature_name, with_tracking=False, summary=summary)
 
         if return_issue:
             return issue
 
+    @online_only
+    def sync(self, summary=None):
+        """Replays the operations recorded while offline, then brings the
+        local index of pull-requests and issues up to date.
+
+        Recorded pushes are collapsed into one push per remote, and duplicate
+        pull-requests and issue changes are dropped. Anything that fails stays
+        in the journal for the next sync.
+        """
+        if summary is None:
+            summary = self.summary
+
+        replayed = self._replay_journal(summary)
+        self.pull_manager.sync_index(summary)
+        return replayed
+
+    def _replay_journal(self, summary):
+        entries = self.journal.entries()
+        if not entries:
+            summary += ["Nothing was recorded while offline"]
+            return True
+
+        failed = []
+        for batch in plan(entries):
+            try:
+                self._replay(batch, summary)
+            except (git.GitCommandError, GithubException) as e:
+                print "Couldn't replay {}: {}".format(batch.kind, e)
+                failed += batch.entries
+
+        self.journal.replace(failed)
+        if failed:
+            summary += [
+                "{} recorded operations could not be replayed".format(len(failed)),
+            ]
+            return False
+
+        return True
+
+    def _replay(self, batch, summary):
+        params = batch.params
+
+        if batch.kind == PUSH:
+            remote = self.__get_remote_by_name(params['remote'])
+            # Deleting a branch the remote never had is an error; skip those.
+            refspecs = [
+                r for r in params['refspecs']
+                if not r.startswith(':') or hasattr(remote.refs, r[1:])
+            ]
+            if not refspecs and not params['tags']:
+                return
+
+            self.feature_manager.push(
+                remote,
+                *refspecs,
+                set_upstream=params['set_upstream'],
+                tags=params['tags']
+            )
+            summary += [
+                "Pushed {}{} to {}".format(
+                    ', '.join(refspecs),
+                    ' and tags' if params['tags'] else '',
+                    remote,
+                ),
+            ]
+
+        elif batch.kind == PULL_REQUEST:
+            base = git.Head(self._repo, 'refs/heads/{}'.format(params['base']))
+            head = git.Head(self._repo, 'refs/heads/{}'.format(params['head']))
+            if not self.pull_manager.add_to_pull(base, head, summary):
+                self._create_pull_request(base, head, summary)
+
+        elif batch.kind == OPEN_ISSUE:
+            self.pull_manager.open_issue(
+                params['title'],
+                params.get('body'),
+                params.get('labels') or [],
+                summary,
+            )
+
+        elif batch.kind == CLOSE_ISSUE:
+            issue = self.pull_manager.get_issue(params['number'])
+            if issue is not None:
+                issue.edit(state='closed')
+                summary += [
+                    "Closed issue #{}".format(params['number']),
+                ]
@@ -0,0 +1,134 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import json
+import time
+
+
+class Event(str):
+    """A line of the summary, along with what it was about.
+
+    It's still the line itself, so anything that treats the summary as a
+    list of strings carries on working. fields are the structured details:
+    refs, shas, remote, url and so on.
+    """
+
+    def __new__(cls, message, step, **fields):
+        event = super(Event, cls).__new__(cls, message)
+        event.step = step
+        event.fields = fields
+        return event
+
+
+class Summary(list):
+    """The engine's summary of actions, as a stream of events.
+
+    Every line added is turned into an event (a dict) and handed to each
+    listener straight away, with the time since the previous event as the
+    duration of its step. Changing a line (summary[-1] += "...") sends an
+    event that amends the earlier one.
+    """
+
+    def __init__(self, lines=()):
+        super(Summary, self).__init__()
+        self.events = []
+        self.listeners = []
+        self.started = self._last = time.time()
+        self.extend(lines)
+
+    def listen(self, listener):
+        """Sends listener every event, starting with those already sent."""
+        for event in self.events:
+            listener(event)
+        self.listeners.append(listener)
+
+    def _emit(self, line, amends=None):
+        now = time.time()
+        event = {
+            'step': getattr(line, 'step', 'note'),
+            'message': str(line),
+            'time': now,
+            'duration': round(now - self._last, 3),
+        }
+        event.update(getattr(line, 'fields', {}))
+        if amends is not None:
+            event['amends'] = amends
+        self._last = now
+
+        self.events.append(event)
+        for listener in self.listeners:
+            listener(event)
+
+    def append(self, line):
+        super(Summary, self).append(line)
+        self._emit(line)
+
+    def extend(self, lines):
+        for line in lines:
+            self.append(line)
+
+    def __iadd__(self, lines):
+        self.extend(lines)
+        return self
+
+    def __setitem__(self, index, line):
+        if not isinstance(index, (int, long)):
+            raise TypeError("summary lines can only be replaced one at a time")
+
+        index = index if index >= 0 else len(self) + index
+        previous = self[index]
+        if not isinstance(line, Event) and isinstance(previous, Event):
+            line = Event(line, previous.step, **previous.fields)
+
+        super(Summary, self).__setitem__(index, line)
+        self._emit(line, amends=index)
+
+    def __setslice__(self, i, j, lines):
+        raise TypeError("summary lines can only be replaced one at a time")
+
+
+class TextRenderer(object):
+    """The classic "Summary of actions", built up from events."""
+
+    def __init__(self):
+        self.lines = []
+
+    def __call__(self, event):
+        if 'amends' in event:
+            self.lines[event['amends']] = event['message']
+        else:
+            self.lines.append(event['message'])
+
+    def render(self):
+        if not self.lines:
+            return ""
+        return "\n - ".join(['\nSummary of actions:'] + self.lines)
+
+
+class JSONLinesRenderer(object):
+    """Writes each event to stream as a line of JSON, as soon as it happens."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __call__(self, event):
+        self.stream.write(json.dumps(event, sort_keys=True) + '\n')
+        self.stream.flush()
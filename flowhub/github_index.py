@@ -0,0 +1,237 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from contextlib import closing
+import datetime
+import os
+import sqlite3
+import time
+
+from storage import flowhub_path
+
+
+# Answer from the index for this long after a sync; after that, ask GitHub.
+DEFAULT_MAX_AGE = 600
+
+# A first sync mirrors every open pull-request and issue, and those closed
+# this recently.
+RECENTLY_CLOSED = datetime.timedelta(days=30)
+
+TIMESTAMP = '%Y-%m-%dT%H:%M:%SZ'
+
+PULLS, ISSUES = 'pulls', 'issues'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pulls (
+    number INTEGER PRIMARY KEY,
+    state TEXT NOT NULL,
+    title TEXT,
+    head_label TEXT NOT NULL,
+    head_ref TEXT NOT NULL,
+    base_ref TEXT NOT NULL,
+    url TEXT,
+    html_url TEXT,
+    issue_url TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS pulls_by_head ON pulls (head_label, state);
+CREATE TABLE IF NOT EXISTS issues (
+    number INTEGER PRIMARY KEY,
+    state TEXT NOT NULL,
+    title TEXT,
+    url TEXT,
+    html_url TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    kind TEXT PRIMARY KEY,
+    repo TEXT NOT NULL,
+    updated_at TEXT,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def timestamp(value):
+    return value.strftime(TIMESTAMP) if value is not None else None
+
+
+class GitHubIndex(object):
+    """A local copy of a repository's pull-requests and issues.
+
+    Kept in a SQLite database under .git/flowhub/. Each sync only asks for
+    what's changed since the last one: issues through their since=
+    parameter, pull-requests newest-updated first, until one's older than
+    the cursor. Lookups only answer while the last sync is less than
+    max_age seconds old.
+    """
+
+    def __init__(self, git_dir, max_age=DEFAULT_MAX_AGE):
+        self.git_dir = git_dir
+        self.max_age = max_age
+
+    @property
+    def path(self):
+        return flowhub_path(self.git_dir, 'github.sqlite')
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _connect(self):
+        # a connection per use: lookups run on whichever thread needs them.
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        connection.executescript(SCHEMA)
+        return closing(connection)
+
+    #
+    # Syncing
+    #
+    def cursor(self, kind, repo):
+        """When the newest kind (pulls or issues) seen for repo was updated."""
+        if not self.exists():
+            return None
+
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT updated_at FROM cursors WHERE kind = ? AND repo = ?", (kind, repo),
+            ).fetchone()
+        if row is None or row['updated_at'] is None:
+            return None
+        return datetime.datetime.strptime(row['updated_at'], TIMESTAMP)
+
+    def sync(self, gh_repo, now=None):
+        """Brings the index up to date with gh_repo (a PyGithub Repository).
+
+        Returns how many pull-requests and issues were added or changed.
+        """
+        now = now or datetime.datetime.utcnow()
+        window = now - RECENTLY_CLOSED
+        repo = gh_repo.full_name
+        pulls_since = self.cursor(PULLS, repo)
+        issues_since = self.cursor(ISSUES, repo)
+
+        if pulls_since is None:
+            pulls = list(gh_repo.get_pulls(state='open'))
+            pulls += self._updated_since(
+                gh_repo.get_pulls(state='closed', sort='updated', direction='desc'),
+                window,
+            )
+        else:
+            pulls = self._updated_since(
+                gh_repo.get_pulls(state='all', sort='updated', direction='desc'),
+                pulls_since,
+            )
+
+        if issues_since is None:
+            issues = list(gh_repo.get_issues(state='open'))
+            issues += list(gh_repo.get_issues(state='closed', since=window))
+        else:
+            issues = list(gh_repo.get_issues(state='all', since=issues_since))
+
+        with self._connect() as db:
+            with db:
+                if pulls_since is None and issues_since is None:
+                    # a new repository, or the first sync: start afresh.
+                    db.execute("DELETE FROM pulls")
+                    db.execute("DELETE FROM issues")
+                for pr in pulls:
+                    self._put_pull(db, pr)
+                for issue in issues:
+                    self._put_issue(db, issue)
+                # after a first sync, everything changed since the window's
+                # start is in; before it, only what's still open.
+                self._advance(db, PULLS, repo, pulls, pulls_since or window)
+                self._advance(db, ISSUES, repo, issues, issues_since or window)
+
+        return len(pulls), len(issues)
+
+    def _updated_since(self, listing, since):
+        # the listing's newest first, so the rest are older still.
+        updated = []
+        for item in listing:
+            if item.updated_at is not None and item.updated_at < since:
+                break
+            updated.append(item)
+        return updated
+
+    def _advance(self, db, kind, repo, items, since):
+        newest = max([i.updated_at for i in items if i.updated_at is not None] + [since])
+        db.execute(
+            "INSERT OR REPLACE INTO cursors (kind, repo, updated_at, synced_at) VALUES (?, ?, ?, ?)",
+            (kind, repo, timestamp(newest), time.time()),
+        )
+
+    def _put_pull(self, db, pr):
+        db.execute(
+            "INSERT OR REPLACE INTO pulls "
+            "(number, state, title, head_label, head_ref, base_ref, url, html_url, issue_url, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (pr.number, pr.state, pr.title, pr.head.label, pr.head.ref, pr.base.ref,
+             pr.url, pr.html_url, pr.issue_url, timestamp(pr.updated_at)),
+        )
+
+    def _put_issue(self, db, issue):
+        db.execute(
+            "INSERT OR REPLACE INTO issues (number, state, title, url, html_url, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (issue.number, issue.state, issue.title, issue.url, issue.html_url,
+             timestamp(issue.updated_at)),
+        )
+
+    def put_pull(self, pr):
+        """Records a pull-request flowhub just opened, if there's an index to keep."""
+        if self.exists():
+            with self._connect() as db:
+                with db:
+                    self._put_pull(db, pr)
+
+    def put_issue(self, issue):
+        """Records an issue flowhub just opened, if there's an index to keep."""
+        if self.exists():
+            with self._connect() as db:
+                with db:
+                    self._put_issue(db, issue)
+
+    #
+    # Lookups
+    #
+    def fresh(self, repo):
+        """Whether repo's last sync is recent enough to answer from."""
+        if not self.max_age or not self.exists():
+            return False
+
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT synced_at FROM cursors WHERE repo = ?", (repo,),
+            ).fetchall()
+        return len(rows) == 2 and min(r['synced_at'] for r in rows) >= time.time() - self.max_age
+
+    def open_pulls(self):
+        with self._connect() as db:
+            return [dict(row) for row in db.execute(
+                "SELECT * FROM pulls WHERE state = 'open' ORDER BY number",
+            )]
+
+    def issue(self, number):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM issues WHERE number = ?", (number,)).fetchone()
+        return dict(row) if row is not None else None
@@ -0,0 +1,275 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from collections import namedtuple
+import imp
+import importlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from background import TaskTimeout, in_background
+from storage import flowhub_path
+
+
+ENTRY_POINT_GROUP = 'flowhub.hooks'
+
+PASSED = 'passed'
+FAILED = 'failed'
+TIMED_OUT = 'timed out'
+
+# What in-process hooks are called with. args are the strings a hook script
+# would be passed; engine is the Engine running the command.
+HookContext = namedtuple("HookContext", [
+    "name", "args", "branch", "tag", "summary", "engine",
+])
+
+
+class Hooks(object):
+    """The hooks a repository defines, found once per invocation.
+
+    A hook is any of: a script in .git/hooks, Python callables named (as
+    module:callable, or path/to/file.py:callable relative to the working
+    tree) by the flowhub.hooks.<hook-name> setting, and callables
+    registered under the flowhub.hooks entry point group with the hook's
+    name. Callables run in-process, in that order and before the script;
+    returning False (or raising) fails the hook.
+
+    Each run is timed and logged to .git/flowhub/hooks/log. The settings
+    flowhub.hooks.timeout and flowhub.hooks.<hook-name>-timeout limit how
+    long a hook may take, and flowhub.hooks.detach runs post- hooks in the
+    background, with their output in .git/flowhub/hooks/<hook-name>.log.
+    """
+
+    def __init__(self, git_dir, configured=None, working_dir=None, debug=0):
+        self.DEBUG = debug
+        self.git_dir = git_dir
+        self.directory = os.path.join(git_dir, 'hooks')
+        self.working_dir = working_dir or os.getcwd()
+        self._configured = configured or {}
+        self._scripts = None
+        self._entry_points = None
+
+    @property
+    def scripts(self):
+        if self._scripts is None:
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                names = []
+            self._scripts = set(n for n in names if not n.endswith('.sample'))
+        return self._scripts
+
+    @property
+    def entry_points(self):
+        if self._entry_points is None:
+            self._entry_points = {}
+            try:
+                import pkg_resources
+            except ImportError:
+                return self._entry_points
+
+            for entry_point in pkg_resources.iter_entry_points(ENTRY_POINT_GROUP):
+                self._entry_points.setdefault(entry_point.name, []).append(entry_point)
+        return self._entry_points
+
+    def _configured_specs(self, name):
+        return [s for s in re.split(r'[\s,]+', self._configured.get(name, '')) if s]
+
+    def defines(self, name):
+        return bool(
+            name in self.scripts
+            or self._configured_specs(name)
+            or name in self.entry_points
+        )
+
+    def callables(self, name):
+        """(description, loader) pairs for name's in-process hooks, in order."""
+        found = [(spec, lambda spec=spec: _load(spec, self.working_dir)) for spec in self._configured_specs(name)]
+        found += [
+            (str(ep), ep.load) for ep in self.entry_points.get(name, [])
+        ]
+        return found
+
+    def _setting(self, name, default=None):
+        return self._configured.get(name, default)
+
+    def timeout(self, name):
+        """Seconds name's hooks may run for, in all; None is forever."""
+        value = self._setting('{}-timeout'.format(name), self._setting('timeout'))
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+
+    def detaches(self, name):
+        return (
+            name.startswith('post-')
+            and str(self._setting('detach', '')).strip().lower() in ('true', 'yes', 'on', '1')
+            and hasattr(os, 'fork')
+        )
+
+    def run(self, context):
+        """Runs every hook for context.name; returns whether they all passed.
+
+        Detached hooks are started in the background, and always pass.
+        """
+        if self.detaches(context.name):
+            self._detach(context)
+            return True
+
+        return self._run_logged(context, 'inline') == PASSED
+
+    def _run_logged(self, context, mode):
+        started = time.time()
+        status = self._run_all(context, started)
+        self.record(
+            hook=context.name,
+            mode=mode,
+            status=status,
+            started=started,
+            duration=round(time.time() - started, 3),
+            pid=os.getpid(),
+        )
+        if status == TIMED_OUT:
+            print "Hook {} timed out after {}s".format(context.name, self.timeout(context.name))
+        return status
+
+    def _run_all(self, context, started):
+        timeout = self.timeout(context.name)
+
+        def remaining():
+            return None if timeout is None else max(timeout - (time.time() - started), 0)
+
+        for description, load in self.callables(context.name):
+            try:
+                result = in_background(lambda: load()(context)).result(remaining())
+            except TaskTimeout:
+                return TIMED_OUT
+            except Exception as e:
+                print "Hook {} ({}) failed: {}".format(context.name, description, e)
+                return FAILED
+
+            if result is False:
+                return FAILED
+
+        if context.name not in self.scripts:
+            return PASSED
+
+        return self._run_script(context, remaining())
+
+    def _run_script(self, context, timeout):
+        env = dict(os.environ, FLOWHUB_HOOK=context.name)
+        if context.branch:
+            env['FLOWHUB_BRANCH'] = context.branch
+        if context.tag:
+            env['FLOWHUB_TAG'] = context.tag
+
+        try:
+            process = subprocess.Popen(
+                (os.path.join(self.directory, context.name),) + tuple(context.args),
+                env=env,
+            )
+        except OSError as e:
+            # not executable, or gone since we looked
+            if self.DEBUG > 2:
+                print "Couldn't run hook: {}".format(context.name)
+                print "({})".format(e)
+            return PASSED
+
+        timed_out = []
+        if timeout is not None:
+            def kill():
+                timed_out.append(True)
+                process.kill()
+            timer = threading.Timer(timeout, kill)
+            timer.start()
+
+        returncode = process.wait()
+        if timeout is not None:
+            timer.cancel()
+
+        if timed_out:
+            return TIMED_OUT
+        return PASSED if returncode == 0 else FAILED
+
+    def _detach(self, context):
+        """Runs context's hooks in a process of their own, which outlives us."""
+        output = self.log_path('{}.log'.format(context.name))
+        context.summary.append(
+            "Started hook {} in the background\n\tlog: {}".format(context.name, output),
+        )
+        sys.stdout.flush()
+
+        child = os.fork()
+        if child:
+            os.waitpid(child, 0)
+            return
+
+        # Fork again, so the hook isn't left a zombie when it's done.
+        try:
+            os.setsid()
+            if os.fork():
+                return
+            log = os.open(output, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.dup2(log, 1)
+            os.dup2(log, 2)
+            sys.stdout = sys.stderr = os.fdopen(1, 'a', 0)
+            print "--- {} started at {}".format(context.name, time.ctime())
+            status = self._run_logged(context, 'detached')
+            print "--- {} {}".format(context.name, status)
+        finally:
+            os._exit(0)
+
+    def log_path(self, *parts):
+        return flowhub_path(self.git_dir, 'hooks', *parts)
+
+    def record(self, **entry):
+        """Adds entry to .git/flowhub/hooks/log, one JSON object per line."""
+        with open(self.log_path('log'), 'a') as f:
+            f.write(json.dumps(entry, sort_keys=True) + '\n')
+
+    def history(self):
+        path = self.log_path('log')
+        if not os.path.exists(path):
+            return []
+
+        with open(path, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+def _load(spec, working_dir):
+    module_name, _, attr = spec.partition(':')
+    if module_name.endswith('.py'):
+        path = os.path.join(working_dir, module_name)
+        name = 'flowhub_hook_' + re.sub(r'\W', '_', module_name[:-3])
+        target = imp.load_source(name, path)
+    else:
+        target = importlib.import_module(module_name)
+    for part in attr.split('.') if attr else []:
+        target = getattr(target, part)
+    return target
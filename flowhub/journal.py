@@ -0,0 +1,158 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from collections import OrderedDict, namedtuple
+import json
+import os
+import time
+
+from storage import atomic_write, flowhub_path
+
+
+PUSH = 'push'
+PULL_REQUEST = 'pull-request'
+OPEN_ISSUE = 'open-issue'
+CLOSE_ISSUE = 'close-issue'
+
+Batch = namedtuple("Batch", ["kind", "params", "entries"])
+
+
+class Journal(object):
+    """Remote-side operations recorded while offline.
+
+    Entries are appended as JSON lines to .git/flowhub/journal, and replayed
+    by `flowhub sync`.
+    """
+
+    def __init__(self, git_dir):
+        self.path = flowhub_path(git_dir, 'journal')
+
+    def record(self, op, **params):
+        entry = {
+            'op': op,
+            'params': params,
+            'recorded_at': time.time(),
+        }
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry, sort_keys=True) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+        return entry
+
+    def entries(self):
+        if not os.path.exists(self.path):
+            return []
+
+        with open(self.path, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def replace(self, entries):
+        atomic_write(
+            self.path,
+            ''.join(json.dumps(e, sort_keys=True) + '\n' for e in entries),
+        )
+
+    def clear(self):
+        self.replace([])
+
+
+def _branch_of(refspec):
+    """The remote branch a refspec writes to."""
+    return refspec.lstrip('+').split(':')[-1]
+
+
+def plan(entries):
+    """Collapses journal entries into as few remote operations as possible.
+
+    Returns a list of Batches, in replay order: one push per remote, then
+    pull-requests, opened issues and closed issues - each deduplicated.
+    """
+    # remote -> branch -> (refspec, entry); later operations on a branch win.
+    pushes = OrderedDict()
+    push_options = {}
+    pulls = OrderedDict()
+    opened = OrderedDict()
+    closed = OrderedDict()
+
+    for entry in entries:
+        op, params = entry['op'], entry['params']
+
+        if op == PUSH:
+            remote = params['remote']
+            branches = pushes.setdefault(remote, OrderedDict())
+            options = push_options.setdefault(remote, {
+                'set_upstream': False,
+                'tags': False,
+                'entries': [],
+            })
+            options['entries'].append(entry)
+            options['tags'] = options['tags'] or params.get('tags', False)
+            options['set_upstream'] = options['set_upstream'] or params.get('set_upstream', False)
+
+            for refspec in params.get('refspecs', []):
+                if params.get('delete'):
+                    refspec = ':{}'.format(refspec)
+                elif params.get('force') and not refspec.startswith('+'):
+                    refspec = '+{}'.format(refspec)
+
+                branch = _branch_of(refspec)
+                # re-insert, so the final ordering follows the last operation
+                branches.pop(branch, None)
+                branches[branch] = refspec
+
+        elif op == PULL_REQUEST:
+            key = (params['base'], params['head'])
+            pulls.setdefault(key, []).append(entry)
+
+        elif op == OPEN_ISSUE:
+            key = (params['title'], params.get('body'))
+            opened.setdefault(key, []).append(entry)
+
+        elif op == CLOSE_ISSUE:
+            closed.setdefault(params['number'], []).append(entry)
+
+    batches = []
+    deleted = set()
+    for remote, branches in pushes.items():
+        options = push_options[remote]
+        refspecs = list(branches.values())
+        deleted.update(_branch_of(r) for r in refspecs if r.startswith(':'))
+        batches.append(Batch(PUSH, {
+            'remote': remote,
+            'refspecs': refspecs,
+            'set_upstream': options['set_upstream'],
+            'tags': options['tags'],
+        }, options['entries']))
+
+    for (base, head), pull_entries in pulls.items():
+        if head in deleted:
+            # no point opening a pull-request for a branch that's gone.
+            continue
+        batches.append(Batch(PULL_REQUEST, pull_entries[-1]['params'], pull_entries))
+
+    for _, issue_entries in opened.items():
+        batches.append(Batch(OPEN_ISSUE, issue_entries[-1]['params'], issue_entries))
+
+    for number, issue_entries in closed.items():
+        batches.append(Batch(CLOSE_ISSUE, {'number': number}, issue_entries))
+
+    return batches
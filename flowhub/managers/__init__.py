@@ -19,6 +19,16 @@ along with this program; if not, write to the Free Software
 Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """
 from collections import namedtuple
+import sys
+import threading
+
+import git
+
+from flowhub.events import Event
+from flowhub.journal import Journal, PUSH
+from flowhub.progress import TransferProgress, terminal
+from flowhub.publish_log import PublishLog
+from flowhub.state import State
 
 TagInfo = namedtuple("TagInfo", ["label", "message"])
 
@@ -37,7 +47,8 @@ class Manager(object):
         hotfix,
         repo,
         gh,
-        offline
+        offline,
+        stats=None,
     ):
         self._prefix = prefix
         self.DEBUG = debug
@@ -50,5 +61,146 @@ class Manager(object):
         self.repo = repo
         self.gh = gh
         self.offline = offline
+        self.stats = stats
+        self._journal = None
+        self._state = None
+
+    @property
+    def journal(self):
+        if self._journal is None:
+            self._journal = Journal(self.repo.git_dir)
+        return self._journal
+
+    @property
+    def state(self):
+        if self._state is None:
+            self._state = State(self.repo.git_dir)
+        return self._state
+
+    def publish_log(self, branch_name):
+        return PublishLog(self.repo.git_dir, branch_name)
+
+    def _resumed(self, log, step, summary, **facts):
+        """Whether an interrupted publish already did step, leaving facts behind."""
+        if not log.done(step, **facts):
+            return False
+
+        summary += [
+            Event(
+                "Skipped {}, done before the publish was interrupted".format(step),
+                'resume', skipped=step,
+            ),
+        ]
+        return True
+
+    def _begin_publish(self, branch_name, tag_info, resume):
+        """The log of branch_name's publish, started afresh unless resuming.
+
+        Each step is logged as it completes; resuming skips the ones whose
+        results are still in place. A step that stops partway - a merge
+        conflict, say - is resolved and committed by hand, then picked up
+        with --resume.
+        """
+        log = self.publish_log(branch_name)
+        if not (resume and log.started):
+            log.begin(tag_info)
+        return log
+
+    def _remove_published(self, kind, branch_name, summary):
+        """Deletes a published release or hotfix branch, here and from canon."""
+        # already merged, but git will still refuse a plain -d while the
+        # upstream branch lags behind.
+        self.repo.delete_head(branch_name, force=True)
+        self.state.finish(kind, branch_name)
+        if self.on_remote(self.canon, branch_name):
+            self.push(self.canon, branch_name, delete=True)
+        summary += [
+            Event(
+                "Branch {} removed".format(branch_name),
+                'delete', refs=[branch_name],
+            ),
+        ]
+
+    def _report_push(self, summary, pushed, message, recorded_message, step, **fields):
+        """Adds an Event for a push to summary: message if it happened, or
+        recorded_message if it was only recorded, offline. Returns pushed."""
+        if pushed:
+            summary += [Event(message, step, **fields)]
+        else:
+            summary += [Event(recorded_message, step, recorded=True, **fields)]
+        return pushed
+
+    def sha(self, ref):
+        """The commit ref points to, or None if there's no such ref."""
+        try:
+            return self.repo.commit(str(ref)).hexsha
+        except (git.BadName, ValueError):
+            return None
+
+    def on_remote(self, remote, branch_name):
+        """Whether remote had branch_name, as of the last fetch or push."""
+        return hasattr(remote.refs, branch_name)
+
+    def fetch(self, remote):
+        """Fetches from remote; offline, this works from what we already have."""
+        if self.offline:
+            return False
+
+        progress = self._progress('fetch', remote)
+        try:
+            remote.fetch(progress=progress)
+        finally:
+            self._record(progress.finish())
+        return True
+
+    def push(self, remote, *refspecs, **kwargs):
+        """Pushes refspecs to remote.
+
+        Offline, the push is recorded in the journal for `flowhub sync` to
+        replay later. Returns whether the push actually happened.
+        """
+        if self.offline:
+            self.journal.record(
+                PUSH,
+                remote=str(remote),
+                refspecs=[str(r) for r in refspecs],
+                **kwargs
+            )
+            return False
+
+        progress = self._progress('push', remote)
+        try:
+            process = self.repo.git.push(
+                str(remote),
+                *[str(r) for r in refspecs],
+                progress=True,
+                as_process=True,
+                **kwargs
+            )
+            git.cmd.handle_process_output(
+                process, None, progress.new_message_handler(),
+                decode_streams=False,
+            )
+            process.wait(stderr=progress.stderr())
+        finally:
+            self._record(progress.finish())
+        return True
+
+    def _progress(self, operation, remote):
+        stream = None
+        # transfers running side by side would draw over each other.
+        if isinstance(threading.current_thread(), threading._MainThread):
+            stream = terminal(sys.stderr)
+        return TransferProgress(operation, remote, stream=stream)
+
+    def _record(self, progress):
+        if self.stats is not None:
+            self.stats.record_transfer(
+                progress.operation,
+                progress.remote,
+                progress.objects,
+                progress.bytes,
+                progress.seconds,
+            )
 
 
@@ -19,6 +19,7 @@ along with this program; if not, write to the Free Software
 Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """
 
+from flowhub.events import Event
 from flowhub.managers import Manager
 
 
@@ -34,30 +35,27 @@ class FeatureManager(Manager):
             commit=self.develop,  # Requires a develop branch.
         )
         summary += [
-            "New branch {} created, from branch {}".format(
-                branch_name,
-                self.develop,
-            )
+            Event(
+                "New branch {} created, from branch {}".format(
+                    branch_name,
+                    self.develop,
+                ),
+                'branch', refs=[branch_name], sha=self.sha(branch),
+            ),
         ]
 
-        # can't create a tracking branch if we're offline
-        if not self.offline and with_tracking:
+        if with_tracking:
             if self.DEBUG > 0:
                 print "Adding a tracking branch to your GitHub repo"
 
-            self.repo.git.push(
-                self.origin,
-                branch_name,
-                set_upstream=True
+            self._report_push(
+                summary,
+                self.push(self.origin, branch_name, set_upstream=True),
+                "Created a remote tracking branch on {} for {}".format(self.origin.name, branch_name),
+                "Recorded a remote tracking branch on {} for {}".format(self.origin.name, branch_name),
+                'push', remote=self.origin.name, refs=[branch_name],
             )
 
-            summary += [
-                "Created a remote tracking branch on {} for {}".format(
-                    self.origin.name,
-                    branch_name,
-                ),
-            ]
-
         return branch
 
     def get(self, name):
@@ -75,23 +73,33 @@ class FeatureManager(Manager):
         try:
             branches = [getattr(self.repo.branches, branch_name)]
         except AttributeError:
-            branches = [b for b in self.repo.branches if b.startswith(branch_name)]
+            branches = [b for b in self.repo.branches if b.name.startswith(branch_name)]
 
         return branches
 
-    def accept(self, name, summary, with_delete):
-        self.canon.fetch()
-        summary += [
-            "Latest objects fetched from {}".format(self.canon),
-        ]
+    def _update_develop(self, summary):
+        if self.fetch(self.canon):
+            summary += [
+                Event(
+                    "Latest objects fetched from {}".format(self.canon),
+                    'fetch', remote=str(self.canon),
+                ),
+            ]
         self.develop.checkout()
         self.repo.git.merge(
             "{}/{}".format(self.canon, self.develop),
         )
         summary += [
-            "Updated {}".format(self.develop),
+            Event(
+                "Updated {}".format(self.develop),
+                'merge', refs=["{}/{}".format(self.canon, self.develop), str(self.develop)],
+                sha=self.sha(self.develop),
+            ),
         ]
 
+    def accept(self, name, summary, with_delete):
+        self._update_develop(summary)
+
         branch_name = "{}{}".format(
             self._prefix,
             name,
@@ -102,17 +110,84 @@ class FeatureManager(Manager):
                 branch_name,
             )
             summary += [
-                "Deleted {} from local repository".format(branch_name),
+                Event(
+                    "Deleted {} from local repository".format(branch_name),
+                    'delete', refs=[branch_name],
+                ),
             ]
 
-            if not self.offline:
-                self.origin.push(
-                    branch_name,
-                    delete=True,
-                )
-                summary += [
+            if self.on_remote(self.origin, branch_name):
+                self._report_push(
+                    summary,
+                    self.push(self.origin, branch_name, delete=True),
                     "Deleted {} from {}".format(branch_name, self.origin),
-                ]
+                    "Recorded deletion of {} from {}".format(branch_name, self.origin),
+                    'delete', remote=str(self.origin), refs=[branch_name],
+                )
+
+    def merged(self):
+        """Feature branches whose work has been merged into canon's develop.
+
+        One walk over develop's history finds every branch whose tip it
+        contains. Tips on develop's first-parent line are left out: those
+        are features started but never worked on (or fast-forwarded in,
+        which accepting by name still handles).
+        """
+        upstream = "{}/{}".format(self.canon, self.develop)
+        parents = {}
+        for line in self.repo.git.rev_list(upstream, parents=True).splitlines():
+            commits = line.split()
+            parents[commits[0]] = commits[1:]
+
+        mainline = set()
+        commit = self.repo.commit(upstream).hexsha
+        while commit is not None:
+            mainline.add(commit)
+            commit = parents[commit][0] if parents.get(commit) else None
+
+        return [
+            b for b in self.repo.branches
+            if b.name.startswith(self._prefix)
+            and b.commit.hexsha in parents
+            and b.commit.hexsha not in mainline
+        ]
+
+    def accept_merged(self, summary, with_delete):
+        """Accepts every feature merged into canon's develop, all at once."""
+        self._update_develop(summary)
+
+        branch_names = [b.name for b in self.merged()]
+        if not branch_names:
+            summary += [
+                "No feature branches have been merged into {}".format(self.develop),
+            ]
+            return []
+
+        if not with_delete:
+            summary += [
+                "Merged into {}: {}".format(self.develop, ", ".join(branch_names)),
+            ]
+            return branch_names
+
+        self.repo.git.branch('-D', *branch_names)
+        summary += [
+            Event(
+                "Deleted {} from local repository".format(", ".join(branch_names)),
+                'delete', refs=branch_names,
+            ),
+        ]
+
+        published = [b for b in branch_names if self.on_remote(self.origin, b)]
+        if published:
+            self._report_push(
+                summary,
+                self.push(self.origin, *published, delete=True),
+                "Deleted {} from {}".format(", ".join(published), self.origin),
+                "Recorded deletion of {} from {}".format(", ".join(published), self.origin),
+                'delete', remote=str(self.origin), refs=published,
+            )
+
+        return branch_names
 
     def abandon(self, name, summary):
         branch_name = "{}{}".format(
@@ -125,34 +200,47 @@ class FeatureManager(Manager):
             force=True,
         )
         summary += [
-            "Deleted branch {} locally".format(
-                branch_name,
+            Event(
+                "Deleted branch {} locally".format(
+                    branch_name,
+                ),
+                'delete', refs=[branch_name],
             ),
         ]
 
-        if not self.offline:
-            self.repo.git.push(
-                self.origin,
-                branch_name,
-                delete=True,
-                force=True,
-            )
-            summary[-1] += "and from remote {}".format(
-                self.origin,
-            )
+        if self.on_remote(self.origin, branch_name):
+            if self.push(self.origin, branch_name, delete=True, force=True):
+                summary[-1] += " and from remote {}".format(
+                    self.origin,
+                )
+            else:
+                summary[-1] += "; recorded deletion from remote {}".format(
+                    self.origin,
+                )
 
     def publish(self, name, summary):
         branch_name = "{}{}".format(
             self._prefix,
             name,
         )
-        self.repo.git.push(
-            self.origin,
-            branch_name,
-            set_upstream=True,
+        self._report_push(
+            summary,
+            self.push(self.origin, branch_name, set_upstream=True),
+            "Updated {}/{}".format(self.origin, branch_name),
+            "Recorded update of {}/{}".format(self.origin, branch_name),
+            'push', remote=str(self.origin), refs=[branch_name], sha=self.sha(branch_name),
         )
-        summary += [
-            "Updated {}/{}".format(self.origin, branch_name)
-        ]
 
         return self.get(name)
+
+    def publish_many(self, branches, summary):
+        """Pushes all of branches to origin at once."""
+        branch_names = [b.name for b in branches]
+        names = ", ".join(branch_names)
+        self._report_push(
+            summary,
+            self.push(self.origin, *branch_names, set_upstream=True),
+            "Updated {} on {}".format(names, self.origin),
+            "Recorded update of {} on {}".format(names, self.origin),
+            'push', remote=str(self.origin), refs=branch_names,
+        )
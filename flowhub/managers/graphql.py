@@ -0,0 +1,313 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import json
+import re
+import threading
+import time
+import urllib2
+
+import github.Issue
+import github.Label
+import github.PullRequest
+
+from flowhub.managers.pull_request import PullRequestManager
+
+
+BOOTSTRAP_QUERY = """
+query Bootstrap($name: String!) {
+  viewer {
+    login
+    repository(name: $name) {
+      nameWithOwner
+      parent {
+        nameWithOwner
+      }
+    }
+  }
+  rateLimit {
+    remaining
+  }
+}
+"""
+
+PULL_REQUEST_STATE_QUERY = """
+query PullRequestState($owner: String!, $name: String!, $cursor: String, $issue: Int!, $withIssue: Boolean!) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(states: OPEN, first: 100, after: $cursor) {
+      nodes {
+        number
+        title
+        url
+        headRefName
+        headRepositoryOwner {
+          login
+        }
+      }
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+    }
+    labels(first: 100) {
+      nodes {
+        name
+      }
+    }
+    issue(number: $issue) @include(if: $withIssue) {
+      number
+      title
+      url
+    }
+  }
+}
+"""
+
+
+class GraphQLError(Exception):
+    pass
+
+
+def graphql_url(api_url):
+    """The GraphQL endpoint that lives alongside the given REST API root."""
+    api_url = api_url.rstrip('/')
+    if api_url.endswith('/api/v3'):
+        # GitHub Enterprise
+        return api_url[:-len('/v3')] + '/graphql'
+
+    return api_url + '/graphql'
+
+
+class GraphQLClient(object):
+    """Minimal client for GitHub's GraphQL API (v4)."""
+
+    def __init__(self, token, url, stats=None):
+        self.token = token
+        self.url = url
+        self.stats = stats
+
+    def execute(self, query, variables=None, optional=()):
+        """Runs a query and returns its data.
+
+        GitHub answers a lookup of something that doesn't exist with a
+        NOT_FOUND error alongside the rest of the data; those are ignored for
+        any field whose path is listed in `optional`, which is left as None.
+        """
+        request = urllib2.Request(
+            self.url,
+            data=json.dumps({'query': query, 'variables': variables or {}}),
+            headers={
+                'Authorization': 'bearer {}'.format(self.token),
+                'Content-Type': 'application/json',
+            },
+        )
+
+        started = time.time()
+        try:
+            response = urllib2.urlopen(request)
+        except urllib2.URLError as e:
+            raise GraphQLError(str(e))
+
+        try:
+            body = response.read()
+        finally:
+            response.close()
+
+        if self.stats is not None:
+            operation = re.match(r'\s*(?:query|mutation)\s+(\w+)', query)
+            self.stats.record(
+                'POST',
+                '/graphql ({})'.format(operation.group(1) if operation else 'anonymous'),
+                response.getcode(),
+                body,
+                time.time() - started,
+                headers=dict((k.lower(), v) for k, v in response.info().items()),
+                page=False,
+            )
+
+        payload = json.loads(body)
+
+        errors = [
+            e for e in payload.get('errors') or []
+            if not (e.get('type') == 'NOT_FOUND' and tuple(e.get('path') or ()) in optional)
+        ]
+        if errors:
+            raise GraphQLError(
+                "; ".join(e.get('message', '') for e in errors)
+            )
+
+        return payload['data']
+
+    def bootstrap(self, name):
+        """Who we are, which repository we're in, and its parent, in one request."""
+        data = self.execute(BOOTSTRAP_QUERY, {'name': name})
+        if data['viewer']['repository'] is None:
+            raise GraphQLError("No repo with given name: {}".format(name))
+
+        return data
+
+
+class GraphQLPullRequestManager(PullRequestManager):
+    """A PullRequestManager that reads GitHub state through GraphQL.
+
+    Everything needed to publish - the open pull-requests, the labels, and
+    the issue a branch is named for - is fetched in a single query the first
+    time it's needed. Writes still go through the REST API.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.graphql = kwargs.pop('graphql')
+        self._bootstrap = kwargs.pop('bootstrap')
+        self.index = kwargs.pop('index', None)
+        self.new_client = kwargs.pop('new_client', None)
+        # Skip PullRequestManager's REST lookups; we already know everything
+        # they would have told us.
+        super(PullRequestManager, self).__init__(*args, **kwargs)
+
+        self._login = self._bootstrap['viewer']['login']
+        repository = self._bootstrap['viewer']['repository']
+        if self.canon == self.origin or repository['parent'] is None:
+            self.gh_repo_name = repository['nameWithOwner']
+        else:
+            self.gh_repo_name = repository['parent']['nameWithOwner']
+
+        self.gh_repo = self.gh.get_repo(self.gh_repo_name, lazy=True)
+        self._graphql_state = None
+        self._issues = {}
+        self._lock = threading.Lock()
+
+    def _load_state(self, issue_number=None):
+        owner, name = self.gh_repo_name.split('/')
+        pulls = []
+        cursor = None
+        while True:
+            data = self.graphql.execute(PULL_REQUEST_STATE_QUERY, {
+                'owner': owner,
+                'name': name,
+                'cursor': cursor,
+                'issue': issue_number or 0,
+                'withIssue': bool(issue_number) and cursor is None,
+            }, optional=[('repository', 'issue')])['repository']
+
+            pulls += data['pullRequests']['nodes']
+            if cursor is None:
+                labels = data['labels']['nodes']
+                if data.get('issue'):
+                    self._issues[data['issue']['number']] = data['issue']
+
+            page_info = data['pullRequests']['pageInfo']
+            if not page_info['hasNextPage']:
+                break
+            cursor = page_info['endCursor']
+
+        self._graphql_state = {'pulls': pulls, 'labels': labels}
+
+    def _ensure_state(self, head=None):
+        issue_number = None
+        if head is not None:
+            match = re.match('^\d+', head.split('/')[-1])
+            if match:
+                issue_number = int(match.group())
+
+        # lookups may run concurrently; only one of them should query.
+        with self._lock:
+            if self._graphql_state is not None:
+                return
+
+            if self.DEBUG > 1:
+                print "fetching pull-request state through GraphQL"
+            self._load_state(issue_number)
+
+    @property
+    def full_name(self):
+        return self.gh_repo_name
+
+    def _api_url(self, *parts):
+        return "/".join(
+            ("/repos", self.gh_repo_name) + tuple(str(p) for p in parts)
+        )
+
+    def _open_pulls(self):
+        if self._indexed() is not None:
+            return super(GraphQLPullRequestManager, self)._open_pulls()
+
+        self._ensure_state()
+        return [
+            github.PullRequest.PullRequest(
+                self.gh_repo._requester,
+                {},
+                {
+                    'number': node['number'],
+                    'title': node['title'],
+                    'html_url': node['url'],
+                    'url': self._api_url('pulls', node['number']),
+                    'issue_url': self._api_url('issues', node['number']),
+                    'head': {
+                        'label': "{}:{}".format(
+                            (node['headRepositoryOwner'] or {}).get('login'),
+                            node['headRefName'],
+                        ),
+                        'ref': node['headRefName'],
+                    },
+                },
+                completed=False,
+            )
+            for node in self._graphql_state['pulls']
+        ]
+
+    def _labels(self):
+        self._ensure_state()
+        return [
+            github.Label.Label(self.gh_repo._requester, {}, node, completed=True)
+            for node in self._graphql_state['labels']
+        ]
+
+    def find_pull(self, base, head):
+        # Prime the state with the issue this branch is named for, so
+        # create_from_branch_name doesn't need a second round-trip.
+        if self._indexed() is None:
+            self._ensure_state(getattr(head, 'name', head))
+        return super(GraphQLPullRequestManager, self).find_pull(base, head)
+
+    def get_issue(self, issue_num, gh_repo=None):
+        index = self._indexed()
+        if index is not None and index.issue(issue_num) is not None:
+            return super(GraphQLPullRequestManager, self).get_issue(issue_num, gh_repo)
+
+        if issue_num not in self._issues:
+            with self._lock:
+                if self._graphql_state is None:
+                    self._load_state(issue_num)
+            if issue_num not in self._issues:
+                return super(GraphQLPullRequestManager, self).get_issue(issue_num, gh_repo)
+
+        node = self._issues[issue_num]
+        return github.Issue.Issue(
+            self.gh_repo._requester,
+            {},
+            {
+                'number': node['number'],
+                'title': node['title'],
+                'html_url': node['url'],
+                'url': self._api_url('issues', node['number']),
+            },
+            completed=False,
+        )
@@ -21,7 +21,10 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
 import re
 
+from flowhub.events import Event
+from flowhub.journal import CLOSE_ISSUE
 from flowhub.managers import Manager
+from flowhub.state import HOTFIX
 
 
 class HotfixManager(Manager):
@@ -33,82 +36,103 @@ class HotfixManager(Manager):
             name,
         )
 
-        if not self.offline:
-            self.canon.fetch()
-
-        summary += [
-            "Latest objects fetched from {}".format(self.canon),
-        ]
+        if self.fetch(self.canon):
+            summary += [
+                Event(
+                    "Latest objects fetched from {}".format(self.canon),
+                    'fetch', remote=str(self.canon),
+                ),
+            ]
         self.master.checkout()
         self.repo.git.merge(
             "{}/{}".format(self.canon, self.master),
         )
         summary += [
-            "Updated {}".format(self.master),
+            Event(
+                "Updated {}".format(self.master),
+                'merge', refs=["{}/{}".format(self.canon, self.master), str(self.master)],
+                sha=self.sha(self.master),
+            ),
         ]
 
         branch = self.repo.create_head(
             branch_name,
             commit=self.master,
         )
+        self.state.start(HOTFIX, branch_name, self.sha(branch))
         summary += [
-            "New branch {} created, from branch {}".format(
-                branch,
-                self.master,
+            Event(
+                "New branch {} created, from branch {}".format(
+                    branch,
+                    self.master,
+                ),
+                'branch', refs=[str(branch)], sha=self.sha(branch),
             ),
         ]
 
         if self.DEBUG > 0:
             print "Adding a tracking branch to your GitHub repo"
-        if not self.offline:
-            self.canon.push(
-                "{0}:{0}".format(branch),
-                set_upstream=True,
-            )
-            summary += [
-                "Pushed {} to {}".format(branch, self.canon),
-            ]
+        self._report_push(
+            summary,
+            self.push(self.canon, "{0}:{0}".format(branch), set_upstream=True),
+            "Pushed {} to {}".format(branch, self.canon),
+            "Recorded push of {} to {}".format(branch, self.canon),
+            'push', remote=str(self.canon), refs=[str(branch)],
+        )
 
         return branch  # getattr(self._repo.branches, branch_name)
 
-    def publish(self, name, tag_info, with_delete, summary):
-        if self.offline:
-            return False
-
+    def publish(self, name, tag_info, with_delete, summary, resume=False):
         hotfix_name = "{}{}".format(
             self._prefix,
             name,
         )
 
-        self.canon.fetch()
-        summary += [
-            "Latest objects fetched from {}".format(self.canon),
-        ]
+        log = self._begin_publish(hotfix_name, tag_info, resume)
+
+        if not self._resumed(log, 'fetch', summary):
+            if self.fetch(self.canon):
+                summary += [
+                    Event(
+                        "Latest objects fetched from {}".format(self.canon),
+                        'fetch', remote=str(self.canon),
+                    ),
+                ]
+            log.complete('fetch')
 
         # TODO: ensure equality of remote and local master/develop branches
-        # TODO: handle merge conflicts.
         # merge into master
-        self.master.checkout()
-        self.repo.git.merge(
-            hotfix_name,
-            no_ff=True,
-        )
-        summary += [
-            "Branch {} merged into {}".format(hotfix_name, self.master),
-        ]
+        if not self._resumed(log, 'merge-master', summary, sha=self.sha(self.master)):
+            self.master.checkout()
+            self.repo.git.merge(
+                hotfix_name,
+                no_ff=True,
+            )
+            summary += [
+                Event(
+                    "Branch {} merged into {}".format(hotfix_name, self.master),
+                    'merge', refs=[hotfix_name, str(self.master)], sha=self.sha(self.master),
+                ),
+            ]
+            log.complete('merge-master', sha=self.sha(self.master))
 
         # and tag
         issue_numbers = re.findall('(\d+)-', name)
         # cut off any issue numbers that may be there
 
-        self.repo.create_tag(
-            path=tag_info.label,
-            ref=self.master,
-            message=tag_info.message,
-        )
-        summary += [
-            "New tag ({}) created at {}'s tip".format(tag_info.label, self.master),
-        ]
+        if not self._resumed(log, 'tag', summary, sha=self.sha(tag_info.label)):
+            self.repo.create_tag(
+                path=tag_info.label,
+                ref=self.master,
+                message=tag_info.message,
+            )
+            summary += [
+                Event(
+                    "New tag ({}) created at {}'s tip".format(tag_info.label, self.master),
+                    'tag', tag=tag_info.label, sha=self.sha(self.master),
+                ),
+            ]
+            log.complete('tag', sha=self.sha(tag_info.label))
 
         # merge into develop (or release, if exists)
         if self.release:
@@ -116,21 +140,31 @@ class HotfixManager(Manager):
         else:
             trunk = self.develop
 
-        trunk.checkout()
-        self.repo.git.merge(
-            self.master,
-            no_ff=True,
-        )
-        summary += [
-            "Branch {} merged into {}".format(self.master, trunk),
-        ]
+        if not self._resumed(log, 'merge-trunk', summary, sha=self.sha(trunk)):
+            trunk.checkout()
+            self.repo.git.merge(
+                self.master,
+                no_ff=True,
+            )
+            summary += [
+                Event(
+                    "Branch {} merged into {}".format(self.master, trunk),
+                    'merge', refs=[str(self.master), str(trunk)], sha=self.sha(trunk),
+                ),
+            ]
+            log.complete('merge-trunk', sha=self.sha(trunk))
 
         # push to canon
-        self.canon.push()
-        self.canon.push(tags=True)
-        summary += [
-            "{}, {}, and tags have been pushed to {}".format(self.master, trunk, self.canon),
-        ]
+        pushed = dict((str(ref), self.sha(ref)) for ref in (self.master, trunk))
+        if not self._resumed(log, 'push', summary, **pushed):
+            self._report_push(
+                summary,
+                self.push(self.canon, self.master, trunk, tags=True),
+                "{}, {}, and tags have been pushed to {}".format(self.master, trunk, self.canon),
+                "Recorded push of {}, {}, and tags to {}".format(self.master, trunk, self.canon),
+                'push', remote=str(self.canon), refs=[str(self.master), str(trunk)], tags=True,
+            )
+            log.complete('push', **pushed)
 
         for number in issue_numbers:
             try:
@@ -138,31 +172,44 @@ class HotfixManager(Manager):
             except ValueError:
                 continue
 
+            step = 'close-issue-{}'.format(number)
+            if self._resumed(log, step, summary):
+                continue
+
+            if self.offline:
+                self.journal.record(CLOSE_ISSUE, number=number)
+                summary += [
+                    Event(
+                        "Recorded closing of issue #{}".format(number),
+                        'close-issue', number=number, recorded=True,
+                    ),
+                ]
+                log.complete(step)
+                continue
+
             issue = self.gh.get_issue(number)
             issue.edit(state='closed')
             summary += [
-                "Closed issue #{}".format(issue.number),
+                Event(
+                    "Closed issue #{}".format(issue.number),
+                    'close-issue', number=issue.number,
+                ),
             ]
+            log.complete(step)
 
         if with_delete:
-            self.repo.delete_head(hotfix_name)
-            self.canon.push(
-                hotfix_name,
-                delete=True,
-            )
-            summary += [
-                "Branch {} removed".format(hotfix_name),
-            ]
+            self._remove_published(HOTFIX, hotfix_name, summary)
+
+        log.finish()
         return True
 
     def contribute(self, branch, summary):
-        self.repo.git.push(
-            self.origin,
-            branch,
-            set_upstream=True,
+        self._report_push(
+            summary,
+            self.push(self.origin, branch, set_upstream=True),
+            "Branch {} pushed to {}".format(branch, self.origin),
+            "Recorded push of {} to {}".format(branch, self.origin),
+            'push', remote=str(self.origin), refs=[str(branch)],
         )
-        summary += [
-            "Branch {} pushed to {}".format(branch, self.origin)
-        ]
 
         return True
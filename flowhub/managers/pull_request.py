@@ -19,26 +19,37 @@ along with this program; if not, write to the Free Software
 Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """
 
+from collections import namedtuple
 import re
 
 from github import GithubException
+import github.Issue
+import github.PullRequest
 
+from flowhub.background import in_background
+from flowhub.events import Event
 from flowhub.managers import Manager
 
 
+# Bulk operations stop once the rate limit gets down to this many requests.
+RATE_LIMIT_RESERVE = 100
+
+PullResult = namedtuple("PullResult", ["head", "status", "pr", "error"])
+
+
 def sanitize_refs(method):
     def wrapper(self, base, head, *args, **kwargs):
-        if self.canon != self.origin:
-            head = "{}:{}".format(self.gh.get_user().login, head)
-
-        return method(self, base, head, *args, **kwargs)
+        return method(self, base, self.head_label(head), *args, **kwargs)
     return wrapper
 
 
 class PullRequestManager(Manager):
 
     def __init__(self, *args, **kwargs):
+        self.index = kwargs.pop('index', None)
+        self.new_client = kwargs.pop('new_client', None)
         super(PullRequestManager, self).__init__(*args, **kwargs)
+        self._login = None
 
         if self.offline:
             self.gh_repo = None
@@ -49,32 +60,116 @@ class PullRequestManager(Manager):
             else:
                 self.gh_repo = self.gh.get_user().get_repo(self._prefix).parent
 
-    @sanitize_refs
-    def create_from_branch_name(self, base, head, summary):
+    @property
+    def login(self):
+        if self._login is None:
+            self._login = self.gh.get_user().login
 
-        if self.DEBUG > 1:
-            print "setting up new pull-request"
+        return self._login
 
-        component_name = head.name.split('/')[-1]
+    def head_label(self, head):
+        # GitHub identifies heads by name, or by user:name for forks.
+        head = getattr(head, 'name', head)
+        if self.canon != self.origin:
+            head = "{}:{}".format(self.login, head)
+
+        return head
+
+    @property
+    def full_name(self):
+        return self.gh_repo.full_name
+
+    def _indexed(self):
+        """The local index, if a recent enough sync lets it answer for GitHub."""
+        if self.offline or self.index is None or not self.index.fresh(self.full_name):
+            return None
+        return self.index
+
+    def _remember(self, pr=None, issue=None):
+        # keeps an index that's been synced in step with what flowhub opens.
+        if self.index is not None:
+            if pr is not None:
+                self.index.put_pull(pr)
+            if issue is not None:
+                self.index.put_issue(issue)
+
+    def sync_index(self, summary):
+        """Brings the local index of pull-requests and issues up to date."""
+        pulls, issues = self.index.sync(self.gh_repo)
+        summary += [
+            Event(
+                "Indexed {} pull-requests and {} issues changed in {}".format(
+                    pulls, issues, self.full_name,
+                ),
+                'index', pulls=pulls, issues=issues,
+            ),
+        ]
+
+    def _open_pulls(self):
+        index = self._indexed()
+        if index is not None:
+            return [
+                github.PullRequest.PullRequest(
+                    self.gh_repo._requester,
+                    {},
+                    {
+                        'number': row['number'],
+                        'title': row['title'],
+                        'state': row['state'],
+                        'url': row['url'],
+                        'html_url': row['html_url'],
+                        'issue_url': row['issue_url'],
+                        'head': {'label': row['head_label'], 'ref': row['head_ref']},
+                        'base': {'ref': row['base_ref']},
+                    },
+                    completed=False,
+                )
+                for row in index.open_pulls()
+            ]
+
+        return self.gh_repo.get_pulls('open')
+
+    def _labels(self):
+        return self.gh_repo.get_labels()
+
+    def issue_for_branch(self, head, gh_repo=None):
+        """The issue a branch is named for (e.g. feature/13-some-name), if any."""
+        component_name = getattr(head, 'name', head).split('/')[-1]
 
         # check for issue-numbers at the front of the branch name
-        # if there is one, attach the pull-request to that issue.
         match = re.match('^\d+', component_name)
         if match:
-            issue_number = match.group()
-            issue = self.gh_repo.get_issue(int(issue_number))
+            return self.get_issue(int(match.group()), gh_repo=gh_repo)
+
+        return None
+
+    @sanitize_refs
+    def create_from_branch_name(self, base, head, summary, issue=None):
+
+        if self.DEBUG > 1:
+            print "setting up new pull-request"
+
+        # if the branch is named for an issue, attach the pull-request to it.
+        if issue is None:
+            issue = self.issue_for_branch(head)
+
+        if issue is not None:
             pr = self.gh_repo.create_pull(
                 issue=issue,
                 base=base.name,
-                head=head.name,
+                head=head,
             )
+            self._remember(pr=pr)
             summary += [
-                "New pull request created: {} into {}"
-                "\n\turl: {}".format(
-                    head,
-                    base,
-                    pr.issue_url,
-                )
+                Event(
+                    "New pull request created: {} into {}"
+                    "\n\turl: {}".format(
+                        head,
+                        base,
+                        pr.issue_url,
+                    ),
+                    'pull-request', refs=[head, base.name], number=pr.number, url=pr.html_url,
+                ),
             ]
             return pr
 
@@ -85,66 +180,229 @@ class PullRequestManager(Manager):
         pr = self.gh_repo.create_pull(
             issue=issue,
             base=base.name,
-            head=head.name,
+            head=head,
         )
+        self._remember(pr=pr)
 
         summary += [
-            "New pull request created: {} into {}"
-            "\n\turl: {}".format(
-                head,
-                base,
-                pr.issue_url,
-            )
+            Event(
+                "New pull request created: {} into {}"
+                "\n\turl: {}".format(
+                    head,
+                    base,
+                    pr.issue_url,
+                ),
+                'pull-request', refs=[head, base.name], number=pr.number, url=pr.html_url,
+            ),
         ]
 
         return pr
 
     @sanitize_refs
-    def add_to_pull(self, base, head, summary):
+    def find_pull(self, base, head):
+        """The open pull-request for head, if there is one."""
         if self.offline:
-            return False
+            return None
 
         prs = [
-            x for x in self.gh_repo.get_pulls('open')
+            x for x in self._open_pulls()
             if x.head.label == head
-            or x.head.label == "{}:{}".format(self.gh.get_user().login, head)
+            or x.head.label == "{}:{}".format(self.login, head)
         ]
 
+        return prs[0] if prs else None
+
+    def open_pulls_by_head(self):
+        """Every open pull-request, by head label, from one (paginated) listing."""
+        return dict((pr.head.label, pr) for pr in self._open_pulls())
+
+    def _create_for_branch(self, gh_repo, base, head, label):
+        issue = self.issue_for_branch(head, gh_repo=gh_repo)
+        if issue is not None:
+            pr = gh_repo.create_pull(issue=issue, base=base.name, head=label)
+        else:
+            title = head.split('/')[-1].replace('-', ' ').replace('_', ' ')
+            pr = gh_repo.create_pull(
+                title=title[:1].upper() + title[1:],
+                body="",
+                base=base.name,
+                head=label,
+            )
+
+        self._remember(pr=pr)
+        return pr
+
+    def create_pulls(self, base, heads, summary, pulls=None, concurrency=4):
+        """Opens pull-requests for every head that doesn't have one, without asking.
+
+        pulls is open_pulls_by_head(), if it's already known. Missing
+        pull-requests are opened concurrency at a time, for as long as the
+        rate limit lasts; a branch named for an issue is attached to it.
+        Returns a PullResult for each head, in order.
+
+        A PyGithub client sends every request over one connection, so each
+        request in flight gets a client of its own, from new_client(); without
+        one, they're opened one at a time.
+        """
+        if pulls is None:
+            pulls = self.open_pulls_by_head()
+
+        results = {}
+        missing = []
+        for head in heads:
+            name = getattr(head, 'name', head)
+            label = self.head_label(head)
+            pr = pulls.get(label) or pulls.get("{}:{}".format(self.login, label))
+            if pr:
+                results[name] = PullResult(name, 'existing', pr, None)
+                summary += [
+                    Event(
+                        "Pull-request already open for {}"
+                        "\n\turl: {}".format(name, pr.issue_url),
+                        'pull-request', refs=[name, base.name], number=pr.number, url=pr.html_url,
+                        existing=True,
+                    ),
+                ]
+            else:
+                missing.append((name, label))
+
+        if self.new_client is None:
+            gh_repos = [self.gh_repo]
+        else:
+            gh_repos = [
+                self.new_client().get_repo(self.full_name, lazy=True)
+                for _ in range(min(concurrency, len(missing)))
+            ]
+
+        budget = self.gh.rate_limiting[0] - RATE_LIMIT_RESERVE
+        while missing:
+            batch = []
+            while missing and len(batch) < len(gh_repos):
+                name, label = missing.pop(0)
+                # one request to open it, and one to find the issue it's named for
+                cost = 2 if re.match('^\d+', name.split('/')[-1]) else 1
+                if cost > budget:
+                    results[name] = PullResult(name, 'skipped', None, "rate limit budget used up")
+                    continue
+                budget -= cost
+                batch.append((name, in_background(
+                    self._create_for_branch, gh_repos[len(batch)], base, name, label,
+                )))
+
+            for name, task in batch:
+                try:
+                    pr = task.result()
+                except GithubException as e:
+                    results[name] = PullResult(name, 'failed', None, str(e))
+                    summary += [
+                        Event(
+                            "Couldn't open a pull-request for {}: {}".format(name, e),
+                            'pull-request', refs=[name, base.name], error=str(e),
+                        ),
+                    ]
+                    continue
+
+                results[name] = PullResult(name, 'created', pr, None)
+                summary += [
+                    Event(
+                        "New pull request created: {} into {}"
+                        "\n\turl: {}".format(name, base, pr.issue_url),
+                        'pull-request', refs=[name, base.name], number=pr.number, url=pr.html_url,
+                    ),
+                ]
+
+        return [results[getattr(head, 'name', head)] for head in heads]
+
+    def merged_since(self, base, since=None):
+        """Pull-requests merged into base since a (UTC) datetime, oldest first.
+
+        One search finds them all, a page at a time, however many commits
+        they brought along.
+        """
+        query = [
+            "repo:{}".format(self.gh_repo.full_name),
+            "is:pr",
+            "is:merged",
+            "base:{}".format(getattr(base, 'name', base)),
+        ]
+        if since is not None:
+            query += ["merged:>={}".format(since.strftime('%Y-%m-%dT%H:%M:%SZ'))]
+
+        return [
+            {
+                'number': issue.number,
+                'title': issue.title,
+                'url': issue.html_url,
+                'author': issue.user.login if issue.user else None,
+            }
+            for issue in self.gh.search_issues(" ".join(query), sort='created', order='asc')
+        ]
+
+    def add_to_pull(self, base, head, summary, pr=None):
+        if self.offline:
+            return False
+
+        if pr is None:
+            pr = self.find_pull(base, head)
+
         # If there's already a pull-request, don't bother hitting the gh api.
-        if prs:
-            pr = prs[0]
+        if pr:
             summary += [
-                "New commits added to existing pull-request"
-                "\n\turl: {}".format(pr.issue_url)
+                Event(
+                    "New commits added to existing pull-request"
+                    "\n\turl: {}".format(pr.issue_url),
+                    'pull-request', refs=[self.head_label(head), base.name], number=pr.number,
+                    url=pr.html_url, existing=True,
+                ),
             ]
             return pr
 
         else:
             return False
 
-    def get_issue(self, issue_num):
+    def get_issue(self, issue_num, gh_repo=None):
+        index = self._indexed()
+        row = index.issue(issue_num) if index is not None else None
+        if row is not None:
+            return github.Issue.Issue(
+                self.gh_repo._requester,
+                {},
+                {
+                    'number': row['number'],
+                    'title': row['title'],
+                    'state': row['state'],
+                    'url': row['url'],
+                    'html_url': row['html_url'],
+                },
+                completed=False,
+            )
+
         try:
-            return self.gh_repo.get_issue(issue_num)
+            return (gh_repo or self.gh_repo).get_issue(issue_num)
         except GithubException:
             return None
 
     def open_issue(self, title, body, labels, summary):
-        gh_labels = [l for l in self.gh_repo.get_labels() if l.name in labels]
+        gh_labels = [l for l in self._labels() if l.name in labels]
 
         issue = self.gh_repo.create_issue(
             title=title,
             body=body or "No description provided.",
             labels=gh_labels,
         )
+        self._remember(issue=issue)
 
         summary += [
-            'Opened issue #{}: {}{}\n'
-            '\turl: {}'.format(
-                issue.number,
-                title,
-                '\n\t[{}]'.format(' '.join([l.name for l in gh_labels])) if gh_labels else '',
-                issue.url,
-            )
+            Event(
+                'Opened issue #{}: {}{}\n'
+                '\turl: {}'.format(
+                    issue.number,
+                    title,
+                    '\n\t[{}]'.format(' '.join([l.name for l in gh_labels])) if gh_labels else '',
+                    issue.url,
+                ),
+                'open-issue', number=issue.number, url=issue.html_url,
+            ),
         ]
 
         return issue
@@ -19,7 +19,18 @@ along with this program; if not, write to the Free Software
 Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """
 
+from collections import namedtuple
+import time
+
+import git
+
+from flowhub.background import in_background
+from flowhub.events import Event
 from flowhub.managers import Manager
+from flowhub.state import RELEASE
+
+
+StageResult = namedtuple("StageResult", ["remote", "status", "seconds", "error"])
 
 
 class ReleaseManager(Manager):
@@ -36,104 +47,195 @@ class ReleaseManager(Manager):
             branch_name,
             commit=self.develop,
         )
+        self.state.start(RELEASE, branch_name, self.sha(branch))
         summary += [
-            "New branch {} created, from branch {}".format(
-                branch_name,
-                self.develop,
+            Event(
+                "New branch {} created, from branch {}".format(
+                    branch_name,
+                    self.develop,
+                ),
+                'branch', refs=[branch_name], sha=self.sha(branch),
             ),
         ]
 
         if self.DEBUG > 0:
             print "Adding a tracking branch to your GitHub repo"
 
-        if not self.offline:
-            self.canon.push(
-                "{0}:{0}".format(branch),
-                set_upstream=True,
-            )
-
-            summary += [
-                "Pushed {} to {}".format(branch, self.canon.name),
-            ]
+        self._report_push(
+            summary,
+            self.push(self.canon, "{0}:{0}".format(branch), set_upstream=True),
+            "Pushed {} to {}".format(branch, self.canon.name),
+            "Recorded push of {} to {}".format(branch, self.canon.name),
+            'push', remote=self.canon.name, refs=[str(branch)],
+        )
 
         return branch
 
-    def publish(self, name, with_delete, tag_info, summary):
-        if self.offline:
-            return False
+    def publish(self, name, with_delete, tag_info, summary, resume=False):
         release_name = "{}{}".format(
             self._prefix,
             name,
         )
 
-        self.canon.fetch()
-        summary += [
-            "Latest objects fetched from {}".format(self.canon),
-        ]
+        log = self._begin_publish(release_name, tag_info, resume)
+
+        if not self._resumed(log, 'fetch', summary):
+            if self.fetch(self.canon):
+                summary += [
+                    Event(
+                        "Latest objects fetched from {}".format(self.canon),
+                        'fetch', remote=str(self.canon),
+                    ),
+                ]
+            log.complete('fetch')
 
         # TODO: ensure equality of remote and local master/develop branches
-        # TODO: handle merge conflicts.
         # merge into master
-        self.master.checkout()
-        self.repo.git.merge(
-            release_name,
-            no_ff=True,
-        )
-        summary += [
-            "Branch {} merged into {}".format(release_name, self.master),
-        ]
+        if not self._resumed(log, 'merge-master', summary, sha=self.sha(self.master)):
+            self.master.checkout()
+            self.repo.git.merge(
+                release_name,
+                no_ff=True,
+            )
+            summary += [
+                Event(
+                    "Branch {} merged into {}".format(release_name, self.master),
+                    'merge', refs=[release_name, str(self.master)], sha=self.sha(self.master),
+                ),
+            ]
+            log.complete('merge-master', sha=self.sha(self.master))
 
         # and tag
-        if tag_info:
+        if tag_info and not self._resumed(log, 'tag', summary, sha=self.sha(tag_info.label)):
             self.repo.create_tag(
                 path=tag_info.label,
                 ref=self.master,
                 message=tag_info.message,
             )
             summary += [
-                "New tag ({}) created at {}'s tip".format(tag_info.label, self.master),
+                Event(
+                    "New tag ({}) created at {}'s tip".format(tag_info.label, self.master),
+                    'tag', tag=tag_info.label, sha=self.sha(self.master),
+                ),
             ]
+            log.complete('tag', sha=self.sha(tag_info.label))
 
         # merge into develop
-        self.develop.checkout()
-        self.repo.git.merge(
-            self.master,
-            no_ff=True,
-        )
-        summary += [
-            "Branch {} merged into {}".format(self.master, self.develop),
-        ]
-
-        # push to canon
-        self.canon.push()
-        self.canon.push(tags=True)
-        summary += [
-            "{}, {}, and tags have been pushed to {}".format(
+        if not self._resumed(log, 'merge-develop', summary, sha=self.sha(self.develop)):
+            self.develop.checkout()
+            self.repo.git.merge(
                 self.master,
-                self.develop,
-                self.canon
-            ),
-        ]
-
-        if with_delete:
-            self.repo.delete_head(release_name)
-            self.canon.push(
-                release_name,
-                delete=True,
+                no_ff=True,
             )
             summary += [
-                "Branch {} removed".format(release_name),
+                Event(
+                    "Branch {} merged into {}".format(self.master, self.develop),
+                    'merge', refs=[str(self.master), str(self.develop)], sha=self.sha(self.develop),
+                ),
             ]
+            log.complete('merge-develop', sha=self.sha(self.develop))
 
+        # push to canon
+        refs = [str(self.master), str(self.develop)]
+        pushed = dict((ref, self.sha(ref)) for ref in refs)
+        if not self._resumed(log, 'push', summary, **pushed):
+            self._report_push(
+                summary,
+                self.push(self.canon, self.master, self.develop, tags=True),
+                "{}, {}, and tags have been pushed to {}".format(self.master, self.develop, self.canon),
+                "Recorded push of {}, {}, and tags to {}".format(self.master, self.develop, self.canon),
+                'push', remote=str(self.canon), refs=refs, tags=True,
+            )
+            log.complete('push', **pushed)
+
+        if with_delete:
+            self._remove_published(RELEASE, release_name, summary)
+
+        log.finish()
         return True
 
-    def contribute(self, branch, summary):
+    def remote_sha(self, remote, branch_name):
+        """Where remote's branch_name is right now, or None if it has none."""
+        output = self.repo.git.ls_remote(str(remote), "refs/heads/{}".format(branch_name))
+        for line in output.splitlines():
+            sha, ref = line.split('\t')
+            if ref == "refs/heads/{}".format(branch_name):
+                return sha
+        return None
+
+    def _stage_to(self, remote, branch, sha):
+        started = time.time()
+        try:
+            if not self.offline and self.remote_sha(remote, branch.name) == sha:
+                status = 'up-to-date'
+            elif self.push(remote, "{0}:{0}".format(branch)):
+                status = 'pushed'
+            else:
+                status = 'recorded'
+        except git.GitCommandError as e:
+            error = (e.stderr or '').strip() or str(e)
+            return StageResult(remote, 'failed', time.time() - started, error)
+
+        return StageResult(remote, status, time.time() - started, None)
+
+    def stage(self, branch, remotes, summary, concurrency=4):
+        """Pushes branch to each of the staging remotes, concurrency at a time.
+
+        A remote that already has branch where it is here is left alone,
+        after one ls-remote. Returns a StageResult for each remote, in order.
+        """
+        sha = self.sha(branch)
+        results = []
+        pending = list(remotes)
+        while pending:
+            batch = [
+                in_background(self._stage_to, remote, branch, sha)
+                for remote in pending[:concurrency]
+            ]
+            pending = pending[concurrency:]
+            results += [task.result() for task in batch]
 
-        self.repo.git.push(
-            self.origin,
-            branch,
-            set_upstream=True,
+        for result in results:
+            fields = dict(
+                remote=result.remote, refs=[branch.name], sha=sha,
+                seconds=round(result.seconds, 3),
+            )
+            if result.status == 'failed':
+                summary += [
+                    Event(
+                        "Couldn't stage {} on {}: {}".format(branch, result.remote, result.error),
+                        'stage', error=result.error, **fields
+                    ),
+                ]
+            elif result.status == 'up-to-date':
+                summary += [
+                    Event(
+                        "{} is already staged on {}".format(branch, result.remote),
+                        'stage', existing=True, **fields
+                    ),
+                ]
+            elif result.status == 'recorded':
+                summary += [
+                    Event(
+                        "Recorded push of {} to {}".format(branch, result.remote),
+                        'stage', recorded=True, **fields
+                    ),
+                ]
+            else:
+                summary += [
+                    Event(
+                        "Staged {} on {} ({:.2f}s)".format(branch, result.remote, result.seconds),
+                        'stage', **fields
+                    ),
+                ]
+
+        return results
+
+    def contribute(self, branch, summary):
+        self._report_push(
+            summary,
+            self.push(self.origin, branch, set_upstream=True),
+            "Branch {} pushed to {}".format(branch, self.origin),
+            "Recorded push of {} to {}".format(branch, self.origin),
+            'push', remote=str(self.origin), refs=[str(branch)],
         )
-        summary += [
-            "Branch {} pushed to {}".format(branch, self.origin)
-        ]
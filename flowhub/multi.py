@@ -0,0 +1,220 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from collections import namedtuple
+import multiprocessing
+import os
+import signal
+import sys
+from StringIO import StringIO
+
+from managers.pull_request import RATE_LIMIT_RESERVE
+
+
+# Repositories aren't started once the shared rate limit budget drops to this.
+RESERVE = RATE_LIMIT_RESERVE
+
+RepoResult = namedtuple("RepoResult", [
+    "name", "ok", "error", "output", "stats",
+])
+
+# Per-process state of pool workers.
+_worker = {}
+
+
+class Abort(Exception):
+    """Stops the work in one repository, with a message for the report."""
+
+
+def read_manifest(path):
+    """Repositories listed in a manifest, one per line.
+
+    Blank lines and lines starting with # are skipped; relative paths are
+    relative to the manifest. A line may name the repositories it depends on
+    after a colon ("web: api models"), which only `flowhub train` uses.
+    Returns (name as written, absolute path, dependencies) triples.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    repos = []
+    seen = set()
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            name, _, depends_on = line.partition(':')
+            name = name.strip()
+            repo_path = os.path.normpath(os.path.join(base, os.path.expanduser(name)))
+            if repo_path not in seen:
+                seen.add(repo_path)
+                repos.append((name, repo_path, depends_on.split()))
+
+    return repos
+
+
+def _init_worker(budget):
+    # ctrl-c is the parent's to handle.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker['budget'] = budget
+    _worker['sessions'] = {}
+
+
+def _spend(budget, stats):
+    """Charges a repository's requests to the budget all workers share."""
+    with budget.get_lock():
+        remaining = budget.value
+        if remaining >= 0:
+            remaining -= stats['requests']
+        if stats['rate_remaining'] is not None:
+            if remaining < 0 or stats['rate_remaining'] < remaining:
+                remaining = stats['rate_remaining']
+        budget.value = remaining
+
+
+def in_repo(name, path, work):
+    """Calls work() from inside the repository at path, on a pool worker.
+
+    Whatever work prints, and whatever goes wrong, is captured in the
+    RepoResult. work returns the Engine it used, if any, so its GitHub
+    requests can be charged to the shared budget.
+    """
+    budget = _worker['budget']
+    with budget.get_lock():
+        if 0 <= budget.value <= RESERVE:
+            return RepoResult(
+                name, False, "skipped: GitHub rate limit budget used up", '', None,
+            )
+
+    output = StringIO()
+    streams = sys.stdout, sys.stderr
+    cwd = os.getcwd()
+    engine = None
+    error = None
+    try:
+        os.chdir(path)
+        sys.stdout = sys.stderr = output
+        engine = work()
+    except Abort as e:
+        error = str(e)
+    except SystemExit as e:
+        if e.code:
+            error = "exited with status {}".format(e.code)
+    except EOFError:
+        error = "stopped at a prompt, which can't be answered here"
+    except Exception as e:
+        error = "{}: {}".format(e.__class__.__name__, e)
+    finally:
+        sys.stdout, sys.stderr = streams
+        os.chdir(cwd)
+
+    stats = None
+    if engine is not None:
+        stats = engine.stats.as_dict()
+        _spend(budget, stats)
+
+    return RepoResult(name, error is None, error, output.getvalue(), stats)
+
+
+def run_in_repo(job):
+    """Runs a flowhub command in one repository; this is what pool workers do."""
+    import core
+
+    name, path, argv = job
+    return in_repo(
+        name,
+        path,
+        lambda: core.run(list(argv), sessions=_worker['sessions']),
+    )
+
+
+def pool(jobs, size):
+    """A pool of at most jobs workers (default: twice the CPUs) for size repositories."""
+    jobs = min(jobs or multiprocessing.cpu_count() * 2, size)
+    budget = multiprocessing.Value('i', -1)  # unknown, until GitHub tells us
+    return multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(budget,))
+
+
+def report(argv, results):
+    failed = [r for r in results if not r.ok]
+    lines = [
+        "`flowhub {}` in {} repositories: {} succeeded, {} failed".format(
+            " ".join(argv),
+            len(results),
+            len(results) - len(failed),
+            len(failed),
+        ),
+    ]
+
+    for result in results:
+        lines += [
+            "",
+            "{}{}".format(result.name, "" if result.ok else ": FAILED"),
+        ]
+        lines += [
+            "    {}".format(line)
+            for line in result.output.strip().splitlines()
+            if line.strip()
+        ]
+        if result.error:
+            lines += ["    {}".format(result.error)]
+
+    requests = sum(r.stats['requests'] for r in results if r.stats)
+    remaining = [
+        r.stats['rate_remaining'] for r in results
+        if r.stats and r.stats['rate_remaining'] is not None
+    ]
+    lines += [
+        "",
+        "GitHub requests: {}{}".format(
+            requests,
+            "; rate limit remaining: {}".format(min(remaining)) if remaining else "",
+        ),
+    ]
+    return "\n".join(lines)
+
+
+def run_multi(manifest, argv, jobs=None):
+    """Runs `flowhub <argv>` in every repository of manifest, on a process pool.
+
+    Each worker process keeps one GitHub client per token for all the
+    repositories it handles, and all of them draw on one rate limit budget.
+    Returns the results, in manifest order.
+    """
+    repos = read_manifest(manifest)
+    if not repos:
+        return []
+
+    workers = pool(jobs, len(repos))
+    try:
+        results = workers.map(
+            run_in_repo,
+            [(name, path, argv) for name, path, _ in repos],
+            chunksize=1,
+        )
+        workers.close()
+    except KeyboardInterrupt:
+        workers.terminate()
+        raise
+    finally:
+        workers.join()
+
+    return results
@@ -0,0 +1,186 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import types
+
+import git
+import github.Requester
+
+from stats import endpoint
+
+PROFILE_PATH = 'flowhub.prof'
+
+
+def profile_option(argv):
+    """Takes --profile[=path] out of argv; returns what's left, and the path.
+
+    The option is picked out before argparse sees it, so `--profile feature`
+    can't be mistaken for a path.
+    """
+    remaining, path = [], None
+    for arg in argv:
+        if arg == '--profile':
+            path = PROFILE_PATH
+        elif arg.startswith('--profile='):
+            path = arg[len('--profile='):] or PROFILE_PATH
+        else:
+            remaining.append(arg)
+
+    return remaining, path
+
+
+def trace_path(path):
+    """Where the trace goes, alongside the pstats: flowhub.prof -> flowhub.trace.json."""
+    return os.path.splitext(path)[0] + '.trace.json'
+
+
+def _traced_classes():
+    from engine import Engine
+    from managers import Manager
+    from managers.graphql import GraphQLClient
+
+    classes = [Engine, Manager, GraphQLClient]
+    for cls in classes:
+        classes += [sub for sub in cls.__subclasses__() if sub not in classes]
+    return classes
+
+
+def _method_span(name):
+    # named after the instance's class, so inherited methods say whose they ran as.
+    return lambda owner, *args, **kwargs: "{}.{}".format(type(owner).__name__, name)
+
+
+class Profile(object):
+    """Profiles a command, from the engine's construction to the summary.
+
+    cProfile's statistics go to path, to be read with pstats; a trace in the
+    Chrome trace event format (which speedscope and chrome://tracing both
+    open) goes alongside it. The trace has a span for every call of an Engine
+    or manager method, every git command and every GitHub request, on
+    whichever thread made it.
+    """
+
+    def __init__(self, path, classes=None):
+        self.path = path
+        self.trace_path = trace_path(path)
+        self.classes = _traced_classes() if classes is None else classes
+        self.spans = []
+        self.profiler = cProfile.Profile()
+        self._lock = threading.Lock()
+        self._patched = []
+        self._started = None
+
+    def _record(self, name, category, started, finished):
+        thread = threading.current_thread()
+        with self._lock:
+            self.spans.append((name, category, started, finished, thread.ident, thread.name))
+
+    def _patch(self, owner, attribute, span_name, category):
+        original = owner.__dict__[attribute]
+        profile = self
+
+        @functools.wraps(original)
+        def traced(*args, **kwargs):
+            started = time.time()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                profile._record(span_name(*args, **kwargs), category, started, time.time())
+
+        setattr(owner, attribute, traced)
+        self._patched.append((owner, attribute, original))
+
+    def start(self):
+        for cls in self.classes:
+            for attribute, value in cls.__dict__.items():
+                if not isinstance(value, types.FunctionType):
+                    continue
+                if attribute.startswith('__') and attribute != '__init__':
+                    continue
+                self._patch(cls, attribute, _method_span(value.__name__), 'flowhub')
+
+        self._patch(
+            git.cmd.Git, 'execute',
+            lambda owner, command, *args, **kwargs: " ".join(command[:2]),
+            'git',
+        )
+        self._patch(
+            github.Requester.Requester, '_Requester__requestRaw',
+            lambda owner, cnx, verb, url, *args: "{} {}".format(
+                verb, endpoint(url, getattr(owner, '_Requester__prefix', '')),
+            ),
+            'github',
+        )
+
+        self._started = time.time()
+        self.profiler.enable()
+        return self
+
+    def stop(self):
+        self.profiler.disable()
+        finished = time.time()
+        while self._patched:
+            owner, attribute, original = self._patched.pop()
+            setattr(owner, attribute, original)
+
+        self._record('flowhub', 'flowhub', self._started, finished)
+        self.write()
+
+    def trace(self):
+        """The spans as Chrome trace events, in microseconds since the start."""
+        pid = os.getpid()
+        events = []
+        threads = {}
+        for name, category, started, finished, tid, thread_name in self.spans:
+            threads[tid] = thread_name
+            events.append({
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': int((started - self._started) * 1e6),
+                'dur': int((finished - started) * 1e6),
+                'pid': pid,
+                'tid': tid,
+            })
+
+        events.sort(key=lambda e: (e['ts'], -e['dur']))
+        events += [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in sorted(threads.items())
+        ]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self):
+        self.profiler.dump_stats(self.path)
+        with open(self.trace_path, 'w') as f:
+            json.dump(self.trace(), f)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
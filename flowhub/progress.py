@@ -0,0 +1,129 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import re
+import time
+
+import git
+
+# The size git reports alongside a transfer, e.g. "1.20 MiB | 2.00 MiB/s".
+SIZE = re.compile(r'([\d.]+) (bytes|KiB|MiB|GiB)')
+UNITS = {'bytes': 1, 'KiB': 1 << 10, 'MiB': 1 << 20, 'GiB': 1 << 30}
+
+# Small fetches are unpacked straight into loose objects, which git reports
+# under a name GitPython doesn't know.
+UNPACKING = re.compile(r'Unpacking objects:\s+\d+% \((\d+)/\d+\)(.*)')
+
+
+def parse_size(message):
+    """The number of bytes in a progress message, or None if it has none."""
+    match = SIZE.search(message or '')
+    if match is None:
+        return None
+    return int(float(match.group(1)) * UNITS[match.group(2)])
+
+
+def format_size(size):
+    for unit in ('GiB', 'MiB', 'KiB'):
+        if size >= UNITS[unit]:
+            return "{:.2f} {}".format(float(size) / UNITS[unit], unit)
+    return "{} bytes".format(size)
+
+
+def terminal(stream):
+    """stream, if someone's watching it; progress is only drawn on a tty."""
+    isatty = getattr(stream, 'isatty', None)
+    if isatty is not None and isatty():
+        return stream
+    return None
+
+
+class TransferProgress(git.RemoteProgress):
+    """Objects and bytes moved by one fetch or push.
+
+    Fed git's --progress output, it keeps a running count, and draws it on
+    stream (when given) as it changes.
+    """
+
+    def __init__(self, operation, remote, stream=None):
+        super(TransferProgress, self).__init__()
+        self.operation = operation
+        self.remote = str(remote)
+        self.stream = stream
+        self.objects = 0
+        self.bytes = 0
+        self.started = time.time()
+        self.seconds = None
+        self._drawn = False
+
+    def _parse_progress_line(self, line):
+        # A line holds every \r-separated update since the last newline;
+        # GitPython gives up on the whole line at the first one it doesn't
+        # recognise, so they're handed over one at a time.
+        line = line.decode('utf-8') if isinstance(line, bytes) else line
+        failed = []
+        for update in line.split('\r'):
+            if update.strip():
+                failed += super(TransferProgress, self)._parse_progress_line(update)
+        return failed
+
+    def update(self, op_code, cur_count, max_count=None, message=''):
+        if op_code & (self.RECEIVING | self.WRITING):
+            self._count(cur_count, message)
+
+    def line_dropped(self, line):
+        match = UNPACKING.search(line)
+        if match is not None:
+            self._count(match.group(1), match.group(2))
+
+    def _count(self, objects, message):
+        self.objects = int(objects or 0)
+        size = parse_size(message)
+        if size is not None:
+            self.bytes = size
+        self._draw()
+
+    def describe(self):
+        return "{} {}: {} objects, {}".format(
+            self.operation,
+            self.remote,
+            self.objects,
+            format_size(self.bytes),
+        )
+
+    def _draw(self):
+        if self.stream is None:
+            return
+        self.stream.write("\r" + self.describe())
+        self.stream.flush()
+        self._drawn = True
+
+    def finish(self):
+        """Stops the clock on this transfer."""
+        self.seconds = time.time() - self.started
+        if self._drawn:
+            self.stream.write(", {:.2f}s\n".format(self.seconds))
+            self.stream.flush()
+        return self
+
+    def stderr(self):
+        """What git said that wasn't progress, for reporting a failure."""
+        return "\n".join(self.error_lines + self.other_lines)
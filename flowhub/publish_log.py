@@ -0,0 +1,96 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import json
+import os
+import time
+
+from storage import atomic_write, flowhub_path
+
+
+class PublishLog(object):
+    """The steps of a release or hotfix publish completed so far.
+
+    .git/flowhub/publish/<branch> starts with what the publish was asked to
+    do, followed by a JSON line per completed step, holding whatever that
+    step left behind (usually a commit) so a resumed publish can check it
+    still holds. The file is removed once the publish finishes.
+    """
+
+    def __init__(self, git_dir, branch):
+        self.branch = branch
+        self.path = flowhub_path(git_dir, 'publish', branch)
+
+    def records(self):
+        if not os.path.exists(self.path):
+            return []
+
+        with open(self.path, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    @property
+    def started(self):
+        """Whether a publish of this branch was started and never finished."""
+        return os.path.exists(self.path)
+
+    @property
+    def tag_info(self):
+        """The tag label and message the interrupted publish was given."""
+        records = self.records()
+        if not records or records[0].get('tag') is None:
+            return None
+        return records[0]['tag']
+
+    @property
+    def last_step(self):
+        steps = [r['step'] for r in self.records()[1:]]
+        return steps[-1] if steps else None
+
+    def begin(self, tag_info):
+        atomic_write(self.path, json.dumps({
+            'branch': self.branch,
+            'tag': list(tag_info) if tag_info else None,
+            'began_at': time.time(),
+        }, sort_keys=True) + '\n')
+
+    def done(self, step, **facts):
+        """Whether step was completed, and what it left behind is unchanged."""
+        for record in self.records()[1:]:
+            if record['step'] == step:
+                return all(record['facts'].get(k) == v for k, v in facts.items())
+        return False
+
+    def complete(self, step, **facts):
+        record = {
+            'step': step,
+            'facts': facts,
+            'completed_at': time.time(),
+        }
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record, sort_keys=True) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+        return record
+
+    def finish(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
@@ -0,0 +1,69 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import json
+import os
+import re
+
+from storage import atomic_write, flowhub_path
+
+
+class NotesCache(object):
+    """Merged pull-requests already looked up, by tag range.
+
+    Kept under .git/flowhub/release-notes/, so that publishing again (say,
+    after a failed push) doesn't search GitHub again.
+    """
+
+    def __init__(self, git_dir):
+        self.git_dir = git_dir
+
+    def path(self, since, head):
+        name = "{}..{}".format(since or 'start', head)
+        return flowhub_path(self.git_dir, 'release-notes', re.sub(r'[^\w.-]', '_', name) + '.json')
+
+    def get(self, since, head):
+        path = self.path(since, head)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def put(self, since, head, pulls):
+        atomic_write(self.path(since, head), json.dumps(pulls, sort_keys=True))
+
+
+def render(pulls, since=None):
+    if not pulls:
+        return ""
+
+    lines = [
+        "Pull-requests merged since {}:".format(since) if since else "Pull-requests merged:",
+    ]
+    for pull in pulls:
+        lines += [" - #{} {}{}".format(
+            pull['number'],
+            pull['title'],
+            " (@{})".format(pull['author']) if pull.get('author') else "",
+        )]
+
+    return "\n".join(lines)
@@ -0,0 +1,107 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from contextlib import contextmanager
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # no locking on Windows; the writes themselves are still atomic.
+    fcntl = None
+
+from storage import atomic_write, flowhub_path
+
+
+RELEASE = 'release'
+HOTFIX = 'hotfix'
+
+
+def refs_stamp(common_dir, prefix):
+    """Modification times that change whenever a branch starting with prefix
+    is made or deleted: packed-refs', and the directories its loose ref
+    would be in.
+    """
+    paths = [os.path.join(common_dir, 'packed-refs')]
+    directory = os.path.join(common_dir, 'refs', 'heads')
+    paths.append(directory)
+    for part in prefix.split('/')[:-1]:
+        directory = os.path.join(directory, part)
+        paths.append(directory)
+
+    stamp = []
+    for path in paths:
+        try:
+            stamp.append(os.stat(path).st_mtime)
+        except OSError:
+            stamp.append(None)
+    return stamp
+
+
+class State(object):
+    """The release and hotfix in the works, kept in .git/flowhub/state.
+
+    Each is recorded with its branch name, the commit it started from and
+    when. Changes are made under a lock, and written all at once.
+    """
+
+    def __init__(self, git_dir):
+        self.path = flowhub_path(git_dir, 'state')
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def get(self, kind):
+        return self._read().get(kind)
+
+    @contextmanager
+    def update(self):
+        """Yields the state to change; it's saved when the block finishes."""
+        with open(self.path + '.lock', 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = self._read()
+                yield state
+                atomic_write(self.path, json.dumps(state, indent=2, sort_keys=True) + '\n')
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def start(self, kind, name, base):
+        with self.update() as state:
+            state[kind] = {
+                'name': name,
+                'base': base,
+                'started_at': time.time(),
+            }
+
+    def finish(self, kind, name):
+        """Forgets kind, if name is still the one in the works."""
+        with self.update() as state:
+            if (state.get(kind) or {}).get('name') == name:
+                del state[kind]
@@ -0,0 +1,305 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from collections import OrderedDict, namedtuple
+import re
+import sys
+import threading
+import time
+import urlparse
+
+
+Call = namedtuple("Call", [
+    "verb", "endpoint", "caller", "status", "bytes", "seconds", "page",
+])
+
+Transfer = namedtuple("Transfer", [
+    "operation", "remote", "caller", "objects", "bytes", "seconds",
+])
+
+# Most specific first; each turns a concrete path into the endpoint it hits.
+ENDPOINT_PATTERNS = [
+    (re.compile(r'^/repos/[^/]+/[^/]+'), '/repos/:owner/:repo'),
+    (re.compile(r'^/users/[^/]+'), '/users/:user'),
+    (re.compile(r'/labels/[^/]+$'), '/labels/:name'),
+    (re.compile(r'/\d+(?=/|$)'), '/:number'),
+]
+
+# Frames from these modules never count as the caller of a request.
+PLUMBING = ('flowhub.stats', 'flowhub.background', 'flowhub.decorators', 'flowhub.profiling')
+
+
+def endpoint(path, prefix=''):
+    """The API endpoint a request path belongs to, e.g. /repos/:owner/:repo/pulls."""
+    path = urlparse.urlparse(path).path
+    if prefix and path.startswith(prefix):
+        path = path[len(prefix):]
+
+    for pattern, replacement in ENDPOINT_PATTERNS:
+        path = pattern.sub(replacement, path)
+
+    return path
+
+
+def caller(frame):
+    """Which part of flowhub asked for a request, e.g. PullRequestManager.add_to_pull.
+
+    That's the outermost manager method on the stack, so work done by helpers
+    and lazy properties is charged to the method that needed it. Outside of
+    the managers, it's the nearest flowhub function.
+    """
+    nearest = None
+    outermost_manager = None
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        # decorators' wrappers stand in for the method they decorate.
+        if (module.startswith('flowhub.') and module not in PLUMBING
+                and frame.f_code.co_name != 'wrapper'):
+            name = frame.f_code.co_name
+            owner = frame.f_locals.get('self')
+            if owner is not None:
+                name = "{}.{}".format(type(owner).__name__, name)
+                if type(owner).__module__.startswith('flowhub.managers'):
+                    outermost_manager = name
+
+            if nearest is None:
+                nearest = name
+
+        frame = frame.f_back
+
+    return outermost_manager or nearest or '(unknown)'
+
+
+_nesting = threading.local()
+
+
+def _count_requests(requester):
+    prefix = getattr(requester, '_Requester__prefix', '')
+    request_raw = requester._Requester__requestRaw
+
+    def counted_request_raw(cnx, verb, url, request_headers, input):
+        # PyGithub follows redirects (and retries 202s) by calling itself;
+        # those round trips count on their own, so time spent in them
+        # is not charged to this one.
+        nested = _nesting.__dict__.setdefault('nested', [])
+        nested.append(0.0)
+        started = time.time()
+        status, headers, output = None, {}, ''
+        try:
+            status, headers, output = request_raw(
+                cnx, verb, url, request_headers, input,
+            )
+            return status, headers, output
+        finally:
+            inner = nested.pop()
+            seconds = time.time() - started
+            if nested:
+                nested[-1] += seconds
+            if inner:
+                output = ''
+            requester.flowhub_stats.record(
+                verb, url, status, output, seconds - inner,
+                headers=headers, prefix=prefix,
+            )
+
+    requester._Requester__requestRaw = counted_request_raw
+
+
+class Totals(object):
+    def __init__(self):
+        self.requests = 0
+        self.pages = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def add(self, call):
+        self.requests += 1
+        self.pages += call.page
+        self.bytes += call.bytes
+        self.seconds += call.seconds
+
+    def as_dict(self):
+        return OrderedDict([
+            ('requests', self.requests),
+            ('pages', self.pages),
+            ('bytes', self.bytes),
+            ('seconds', round(self.seconds, 3)),
+        ])
+
+
+class RequestStats(object):
+    """Accounting of the GitHub API requests made while running a command.
+
+    instrument() hooks a PyGithub client; GraphQLClient reports its requests
+    through record(). Calls are broken down by endpoint and by caller.
+    The managers' fetches and pushes are reported through record_transfer().
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.calls = []
+        self.transfers = []
+        self.rate_remaining = None
+        self._lock = threading.Lock()
+
+    def record(self, verb, path, status, body, seconds, headers=None, prefix='', page=None):
+        headers = headers or {}
+        body = body or ''
+        if page is None:
+            # a page is one response of a listing: an array, or a Link'd result.
+            page = body.lstrip()[:1] == '[' or 'link' in headers
+
+        call = Call(
+            verb,
+            endpoint(path, prefix),
+            caller(sys._getframe(1)),
+            status,
+            len(body),
+            seconds,
+            bool(page),
+        )
+        with self._lock:
+            self.calls.append(call)
+            if 'x-ratelimit-remaining' in headers:
+                self.rate_remaining = int(headers['x-ratelimit-remaining'])
+
+        return call
+
+    def record_transfer(self, operation, remote, objects, bytes, seconds):
+        transfer = Transfer(
+            operation,
+            remote,
+            caller(sys._getframe(1)),
+            objects,
+            bytes,
+            seconds,
+        )
+        with self._lock:
+            self.transfers.append(transfer)
+
+        return transfer
+
+    def instrument(self, gh):
+        """Count every request gh (a github.Github) sends from now on.
+
+        A client can be handed on to another RequestStats, as `flowhub multi`
+        does from one repository to the next; it reports to the latest one.
+        """
+        requester = gh._Github__requester
+        if getattr(requester, 'flowhub_stats', None) is None:
+            _count_requests(requester)
+        requester.flowhub_stats = self
+        return gh
+
+    def totals(self):
+        totals = Totals()
+        for call in self.calls:
+            totals.add(call)
+        return totals
+
+    def _group(self, key):
+        groups = OrderedDict()
+        for call in self.calls:
+            groups.setdefault(key(call), Totals()).add(call)
+
+        return sorted(
+            groups.items(),
+            key=lambda (name, totals): (-totals.requests, name),
+        )
+
+    def by_endpoint(self):
+        return self._group(lambda call: "{} {}".format(call.verb, call.endpoint))
+
+    def by_caller(self):
+        return self._group(lambda call: call.caller)
+
+    def as_dict(self):
+        stats = self.totals().as_dict()
+        stats['elapsed'] = round(time.time() - self.started, 3)
+        stats['rate_remaining'] = self.rate_remaining
+        for name, groups in [
+            ('endpoints', self.by_endpoint()),
+            ('callers', self.by_caller()),
+        ]:
+            stats[name] = OrderedDict(
+                (key, totals.as_dict()) for key, totals in groups
+            )
+        stats['transfers'] = [
+            OrderedDict([
+                ('operation', t.operation),
+                ('remote', t.remote),
+                ('caller', t.caller),
+                ('objects', t.objects),
+                ('bytes', t.bytes),
+                ('seconds', round(t.seconds, 3)),
+            ])
+            for t in self.transfers
+        ]
+        return stats
+
+    def report(self):
+        totals = self.totals()
+        lines = [
+            "GitHub requests: {} ({} pages, {} bytes, {:.2f}s of {:.2f}s)".format(
+                totals.requests,
+                totals.pages,
+                totals.bytes,
+                totals.seconds,
+                time.time() - self.started,
+            ),
+        ]
+        if self.rate_remaining is not None:
+            lines += ["Rate limit remaining: {}".format(self.rate_remaining)]
+
+        for heading, groups in [
+            ('endpoint', self.by_endpoint()),
+            ('caller', self.by_caller()),
+        ]:
+            if not groups:
+                continue
+            lines += [
+                "",
+                "{:>8} {:>6} {:>9} {:>8}  {}".format(
+                    'requests', 'pages', 'bytes', 'seconds', heading,
+                ),
+            ]
+            lines += [
+                "{:>8} {:>6} {:>9} {:>8.3f}  {}".format(
+                    t.requests, t.pages, t.bytes, t.seconds, name,
+                )
+                for name, t in groups
+            ]
+
+        if self.transfers:
+            lines += [
+                "",
+                "{:>8} {:>9} {:>8}  {}".format(
+                    'objects', 'bytes', 'seconds', 'transfer',
+                ),
+            ]
+            lines += [
+                "{:>8} {:>9} {:>8.3f}  {} {} ({})".format(
+                    t.objects, t.bytes, t.seconds, t.operation, t.remote, t.caller,
+                )
+                for t in self.transfers
+            ]
+
+        return "\n".join(lines)
@@ -0,0 +1,198 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from collections import namedtuple
+import subprocess
+import time
+
+
+BranchStatus = namedtuple("BranchStatus", [
+    "name",          # e.g. feature/faster-sync
+    "base",          # the branch it's compared with: develop or master
+    "ahead",         # commits it has that base doesn't
+    "behind",        # commits base has that it doesn't
+    "upstream",      # e.g. origin/feature/faster-sync, or None
+    "track",         # how it stands with upstream: 'ahead 1', 'gone', '' ...
+    "committed_at",  # its last commit's timestamp
+    "current",       # whether it's checked out
+])
+
+# Tab-separated, so none of the fields can run into each other.
+REF_FORMAT = '%09'.join([
+    '%(refname:short)',
+    '%(objectname)',
+    '%(upstream:short)',
+    '%(upstream:track,nobracket)',
+    '%(committerdate:unix)',
+    '%(HEAD)',
+])
+
+
+Ref = namedtuple("Ref", ["name", "sha", "upstream", "track", "committed_at", "current"])
+
+
+def read_heads(repo):
+    """Every local branch, with its upstream's state, in one for-each-ref."""
+    heads = []
+    for line in repo.git.for_each_ref('refs/heads', format=REF_FORMAT).splitlines():
+        name, sha, upstream, track, committed_at, head = line.split('\t')
+        heads.append(Ref(
+            name, sha, upstream or None, track, int(committed_at or 0), head == '*',
+        ))
+    return heads
+
+
+def read_parents(repo, tips):
+    """The parents of every commit reachable from tips, from one rev-list.
+
+    The tips are fed on stdin, so there can be any number of them.
+    """
+    process = repo.git.rev_list(
+        '--parents', '--stdin', istream=subprocess.PIPE, as_process=True,
+    )
+    process.stdin.write(''.join('{}\n'.format(tip) for tip in set(tips)))
+    process.stdin.close()
+
+    parents = {}
+    for line in process.stdout:
+        commits = line.split()
+        parents[commits[0]] = commits[1:]
+    process.wait()
+    return parents
+
+
+class Ancestry(object):
+    """The history of a base branch, for telling how far others have diverged.
+
+    Walking the base's first-parent line from its root, each commit is
+    numbered by the first mainline commit whose history takes it in, so
+    "the history of mainline commit k" is every commit numbered k or less,
+    and its size is counted once for all.
+    """
+
+    def __init__(self, parents, tip):
+        self.parents = parents
+        mainline = []
+        commit = tip
+        while commit is not None:
+            mainline.append(commit)
+            commit = parents[commit][0] if parents.get(commit) else None
+        mainline.reverse()
+
+        self.mainline = dict((commit, k) for k, commit in enumerate(mainline))
+        self.position = {}
+        self.sizes = []
+        for k, commit in enumerate(mainline):
+            pending = [commit]
+            while pending:
+                commit = pending.pop()
+                if commit in self.position:
+                    continue
+                self.position[commit] = k
+                pending.extend(parents.get(commit, ()))
+            self.sizes.append(len(self.position))
+
+    def divergence(self, tip):
+        """(ahead, behind): commits tip has that the base doesn't, and vice versa."""
+        # walk down from tip to where it meets the base's history.
+        ahead, meets, seen, pending = 0, set(), set(), [tip]
+        while pending:
+            commit = pending.pop()
+            if commit in seen:
+                continue
+            seen.add(commit)
+            if commit in self.position:
+                meets.add(commit)
+            else:
+                ahead += 1
+                pending.extend(self.parents.get(commit, ()))
+
+        # the base's history that tip shares: that of the newest mainline
+        # commit it meets, plus whatever the others bring along.
+        newest = max([self.mainline[c] for c in meets if c in self.mainline] or [-1])
+        shared = self.sizes[newest] if newest >= 0 else 0
+        counted = set()
+        pending = [c for c in meets if c not in self.mainline]
+        while pending:
+            commit = pending.pop()
+            if commit in counted or self.position[commit] <= newest:
+                continue
+            counted.add(commit)
+            pending.extend(self.parents.get(commit, ()))
+
+        return ahead, len(self.position) - shared - len(counted)
+
+
+def branch_status(repo, prefixes):
+    """How each branch under prefixes stands against its base.
+
+    prefixes is a list of (prefix, base branch name). Everything's worked
+    out from one for-each-ref and one rev-list, however many branches there
+    are.
+    """
+    heads = read_heads(repo)
+    by_name = dict((h.name, h) for h in heads)
+    branches = [
+        (h, base) for h in heads for prefix, base in prefixes
+        if h.name.startswith(prefix) and base in by_name
+    ]
+    if not branches:
+        return []
+
+    bases = sorted(set(base for _, base in branches))
+    parents = read_parents(repo, [h.sha for h, _ in branches] + [by_name[b].sha for b in bases])
+    ancestries = dict((base, Ancestry(parents, by_name[base].sha)) for base in bases)
+
+    statuses = []
+    for head, base in branches:
+        ahead, behind = ancestries[base].divergence(head.sha)
+        statuses.append(BranchStatus(
+            head.name, base, ahead, behind, head.upstream, head.track,
+            head.committed_at, head.current,
+        ))
+    return statuses
+
+
+def age(seconds):
+    """How long ago, roughly: '5 minutes', '3 days'..."""
+    for unit, length in [('week', 7 * 86400), ('day', 86400), ('hour', 3600), ('minute', 60)]:
+        if seconds >= length:
+            count = int(seconds // length)
+            return "{} {}{}".format(count, unit, '' if count == 1 else 's')
+    return "just now"
+
+
+def format_status(statuses, now=None):
+    """statuses as a table, one branch a line."""
+    now = time.time() if now is None else now
+    width = max(len(s.name) for s in statuses)
+    lines = []
+    for s in statuses:
+        if s.upstream is None:
+            upstream = "(not pushed)"
+        else:
+            upstream = "{} [{}]".format(s.upstream, s.track or 'up to date')
+        lines.append("{} {:<{width}}  {:>6} {:>6} {:<8}  {:<10}  {}".format(
+            '*' if s.current else ' ', s.name,
+            "+{}".format(s.ahead), "-{}".format(s.behind), s.base,
+            age(now - s.committed_at), upstream, width=width,
+        ))
+    return "\n".join(lines)
@@ -0,0 +1,179 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from bisect import bisect_left, bisect_right
+import errno
+import json
+import os
+import re
+
+from storage import atomic_write, flowhub_path
+
+
+# 1.2, v1.2.3, 1.2.3-rc1 ...
+VERSION = re.compile(r'^(v?)(\d+)\.(\d+)(?:\.(\d+))?(?:-([0-9A-Za-z.-]+))?$')
+
+PARTS = ('major', 'minor', 'patch')
+
+# Sorts after every real pre-release, so 1.2.3 comes after 1.2.3-rc1.
+RELEASED = u'\uffff'
+
+
+def version_key(name):
+    """How a tag sorts among versions, or None if it isn't one.
+
+    Versions without a patch number count as .0, and pre-releases come
+    before the release they lead up to.
+    """
+    match = VERSION.match(name)
+    if match is None:
+        return None
+
+    _, major, minor, patch, prerelease = match.groups()
+    return (int(major), int(minor), int(patch or 0), prerelease or RELEASED)
+
+
+class TagIndex(object):
+    """Every tag in a repository, with the versions among them in order.
+
+    It's read in one for-each-ref pass, and kept under .git/flowhub/tags,
+    already sorted, until packed-refs or refs/tags change.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.cache_path = flowhub_path(repo.git_dir, 'tags')
+        self.names = set()
+        # parallel lists, sorted by version.
+        self.keys = []
+        self.versions = []
+        self._load()
+
+    def _stamp(self):
+        """Modification times of everything a new tag would change."""
+        stamp = []
+        common_dir = getattr(self.repo, 'common_dir', self.repo.git_dir)
+        try:
+            stamp.append(os.stat(os.path.join(common_dir, 'packed-refs')).st_mtime)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            stamp.append(None)
+
+        for path, _, _ in os.walk(os.path.join(common_dir, 'refs', 'tags')):
+            stamp.append([os.path.relpath(path, common_dir), os.stat(path).st_mtime])
+
+        return stamp
+
+    def _load(self):
+        stamp = self._stamp()
+        try:
+            with open(self.cache_path, 'r') as f:
+                cached = json.load(f)
+        except (IOError, ValueError):
+            cached = None
+
+        if cached is not None and cached['stamp'] == stamp:
+            self.names = set(cached['names'])
+            self.keys = [tuple(key) for key in cached['keys']]
+            self.versions = cached['versions']
+            return
+
+        names = [
+            ref[len('refs/tags/'):]
+            for ref in self.repo.git.for_each_ref(
+                'refs/tags', format='%(refname)',
+            ).splitlines()
+        ]
+        versions = sorted(
+            (key, name) for key, name in
+            ((version_key(name), name) for name in names)
+            if key is not None
+        )
+
+        self.names = set(names)
+        self.keys = [key for key, _ in versions]
+        self.versions = [name for _, name in versions]
+        atomic_write(self.cache_path, json.dumps({
+            'stamp': stamp,
+            'names': names,
+            'keys': self.keys,
+            'versions': self.versions,
+        }))
+
+    def exists(self, name):
+        return name in self.names
+
+    def latest(self, major=None, minor=None):
+        """The newest released version, optionally within a major (and minor) line."""
+        if major is None:
+            upper = len(self.keys)
+        else:
+            bound = (major, minor if minor is not None else float('inf'), float('inf'), RELEASED)
+            upper = bisect_right(self.keys, bound)
+
+        # skip back over pre-releases; there are never many in a row.
+        while upper > 0:
+            key = self.keys[upper - 1]
+            if major is not None and (key[0] != major or minor is not None and key[1] != minor):
+                return None
+            if key[3] == RELEASED:
+                return self.versions[upper - 1]
+            upper -= 1
+
+        return None
+
+    def suggest(self, part, base=None):
+        """The next version after base (by default, the latest), bumping part."""
+        base = base or self.latest()
+        if base is None:
+            return {'major': '1.0.0', 'minor': '0.1.0', 'patch': '0.0.1'}[part]
+
+        v, major, minor, patch, _ = VERSION.match(base).groups()
+        major, minor, patch = int(major), int(minor), int(patch or 0)
+        if part == 'major':
+            major, minor, patch = major + 1, 0, 0
+        elif part == 'minor':
+            minor, patch = minor + 1, 0
+        else:
+            # past every patch already out on base's line.
+            latest = self.latest(major, minor)
+            if latest is not None:
+                patch = max(patch, version_key(latest)[2])
+            patch += 1
+
+        if patch or VERSION.match(base).group(4) is not None:
+            return "{}{}.{}.{}".format(v, major, minor, patch)
+        return "{}{}.{}".format(v, major, minor)
+
+    def suggestions(self):
+        return [(part, self.suggest(part)) for part in PARTS]
+
+    def taken(self, name):
+        """Whether name is already a tag, or would sort as the same version as one."""
+        if self.exists(name):
+            return True
+
+        key = version_key(name)
+        if key is None:
+            return False
+        i = bisect_left(self.keys, key)
+        return i < len(self.keys) and self.keys[i] == key
@@ -0,0 +1,241 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import argparse
+import Queue
+
+import git
+
+from configurator import ImproperlyConfigured
+from managers import TagInfo
+from multi import Abort, RepoResult, _worker, in_repo, pool, read_manifest
+
+
+def check_dependencies(repos):
+    """Makes sure the dependencies in a manifest name known repositories, without cycles."""
+    names = set(name for name, _, _ in repos)
+    for name, _, depends_on in repos:
+        unknown = [d for d in depends_on if d not in names]
+        if unknown:
+            raise ImproperlyConfigured(
+                "{} depends on {}, which isn't in the manifest".format(name, ", ".join(unknown))
+            )
+
+    waiting = dict((name, set(depends_on)) for name, _, depends_on in repos)
+    while waiting:
+        ready = [name for name, depends_on in waiting.items() if not depends_on]
+        if not ready:
+            raise ImproperlyConfigured(
+                "dependency cycle between {}".format(", ".join(sorted(waiting)))
+            )
+        for name in ready:
+            del waiting[name]
+        for depends_on in waiting.values():
+            depends_on.difference_update(ready)
+
+
+def _catch_up(repo, remote, branch):
+    """Fast-forwards branch to remote's; refuses if branch has commits remote doesn't."""
+    upstream = repo.commit("{}/{}".format(remote, branch))
+    if branch.commit == upstream:
+        return
+
+    if not repo.is_ancestor(branch.commit, upstream):
+        raise Abort("{} has commits that {}/{} doesn't".format(branch, remote, branch))
+
+    if repo.head.reference == branch:
+        repo.git.merge("{}/{}".format(remote, branch), ff_only=True)
+    else:
+        branch.commit = upstream
+    print "Fast-forwarded {} to {}/{}".format(branch, remote, branch)
+
+
+def _conflicts(repo, into, branch):
+    try:
+        repo.git.merge_tree('--write-tree', into, branch)
+    except git.GitCommandError as e:
+        # 1 is "conflicts"; git before 2.38 can't check, and publish will find out.
+        return e.status == 1
+
+    return False
+
+
+def _label(engine):
+    """The version (and tag) a repository's release branch is named for."""
+    return engine.release.name.replace(engine.release_manager._prefix, '')
+
+
+def preflight(job):
+    """Fetches and checks that a repository's release will publish cleanly."""
+    from engine import Engine
+
+    name, path = job
+
+    def work():
+        engine = Engine(offline=True)
+        release = engine.release
+        if release is None:
+            raise Abort("no release branch to publish")
+        if engine._repo.is_dirty():
+            raise Abort("uncommitted changes")
+        if engine.publish_log(release).started:
+            raise Abort(
+                "publishing {} was interrupted; finish it with `flowhub release "
+                "publish --resume`, or give it up with --restart, first".format(release)
+            )
+        if engine.tag_index.taken(_label(engine)):
+            raise Abort("{} is already tagged".format(_label(engine)))
+
+        engine.canon.fetch()
+        for branch in (engine.master, engine.develop):
+            _catch_up(engine._repo, engine.canon, branch)
+            if _conflicts(engine._repo, branch, release):
+                raise Abort("{} doesn't merge cleanly into {}".format(release, branch))
+
+        print "{} is ready to publish".format(release)
+
+    return in_repo(name, path, work)
+
+
+def publish(job):
+    """Publishes a repository's release; this is what pool workers do."""
+    import core
+    from engine import Engine
+
+    name, path, message, with_delete, no_verify = job
+
+    def work():
+        engine = Engine(sessions=_worker['sessions'])
+        label = _label(engine)
+        hook_args = argparse.Namespace(no_verify=no_verify, verbosity=0)
+
+        if not core.do_hook(hook_args, engine, "pre-release-publish", branch=engine.release.name):
+            raise Abort("pre-release-publish hook failed")
+
+        results = engine.publish_release(
+            name=label,
+            tag_info=TagInfo(label, message or "Release {}".format(label)),
+            with_delete=with_delete,
+        )
+        core.do_hook(hook_args, engine, "post-release-publish", results, tag=label)
+
+        print "\n - ".join(['Summary of actions:'] + engine.summary)
+        return engine
+
+    return in_repo(name, path, work)
+
+
+def publish_in_order(repos, submit):
+    """Publishes each repository once everything it depends on has been.
+
+    submit(name, done) starts publishing a repository, and calls done with
+    its RepoResult when it's finished; independent repositories are
+    submitted together. If one fails, whatever depends on it isn't
+    published. Returns the results in manifest order.
+    """
+    waiting = dict((name, set(depends_on)) for name, _, depends_on in repos)
+    finished = Queue.Queue()
+    results = {}
+    running = 0
+
+    while waiting or running:
+        for name, _, _ in repos:
+            if name in waiting and not waiting[name]:
+                del waiting[name]
+                submit(name, finished.put)
+                running += 1
+
+        result = None
+        while result is None:
+            try:
+                # a timeout keeps ctrl-c working while we wait.
+                result = finished.get(timeout=1)
+            except Queue.Empty:
+                pass
+        running -= 1
+        results[result.name] = result
+
+        if result.ok:
+            for depends_on in waiting.values():
+                depends_on.discard(result.name)
+            continue
+
+        failed = set([result.name])
+        blocked = True
+        while blocked:
+            blocked = [
+                (name, depends_on & failed)
+                for name, depends_on in waiting.items()
+                if depends_on & failed
+            ]
+            for name, failed_upstream in blocked:
+                del waiting[name]
+                failed.add(name)
+                results[name] = RepoResult(
+                    name,
+                    False,
+                    "not published, since {} wasn't".format(", ".join(sorted(failed_upstream))),
+                    '',
+                    None,
+                )
+
+    return [results[name] for name, _, _ in repos]
+
+
+def run_train(manifest, jobs=None, message=None, with_delete=True, no_verify=False):
+    """Publishes the releases of every repository in manifest, in dependency order.
+
+    Every repository is fetched and checked first, concurrently; nothing is
+    pushed unless they all pass. Returns (results, whether that check passed).
+    """
+    repos = read_manifest(manifest)
+    check_dependencies(repos)
+    if not repos:
+        return [], True
+
+    paths = dict((name, path) for name, path, _ in repos)
+    workers = pool(jobs, len(repos))
+    try:
+        checked = workers.map(
+            preflight,
+            [(name, path) for name, path, _ in repos],
+            chunksize=1,
+        )
+        if not all(r.ok for r in checked):
+            workers.close()
+            return checked, False
+
+        published = publish_in_order(
+            repos,
+            lambda name, done: workers.apply_async(
+                publish,
+                ((name, paths[name], message, with_delete, no_verify),),
+                callback=done,
+            ),
+        )
+        workers.close()
+    except KeyboardInterrupt:
+        workers.terminate()
+        raise
+    finally:
+        workers.join()
+
+    return published, True
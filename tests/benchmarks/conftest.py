@@ -0,0 +1,175 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from collections import OrderedDict
+import json
+import os
+import platform
+import shutil
+import subprocess
+import time
+
+import mock
+import pytest
+
+from fakegithub import FakeGitHub
+from repo_factory import spec
+from workspace import Workspace
+
+
+SIZES = OrderedDict([
+    ('small', spec(features=10, merged=1, commits=200, tags=10, files=20)),
+    ('medium', spec(features=1000, merged=100, commits=20000, tags=500, files=1000)),
+    ('large', spec(features=10000, merged=1000, commits=200000, tags=5000, files=5000)),
+    ('huge', spec(features=100000, merged=10000, commits=1000000, tags=30000, files=20000)),
+])
+
+
+class SyntheticWorkspace(Workspace):
+    """A Workspace whose repositories borrow everything from a template.
+
+    The objects are shared through alternates and the refs copied as one
+    packed-refs file, so even a huge template is set up in moments.
+    """
+
+    def __init__(self, root, github, template):
+        super(SyntheticWorkspace, self).__init__(root, github)
+        self.template = template
+
+    def _borrow(self, git_dir, refs):
+        with open(os.path.join(git_dir, 'objects', 'info', 'alternates'), 'w') as f:
+            f.write(os.path.join(self.template, 'objects') + "\n")
+        with open(os.path.join(git_dir, 'packed-refs'), 'w') as f:
+            f.write("# pack-refs with: peeled fully-peeled sorted \n")
+            for sha, ref in sorted(refs, key=lambda r: r[1]):
+                f.write("{} {}\n".format(sha, ref))
+
+    def setup(self):
+        with open(os.path.join(self.template, 'packed-refs')) as f:
+            refs = [line.split() for line in f if not line.startswith(('#', '^'))]
+        heads = [(sha, ref) for sha, ref in refs if ref.startswith('refs/heads/')]
+        tags = [(sha, ref) for sha, ref in refs if ref.startswith('refs/tags/')]
+
+        for path in (self.canon_path, self.origin_path):
+            self.git('init', '-q', '--bare', path, cwd=self.root)
+            self._borrow(path, heads + tags)
+
+        self.git('init', '-q', '-b', 'master', self.path, cwd=self.root)
+        remote_heads = [
+            (sha, ref.replace('refs/heads/', 'refs/remotes/{}/'.format(remote), 1))
+            for remote in ('canon', 'origin') for sha, ref in heads
+        ]
+        self._borrow(os.path.join(self.path, '.git'), heads + tags + remote_heads)
+
+        self.git('config', 'user.name', 'Suzy')
+        self.git('config', 'user.email', 'suzy@example.com')
+        self.git('remote', 'add', 'canon', self.canon_path)
+        self.git('remote', 'add', 'origin', self.origin_path)
+        self.git('branch', '--set-upstream-to', 'canon/develop', 'develop')
+        self.git('symbolic-ref', 'HEAD', 'refs/heads/develop')
+        self.git('reset', '-q', '--hard')
+        return self.configure()
+
+
+def pytest_generate_tests(metafunc):
+    if 'size' in metafunc.fixturenames:
+        sizes = metafunc.config.getoption('benchmark_size') or ['small']
+        for size in sizes:
+            if size not in SIZES:
+                raise pytest.UsageError("unknown --benchmark-size {}; pick from {}".format(
+                    size, ", ".join(SIZES),
+                ))
+        metafunc.parametrize('size', sizes, scope='session')
+
+
+@pytest.fixture(scope='session')
+def results(request):
+    """Every benchmark's measurements; written out as JSON at the end of the run."""
+    results = OrderedDict()
+
+    def write():
+        if not results:
+            return
+        with open(request.config.getoption('benchmark_json'), 'w') as f:
+            json.dump(OrderedDict([
+                ('python', platform.python_version()),
+                ('git', subprocess.check_output(['git', '--version']).strip()),
+                ('finished_at', time.time()),
+                ('rounds', request.config.getoption('benchmark_rounds')),
+                ('sizes', OrderedDict((name, SIZES[name]._asdict()) for name in SIZES)),
+                ('results', results),
+            ]), f, indent=2)
+            f.write("\n")
+
+    request.addfinalizer(write)
+    return results
+
+
+@pytest.fixture
+def measure(request, size, generated_repo, results, tmpdir_factory):
+    """Times a flowhub command against a repository of the given size.
+
+    measure(name, *argv, input=..., setup=...) runs `flowhub <argv>` once per
+    round, each time in a fresh workspace that setup(workspace) has
+    prepared (untimed), and records the time taken along with the git
+    processes and GitHub requests it made.
+    """
+    template = generated_repo(**SIZES[size]._asdict())
+
+    def measure(name, *argv, **kwargs):
+        samples = []
+        for n in range(request.config.getoption('benchmark_rounds')):
+            root = tmpdir_factory.mktemp('bench')
+            github = FakeGitHub().start()
+            try:
+                with mock.patch.dict(os.environ, {
+                    'HOME': str(root.mkdir('home')),
+                    'GIT_CONFIG_NOSYSTEM': '1',
+                    'EDITOR': 'true',
+                }):
+                    workspace = SyntheticWorkspace(str(root), github, template).setup()
+                    if kwargs.get('setup'):
+                        kwargs['setup'](workspace)
+                    github.reset()
+
+                    started = time.time()
+                    workspace.run(*argv, input=kwargs.get('input', ()))
+                    samples.append(OrderedDict([
+                        ('seconds', time.time() - started),
+                        ('git_processes', len(workspace.git_calls)),
+                        ('github_requests', len(github.requests)),
+                    ]))
+            finally:
+                github.stop()
+                shutil.rmtree(str(root), ignore_errors=True)
+
+        seconds = sorted(s['seconds'] for s in samples)
+        results.setdefault(name, OrderedDict())[size] = OrderedDict([
+            ('min', round(seconds[0], 4)),
+            ('median', round(seconds[len(seconds) // 2], 4)),
+            ('max', round(seconds[-1], 4)),
+            ('seconds', [round(s['seconds'], 4) for s in samples]),
+            ('git_processes', max(s['git_processes'] for s in samples)),
+            ('github_requests', max(s['github_requests'] for s in samples)),
+        ])
+        return samples
+
+    return measure
@@ -0,0 +1,76 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+
+class FeatureTestCase(object):
+    def test_start(self, measure):
+        measure('feature start', 'feature', 'start', 'benchmarked')
+
+    def test_list(self, measure):
+        measure('feature list', 'feature', 'list')
+
+    def test_work(self, measure):
+        measure('feature work', 'feature', 'work', 'f1')
+
+    def test_publish(self, measure):
+        measure('feature publish', 'feature', 'publish', 'f1', input=['n', 'The feature'])
+
+    def test_accepted(self, measure):
+        def setup(workspace):
+            # f0 sits on develop's tip, so canon can fast-forward to it.
+            workspace.git('checkout', '-q', 'feature/f0')
+            workspace.git('push', '-q', 'canon', 'feature/f0:develop')
+
+        measure('feature accepted', 'feature', 'accepted', setup=setup)
+
+
+class ReleaseTestCase(object):
+    def test_start(self, measure):
+        measure('release start', 'release', 'start', '99.0')
+
+    def test_publish(self, measure):
+        def setup(workspace):
+            workspace.run('release', 'start', '99.0')
+            workspace.commit('bump')
+
+        measure('release publish', 'release', 'publish', input=[''], setup=setup)
+
+
+class HotfixTestCase(object):
+    def test_start(self, measure):
+        measure('hotfix start', 'hotfix', 'start', '0.0.99')
+
+    def test_publish(self, measure):
+        def setup(workspace):
+            workspace.run('hotfix', 'start', '0.0.99')
+            workspace.commit('fix')
+
+        measure('hotfix publish', 'hotfix', 'publish', input=[''], setup=setup)
+
+
+class CleanupTestCase(object):
+    def test_cleanup(self, measure):
+        measure('cleanup', 'cleanup', '-a')
+
+
+class StatusTestCase(object):
+    def test_status(self, measure):
+        measure('status', 'status')
@@ -0,0 +1,150 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import argparse
+from collections import namedtuple
+import json
+import os
+import sys
+
+# Compares a benchmark run with the baselines committed alongside the benchmarks.
+#
+#     python tests/compare_benchmarks.py benchmark-results.json
+#
+# git processes and GitHub requests don't vary from run to run, so any
+# increase is a regression. Timings do, so a command only counts as slower
+# when its fastest round is slower than the baseline's median by more than the
+# noise allows: --threshold of the median, --floor seconds, or the spread of
+# the baseline's rounds, whichever is largest. Exits with 1 on a regression.
+# --update makes the run the new baseline.
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'baselines.json')
+
+THRESHOLD = 0.5
+FLOOR = 0.05
+
+COUNTS = ('git_processes', 'github_requests')
+
+Regression = namedtuple("Regression", ["command", "size", "measure", "baseline", "current"])
+
+
+def slower(baseline, current, threshold=THRESHOLD, floor=FLOOR):
+    """Whether current's timings are slower than baseline's, beyond the noise."""
+    margin = max(
+        baseline['median'] * threshold,
+        floor,
+        baseline['max'] - baseline['min'],
+    )
+    return current['min'] > baseline['median'] + margin
+
+
+def compare(results, baselines, threshold=THRESHOLD, floor=FLOOR, timings=True):
+    """The regressions in results, a benchmark run, from baselines, an earlier one.
+
+    Commands or sizes the baselines don't have are left out.
+    """
+    regressions = []
+    for command, sizes in sorted(results['results'].items()):
+        for size, current in sorted(sizes.items()):
+            baseline = baselines['results'].get(command, {}).get(size)
+            if baseline is None:
+                continue
+
+            for measure in COUNTS:
+                if current[measure] > baseline[measure]:
+                    regressions.append(Regression(
+                        command, size, measure, baseline[measure], current[measure],
+                    ))
+            if timings and slower(baseline, current, threshold, floor):
+                regressions.append(Regression(
+                    command, size, 'seconds', baseline['median'], current['min'],
+                ))
+
+    return regressions
+
+
+def report(results, baselines, regressions):
+    lines = ["{:<18} {:<7} {:>16} {:>9} {:>9}".format(
+        "command", "size", "seconds", "git", "github",
+    )]
+    failed = set((r.command, r.size) for r in regressions)
+    for command, sizes in sorted(results['results'].items()):
+        for size, current in sorted(sizes.items()):
+            baseline = baselines['results'].get(command, {}).get(size)
+            if baseline is None:
+                lines.append("{:<18} {:<7} {:>16.3f} {:>9} {:>9}  (new)".format(
+                    command, size, current['min'], current['git_processes'],
+                    current['github_requests'],
+                ))
+                continue
+
+            lines.append("{:<18} {:<7} {:>7.3f} / {:>6.3f} {:>4} / {:<3} {:>4} / {:<3}{}".format(
+                command, size, baseline['median'], current['min'],
+                baseline['git_processes'], current['git_processes'],
+                baseline['github_requests'], current['github_requests'],
+                "  REGRESSED" if (command, size) in failed else "",
+            ))
+
+    for r in regressions:
+        lines.append("{} ({}): {} went from {} to {}".format(
+            r.command, r.size, r.measure.replace('_', ' '), r.baseline, r.current,
+        ))
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="compare a benchmark run with the baselines")
+    parser.add_argument('results', help="the run's --benchmark-json")
+    parser.add_argument('--baselines', default=BASELINES,
+        help="the run to compare with (default %(default)s)")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+        help="how much slower than the baseline, relatively, is still noise")
+    parser.add_argument('--floor', type=float, default=FLOOR,
+        help="how many seconds slower than the baseline is always noise")
+    parser.add_argument('--counts-only', action='store_true', default=False,
+        help="compare only git processes and GitHub requests, e.g. on other hardware")
+    parser.add_argument('--update', action='store_true', default=False,
+        help="make the run the new baselines instead")
+    args = parser.parse_args(argv)
+
+    with open(args.results) as f:
+        results = json.load(f)
+
+    if args.update:
+        with open(args.baselines, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True, separators=(',', ': '))
+            f.write("\n")
+        print "Baselines updated from {}".format(args.results)
+        return 0
+
+    with open(args.baselines) as f:
+        baselines = json.load(f)
+
+    regressions = compare(
+        results, baselines, args.threshold, args.floor, timings=not args.counts_only,
+    )
+    print report(results, baselines, regressions)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
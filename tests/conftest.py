@@ -24,6 +24,8 @@ import os
 import random
 import string
 
+import repo_factory
+
 @pytest.fixture
 def TEST_DIR():
     return os.getcwd()
@@ -45,3 +47,33 @@ def id_generator():
 def username_and_password(id_generator):
     return id_generator(), id_generator()
 
+@pytest.fixture(scope='session')
+def generated_repo(request):
+    """Builds (or reuses, across sessions) a bare repository from repo_factory.spec's arguments."""
+    cache_dir = str(request.config.cache.makedir('repos'))
+    def generate(**kwargs):
+        return repo_factory.cached(cache_dir, repo_factory.spec(**kwargs))
+    return generate
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks')
+    group.addoption('--benchmark', action='store_true', default=False,
+        help="run the benchmarks in tests/benchmarks, which are skipped otherwise")
+    group.addoption('--benchmark-size', action='append', default=None,
+        help="size of repository to benchmark against: small (the default), "
+             "medium, large or huge; may be given more than once")
+    group.addoption('--benchmark-rounds', type=int, default=3,
+        help="times to run each benchmarked command")
+    group.addoption('--benchmark-json', default='benchmark-results.json',
+        help="where to write the benchmark results")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('benchmark'):
+        return
+
+    skip = pytest.mark.skip(reason="benchmarks only run with --benchmark")
+    for item in items:
+        if item.fspath.dirpath().basename == 'benchmarks':
+            item.add_marker(skip)
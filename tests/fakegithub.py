@@ -0,0 +1,479 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import BaseHTTPServer
+from collections import namedtuple
+import datetime
+import json
+import re
+import SocketServer
+import threading
+import urllib
+import urlparse
+
+
+Request = namedtuple("Request", ["verb", "path", "query"])
+
+
+def _now():
+    return datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super(HTTPError, self).__init__(message)
+        self.status = status
+        self.message = message
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.0'
+
+    def _dispatch(self, verb):
+        parsed = urlparse.urlparse(self.path)
+        query = dict(urlparse.parse_qsl(parsed.query))
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+
+        github = self.server.github
+        status, headers, payload = github.handle(verb, parsed.path, query, body)
+
+        data = json.dumps(payload) if payload is not None else ''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeGitHub(object):
+    """An in-process stand-in for the parts of GitHub's REST API flowhub uses.
+
+    Keeps users, repositories, issues, pull-requests and labels in memory, and
+    records every request it serves so tests can count them.
+    """
+    RATE_LIMIT = 5000
+
+    def __init__(self, login='suzy', per_page=30):
+        self.login = login
+        self.per_page = per_page
+        self.repos = {}
+        self.requests = []
+        self.authorizations = []
+        self._lock = threading.RLock()
+        self._server = None
+
+        self._routes = [
+            ('GET', r'^/user$', self._get_user),
+            ('POST', r'^/authorizations$', self._create_authorization),
+            ('GET', r'^/rate_limit$', self._get_rate_limit),
+            ('GET', r'^/repos/([^/]+/[^/]+)$', self._get_repo),
+            ('GET', r'^/repos/([^/]+/[^/]+)/pulls$', self._list_pulls),
+            ('POST', r'^/repos/([^/]+/[^/]+)/pulls$', self._create_pull),
+            ('GET', r'^/repos/([^/]+/[^/]+)/pulls/(\d+)$', self._get_pull),
+            ('GET', r'^/repos/([^/]+/[^/]+)/issues$', self._list_issues),
+            ('POST', r'^/repos/([^/]+/[^/]+)/issues$', self._create_issue),
+            ('GET', r'^/repos/([^/]+/[^/]+)/issues/(\d+)$', self._get_issue),
+            ('PATCH', r'^/repos/([^/]+/[^/]+)/issues/(\d+)$', self._edit_issue),
+            ('GET', r'^/repos/([^/]+/[^/]+)/labels$', self._list_labels),
+            ('GET', r'^/search/issues$', self._search_issues),
+        ]
+
+    #
+    # Lifecycle
+    #
+    def start(self):
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.github = self
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self._server.server_port)
+
+    #
+    # State
+    #
+    def add_repo(self, full_name, parent=None):
+        with self._lock:
+            self.repos[full_name] = {
+                'full_name': full_name,
+                'parent': parent,
+                'issues': {},
+                'pulls': {},
+                'labels': [],
+                'next_number': 1,
+            }
+            return self.repos[full_name]
+
+    def add_label(self, full_name, name):
+        self.repos[full_name]['labels'].append(name)
+
+    def add_issue(self, full_name, title, body='', labels=(), state='open'):
+        with self._lock:
+            repo = self.repos[full_name]
+            number = repo['next_number']
+            repo['next_number'] += 1
+            repo['issues'][number] = {
+                'number': number,
+                'title': title,
+                'body': body,
+                'state': state,
+                'labels': list(labels),
+                'created_at': _now(),
+                'updated_at': _now(),
+                'closed_at': _now() if state == 'closed' else None,
+            }
+            return repo['issues'][number]
+
+    def add_pull(self, full_name, head, base, title='', issue=None, state='open', merged=False):
+        """head is a label ("user:branch") or a branch of full_name."""
+        with self._lock:
+            repo = self.repos[full_name]
+            if issue is None:
+                issue = self.add_issue(full_name, title, state=state)
+            if ':' not in head:
+                head = '{}:{}'.format(full_name.split('/')[0], head)
+
+            repo['pulls'][issue['number']] = {
+                'number': issue['number'],
+                'head': head,
+                'base': base,
+                'state': state,
+                'merged_at': _now() if merged else None,
+            }
+            return repo['pulls'][issue['number']]
+
+    #
+    # Accounting
+    #
+    def count(self, verb=None, path=None):
+        """How many requests matched verb and (a regex on) path."""
+        return len([
+            r for r in self.requests
+            if (verb is None or r.verb == verb)
+            and (path is None or re.search(path, r.path))
+        ])
+
+    def reset(self):
+        del self.requests[:]
+
+    #
+    # Dispatch
+    #
+    def handle(self, verb, path, query, body):
+        with self._lock:
+            self.requests.append(Request(verb, path, query))
+            headers = {
+                'X-RateLimit-Limit': str(self.RATE_LIMIT),
+                'X-RateLimit-Remaining': str(self.RATE_LIMIT - len(self.requests)),
+            }
+
+            for route_verb, pattern, handler in self._routes:
+                match = re.match(pattern, path)
+                if route_verb == verb and match:
+                    try:
+                        result = handler(query, body, *match.groups())
+                    except HTTPError as e:
+                        return e.status, headers, {'message': e.message}
+
+                    status, payload = result[:2]
+                    if len(result) > 2:
+                        headers.update(result[2])
+                    return status, headers, payload
+
+            return 404, headers, {'message': 'Not Found'}
+
+    def _repo(self, full_name):
+        try:
+            return self.repos[full_name]
+        except KeyError:
+            raise HTTPError(404, 'Not Found')
+
+    def _paginate(self, path, query, items):
+        per_page = int(query.get('per_page', self.per_page))
+        page = int(query.get('page', 1))
+        start = (page - 1) * per_page
+        headers = {}
+
+        if start + per_page < len(items):
+            next_query = dict(query, page=page + 1)
+            headers['Link'] = '<{}{}?{}>; rel="next"'.format(
+                self.url, path, urllib.urlencode(sorted(next_query.items())),
+            )
+
+        return 200, items[start:start + per_page], headers
+
+    #
+    # Representations
+    #
+    def _repo_json(self, full_name, with_parent=True):
+        repo = self.repos[full_name]
+        owner, name = full_name.split('/')
+        data = {
+            'id': abs(hash(full_name)) % (10 ** 8),
+            'name': name,
+            'full_name': full_name,
+            'owner': {'login': owner},
+            'fork': repo['parent'] is not None,
+            'url': '{}/repos/{}'.format(self.url, full_name),
+            'html_url': 'https://github.com/{}'.format(full_name),
+        }
+        if with_parent and repo['parent']:
+            data['parent'] = self._repo_json(repo['parent'], with_parent=False)
+        return data
+
+    def _issue_json(self, full_name, issue):
+        repo = self.repos[full_name]
+        data = {
+            'number': issue['number'],
+            'title': issue['title'],
+            'body': issue['body'],
+            'state': issue['state'],
+            'labels': [{'name': l} for l in issue['labels']],
+            'url': '{}/repos/{}/issues/{}'.format(self.url, full_name, issue['number']),
+            'html_url': 'https://github.com/{}/issues/{}'.format(full_name, issue['number']),
+            'user': {'login': issue.get('user', self.login)},
+            'created_at': issue['created_at'],
+            'updated_at': issue['updated_at'],
+            'closed_at': issue['closed_at'],
+        }
+        if issue['number'] in repo['pulls']:
+            data['pull_request'] = {
+                'url': '{}/repos/{}/pulls/{}'.format(self.url, full_name, issue['number']),
+            }
+        return data
+
+    def _pull_json(self, full_name, pull):
+        issue = self.repos[full_name]['issues'][pull['number']]
+        head_owner, head_ref = pull['head'].split(':', 1)
+        return {
+            'number': pull['number'],
+            'title': issue['title'],
+            'body': issue['body'],
+            'state': pull['state'],
+            'url': '{}/repos/{}/pulls/{}'.format(self.url, full_name, pull['number']),
+            'html_url': 'https://github.com/{}/pull/{}'.format(full_name, pull['number']),
+            'issue_url': '{}/repos/{}/issues/{}'.format(self.url, full_name, pull['number']),
+            'head': {'label': pull['head'], 'ref': head_ref, 'user': {'login': head_owner}},
+            'base': {'label': '{}:{}'.format(full_name.split('/')[0], pull['base']), 'ref': pull['base']},
+            'merged_at': pull['merged_at'],
+            'created_at': issue['created_at'],
+            'updated_at': issue['updated_at'],
+            'closed_at': issue['closed_at'],
+        }
+
+    #
+    # Endpoints
+    #
+    def _get_user(self, query, body):
+        return 200, {
+            'login': self.login,
+            'url': '{}/users/{}'.format(self.url, self.login),
+        }
+
+    def _create_authorization(self, query, body):
+        authorization = {
+            'id': len(self.authorizations) + 1,
+            'token': 'fake-token-{}'.format(len(self.authorizations) + 1),
+            'scopes': (body or {}).get('scopes'),
+            'note': (body or {}).get('note'),
+        }
+        authorization['url'] = '{}/authorizations/{}'.format(self.url, authorization['id'])
+        self.authorizations.append(authorization)
+        return 201, authorization
+
+    def _get_rate_limit(self, query, body):
+        remaining = self.RATE_LIMIT - len(self.requests)
+        core = {'limit': self.RATE_LIMIT, 'remaining': remaining, 'reset': 0}
+        return 200, {'resources': {'core': core, 'search': core}, 'rate': core}
+
+    def _get_repo(self, query, body, full_name):
+        self._repo(full_name)
+        return 200, self._repo_json(full_name)
+
+    def _list_pulls(self, query, body, full_name):
+        repo = self._repo(full_name)
+        state = query.get('state', 'open')
+        pulls = [
+            p for _, p in sorted(repo['pulls'].items())
+            if state == 'all' or p['state'] == state
+        ]
+        if query.get('sort') == 'updated':
+            pulls.sort(
+                key=lambda p: repo['issues'][p['number']]['updated_at'],
+                reverse=query.get('direction', 'desc') == 'desc',
+            )
+        return self._paginate(
+            '/repos/{}/pulls'.format(full_name),
+            query,
+            [self._pull_json(full_name, p) for p in pulls],
+        )
+
+    def _get_pull(self, query, body, full_name, number):
+        repo = self._repo(full_name)
+        try:
+            return 200, self._pull_json(full_name, repo['pulls'][int(number)])
+        except KeyError:
+            raise HTTPError(404, 'Not Found')
+
+    def _create_pull(self, query, body, full_name):
+        repo = self._repo(full_name)
+        head = body['head']
+        if ':' not in head:
+            head = '{}:{}'.format(full_name.split('/')[0], head)
+
+        for pull in repo['pulls'].values():
+            if pull['state'] == 'open' and pull['head'] == head and pull['base'] == body['base']:
+                raise HTTPError(422, 'A pull request already exists for {}.'.format(head))
+
+        if 'issue' in body:
+            try:
+                issue = repo['issues'][int(body['issue'])]
+            except KeyError:
+                raise HTTPError(422, 'Validation Failed')
+        else:
+            issue = self.add_issue(full_name, body['title'], body.get('body') or '')
+
+        pull = self.add_pull(full_name, head, body['base'], issue=issue)
+        return 201, self._pull_json(full_name, pull)
+
+    def _list_issues(self, query, body, full_name):
+        repo = self._repo(full_name)
+        state = query.get('state', 'open')
+        since = query.get('since')
+        issues = [
+            i for _, i in sorted(repo['issues'].items())
+            if (state == 'all' or i['state'] == state)
+            and (since is None or i['updated_at'] >= since)
+        ]
+        if query.get('sort') == 'updated':
+            issues.sort(
+                key=lambda i: i['updated_at'],
+                reverse=query.get('direction', 'desc') == 'desc',
+            )
+        return self._paginate(
+            '/repos/{}/issues'.format(full_name),
+            query,
+            [self._issue_json(full_name, i) for i in issues],
+        )
+
+    def _create_issue(self, query, body, full_name):
+        repo = self._repo(full_name)
+        labels = [l for l in body.get('labels', []) if l in repo['labels']]
+        issue = self.add_issue(full_name, body['title'], body.get('body') or '', labels)
+        return 201, self._issue_json(full_name, issue)
+
+    def _get_issue(self, query, body, full_name, number):
+        repo = self._repo(full_name)
+        try:
+            return 200, self._issue_json(full_name, repo['issues'][int(number)])
+        except KeyError:
+            raise HTTPError(404, 'Not Found')
+
+    def _edit_issue(self, query, body, full_name, number):
+        repo = self._repo(full_name)
+        try:
+            issue = repo['issues'][int(number)]
+        except KeyError:
+            raise HTTPError(404, 'Not Found')
+
+        for key in ('title', 'body', 'state', 'labels'):
+            if key in body:
+                issue[key] = body[key]
+        issue['updated_at'] = _now()
+        if body.get('state') == 'closed':
+            issue['closed_at'] = _now()
+            if issue['number'] in repo['pulls']:
+                repo['pulls'][issue['number']]['state'] = 'closed'
+
+        return 200, self._issue_json(full_name, issue)
+
+    def _list_labels(self, query, body, full_name):
+        repo = self._repo(full_name)
+        return self._paginate(
+            '/repos/{}/labels'.format(full_name),
+            query,
+            [
+                {
+                    'name': name,
+                    'color': 'ededed',
+                    'url': '{}/repos/{}/labels/{}'.format(self.url, full_name, name),
+                }
+                for name in repo['labels']
+            ],
+        )
+
+    def _search_issues(self, query, body):
+        """Understands repo:, is:pr, is:merged, base: and merged:>=<date>."""
+        terms = {}
+        for term in query.get('q', '').split():
+            key, _, value = term.partition(':')
+            terms[term if key == 'is' else key] = value
+
+        full_name = terms.get('repo')
+        repo = self._repo(full_name)
+        merged = terms.get('merged', '')
+        merged_since = merged[2:] if merged.startswith('>=') else None
+
+        items = []
+        for number, issue in sorted(repo['issues'].items()):
+            pull = repo['pulls'].get(number)
+            if 'is:pr' in terms and pull is None:
+                continue
+            if 'is:merged' in terms and not (pull and pull['merged_at']):
+                continue
+            if 'base' in terms and pull['base'] != terms['base']:
+                continue
+            if merged_since and pull['merged_at'] < merged_since:
+                continue
+            items.append(self._issue_json(full_name, issue))
+
+        status, page, headers = self._paginate('/search/issues', query, items)
+        return status, {'total_count': len(items), 'incomplete_results': False, 'items': page}, headers
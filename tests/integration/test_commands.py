@@ -0,0 +1,780 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import json
+import os
+import time
+
+import git
+import github as github_module
+import mock
+import pytest
+
+
+class InitTestCase(object):
+    def test_init(self, workspace):
+        for section in ('structure', 'prefix'):
+            workspace.git('config', '--remove-section', 'flowhub.{}'.format(section))
+
+        workspace.run('init', input=[
+            'the_repo', '', '', '', '', 'feat-', '', '',
+        ])
+
+        assert workspace.git('config', 'flowhub.structure.name') == 'the_repo'
+        assert workspace.git('config', 'flowhub.structure.canon') == 'canon'
+        assert workspace.git('config', 'flowhub.prefix.feature') == 'feat-'
+
+    def test_authorization(self, workspace, github):
+        workspace.git('config', '--unset', 'flowhub.auth.token')
+
+        with mock.patch('getpass.getpass', return_value='hunter2'):
+            workspace.run('feature', 'list', input=['suzy'])
+
+        assert github.count('POST', '^/authorizations$') == 1
+        assert workspace.git('config', 'flowhub.auth.token') == github.authorizations[0]['token']
+
+
+class FeatureTestCase(object):
+    def test_start(self, workspace):
+        workspace.run('feature', 'start', 'the-feature')
+
+        assert workspace.current_branch() == 'feature/the-feature'
+        assert workspace.remote_branches(workspace.origin_path) == ['develop', 'master']
+
+    def test_start_tracking(self, workspace):
+        workspace.run('feature', 'start', '--track', 'the-feature')
+
+        assert 'feature/the-feature' in workspace.remote_branches(workspace.origin_path)
+
+    def test_list_and_work(self, workspace):
+        workspace.run('feature', 'start', 'the-feature')
+        workspace.run('feature', 'start', 'other')
+
+        output = workspace.run('feature', 'list')
+        assert 'the-feature' in output
+        assert 'other' in output
+
+        workspace.run('feature', 'work', 'the-f')
+        assert workspace.current_branch() == 'feature/the-feature'
+
+    def test_publish(self, workspace, github):
+        workspace.run('feature', 'start', 'the-feature')
+        workspace.commit('work')
+
+        workspace.run('feature', 'publish', input=['n', 'The feature'])
+
+        assert 'feature/the-feature' in workspace.remote_branches(workspace.origin_path)
+        pulls = github.repos[workspace.canon_repo]['pulls'].values()
+        assert [(p['head'], p['base']) for p in pulls] == [('suzy:feature/the-feature', 'develop')]
+
+    def test_publish_again(self, workspace, github):
+        workspace.run('feature', 'start', 'the-feature')
+        workspace.commit('work')
+        workspace.run('feature', 'publish', input=['n', 'The feature'])
+        workspace.commit('more work')
+        github.reset()
+
+        workspace.run('feature', 'publish')
+
+        assert len(github.repos[workspace.canon_repo]['pulls']) == 1
+        assert github.count('POST') == 0
+        assert workspace.git('rev-parse', 'feature/the-feature', cwd=workspace.origin_path) == \
+            workspace.git('rev-parse', 'feature/the-feature')
+
+    def test_bulk_publish(self, workspace, github):
+        issue = github.add_issue(workspace.canon_repo, 'A bug')
+        for name in ('some-work', 'already-open', '{}-bug'.format(issue['number'])):
+            workspace.run('feature', 'start', name)
+            workspace.commit('work on {}'.format(name), filename=name)
+        github.add_pull(workspace.canon_repo, 'suzy:feature/already-open', 'develop')
+        github.reset()
+
+        output = workspace.run('feature', 'bulk-publish')
+
+        results = [json.loads(l) for l in output.splitlines() if l.startswith('{')]
+        assert [(r['branch'], r['status']) for r in results] == [
+            ('feature/1-bug', 'created'),
+            ('feature/already-open', 'existing'),
+            ('feature/some-work', 'created'),
+        ]
+        repo = github.repos[workspace.canon_repo]
+        assert sorted((p['head'], repo['issues'][n]['title']) for n, p in repo['pulls'].items()) == [
+            ('suzy:feature/1-bug', 'A bug'),
+            ('suzy:feature/already-open', ''),
+            ('suzy:feature/some-work', 'Some work'),
+        ]
+        assert workspace.remote_branches(workspace.origin_path) == [
+            'develop', 'feature/1-bug', 'feature/already-open', 'feature/some-work', 'master',
+        ]
+        assert len([c for c in workspace.git_calls if c[1:2] == ['push']]) == 1
+        assert github.count('GET', '/pulls$') == 1
+
+    def test_bulk_publish_many(self, workspace, github):
+        names = ['work-{}'.format(n) for n in range(10)]
+        for name in names:
+            workspace.run('feature', 'start', name)
+            workspace.commit('work on {}'.format(name), filename=name)
+        request = github_module.Requester.HTTPRequestsConnectionClass.request
+
+        def slow_request(cnx, *args, **kwargs):
+            # lets another thread in between sending a request and reading it.
+            request(cnx, *args, **kwargs)
+            time.sleep(0.002)
+
+        with mock.patch.object(github_module.Requester.HTTPRequestsConnectionClass, 'request', slow_request):
+            output = workspace.run('feature', 'bulk-publish')
+
+        results = [json.loads(l) for l in output.splitlines() if l.startswith('{')]
+        assert [r['status'] for r in results] == ['created'] * len(names)
+        repo = github.repos[workspace.canon_repo]
+        assert dict((r['branch'], r['number']) for r in results) == dict(
+            (p['head'].split(':')[1], n) for n, p in repo['pulls'].items()
+        )
+
+    def test_abandon(self, workspace):
+        workspace.run('feature', 'start', '--track', 'the-feature')
+
+        workspace.run('feature', 'abandon')
+
+        assert workspace.current_branch() == 'develop'
+        assert 'feature/the-feature' not in workspace.branches()
+        assert 'feature/the-feature' not in workspace.remote_branches(workspace.origin_path)
+
+    def test_abandon_by_name(self, workspace):
+        workspace.run('feature', 'start', 'the-feature')
+
+        workspace.run('feature', 'abandon', 'the-feature')
+
+        assert workspace.current_branch() == 'develop'
+        assert 'feature/the-feature' not in workspace.branches()
+
+    def test_accepted(self, workspace):
+        workspace.run('feature', 'start', 'the-feature')
+        tip = workspace.commit('work')
+        workspace.git('push', '-q', 'canon', 'feature/the-feature:develop')
+
+        workspace.run('feature', 'accepted')
+
+        assert workspace.current_branch() == 'develop'
+        assert workspace.git('rev-parse', 'develop') == tip
+        assert 'feature/the-feature' not in workspace.branches()
+
+    def test_accepted_merged(self, workspace, github):
+        for name in ('one', 'two', 'unmerged'):
+            workspace.run('feature', 'start', '--track', name)
+            workspace.commit('work on {}'.format(name), filename=name)
+        workspace.run('feature', 'start', 'untouched')
+        workspace.git('checkout', '-q', 'develop')
+        for name in ('one', 'two'):
+            workspace.git('merge', '-q', '--no-ff', 'feature/{}'.format(name))
+        workspace.git('push', '-q', 'canon', 'develop')
+        workspace.git('reset', '-q', '--hard', 'canon/develop~2')
+        workspace.git('checkout', '-q', 'feature/one')
+
+        workspace.run('feature', 'accepted', '--merged')
+
+        assert workspace.current_branch() == 'develop'
+        assert workspace.branches() == ['develop', 'feature/unmerged', 'feature/untouched', 'master']
+        assert workspace.remote_branches(workspace.origin_path) == ['develop', 'feature/unmerged', 'master']
+        pushes = [c for c in workspace.git_calls if c[1:2] == ['push']]
+        fetches = [c for c in workspace.git_calls if c[1:2] == ['fetch']]
+        assert len(pushes) == len(fetches) == 1
+
+
+class ReleaseTestCase(object):
+    def test_start(self, workspace):
+        workspace.run('release', 'start', '1.0')
+
+        assert workspace.current_branch() == 'release/1.0'
+        assert 'release/1.0' in workspace.remote_branches(workspace.canon_path)
+
+    def test_active_release_is_recorded(self, workspace):
+        state_path = os.path.join(workspace.path, '.git', 'flowhub', 'state')
+        workspace.run('release', 'start', '1.0')
+
+        with open(state_path) as f:
+            recorded = json.load(f)['release']
+        assert recorded['name'] == 'release/1.0'
+        assert recorded['base'] == workspace.git('rev-parse', 'develop')
+
+        # the recorded one wins over a newer branch with the same prefix
+        workspace.git('branch', 'release/0.9')
+        workspace.commit('bump')
+        workspace.run('release', 'publish', input=[''])
+
+        assert workspace.tags(workspace.canon_path) == ['1.0']
+        with open(state_path) as f:
+            assert 'release' not in json.load(f)
+
+    def test_several_releases(self, workspace):
+        workspace.git('branch', 'release/1.0')
+        workspace.git('branch', 'release/1.1')
+
+        with pytest.warns(UserWarning) as warned:
+            workspace.run('release', 'contribute')
+
+        assert str(warned[0].message) == "Several release branches: release/1.0, release/1.1; using release/1.0"
+
+    def test_stage(self, workspace, tmpdir):
+        stages = []
+        for name in ('stage-1', 'stage-2'):
+            path = str(tmpdir.join(name))
+            git.Repo.init(path, bare=True)
+            workspace.git('remote', 'add', name, path)
+            stages.append(path)
+        workspace.git('config', 'flowhub.stage.remotes', 'stage-1, stage-2')
+        workspace.run('release', 'start', '1.0')
+        workspace.commit('bump')
+
+        output = workspace.run('release', 'stage')
+
+        assert ' - Staged release/1.0 on stage-1 (' in output
+        assert ' - Staged release/1.0 on stage-2 (' in output
+        for path in stages:
+            assert workspace.remote_branches(path) == ['release/1.0']
+            assert workspace.git('rev-parse', 'release/1.0', cwd=path) == workspace.git('rev-parse', 'release/1.0')
+
+        output = workspace.run('--output=jsonl', 'release', 'stage')
+
+        events = [json.loads(line) for line in output.splitlines()]
+        assert [(e['remote'], e['existing']) for e in events] == [('stage-1', True), ('stage-2', True)]
+        assert [call[1] for call in workspace.git_calls if call[1] in ('ls-remote', 'push')] == ['ls-remote'] * 2
+
+    def test_stage_failure(self, workspace, tmpdir):
+        git.Repo.init(str(tmpdir.join('stage-1')), bare=True)
+        workspace.git('config', 'flowhub.stage.remotes', '{} /no/such/stage'.format(tmpdir.join('stage-1')))
+        workspace.run('release', 'start', '1.0')
+
+        output = workspace.run('release', 'stage')
+
+        assert "Staged release/1.0 on {}".format(tmpdir.join('stage-1')) in output
+        assert "Couldn't stage release/1.0 on /no/such/stage: " in output
+
+    def test_stage_unconfigured(self, workspace):
+        workspace.run('release', 'start', '1.0')
+
+        assert 'No staging remotes are configured' in workspace.run('release', 'stage')
+
+    def test_publish(self, workspace):
+        workspace.run('release', 'start', '1.0')
+        workspace.commit('bump')
+
+        workspace.run('release', 'publish', input=[''])
+
+        assert workspace.current_branch() == 'develop'
+        assert workspace.tags(workspace.canon_path) == ['1.0']
+        assert workspace.remote_branches(workspace.canon_path) == ['develop', 'master']
+        assert 'release/1.0' not in workspace.branches()
+        assert workspace.git('rev-parse', 'master', cwd=workspace.canon_path) == \
+            workspace.git('rev-parse', 'master')
+
+    def test_publish_changelog(self, workspace):
+        workspace.run('release', 'start', '1.0')
+        workspace.run('release', 'publish', input=[''])
+        workspace.run('feature', 'start', '4-faster-sync')
+        workspace.commit('speed up sync')
+        workspace.git('checkout', '-q', 'develop')
+        workspace.git('merge', '-q', '--no-ff', '--no-edit', 'feature/4-faster-sync')
+        workspace.commit('Fix typo (#9)')
+        workspace.run('release', 'start', '1.1')
+
+        workspace.run('release', 'publish', input=[''])
+
+        message = workspace.git('tag', '-l', '--format=%(contents)', '1.1', cwd=workspace.canon_path)
+        assert message.splitlines() == [
+            "Changes since 1.0:",
+            "",
+            "Issue #4",
+            " - faster sync (feature/4-faster-sync)",
+            "",
+            "Issue #9",
+            " - Fix typo (#9)",
+        ]
+
+    def test_resume_after_conflict(self, workspace):
+        workspace.run('release', 'start', '1.0')
+        workspace.commit('bump', filename='file-1.txt')
+        workspace.git('checkout', '-q', 'master')
+        workspace.commit('hotfixed meanwhile', filename='file-1.txt')
+        workspace.git('checkout', '-q', 'release/1.0')
+
+        with pytest.raises(git.GitCommandError):
+            workspace.run('release', 'publish', input=['', ''])
+        assert workspace.tags() == []
+
+        output = workspace.run('release', 'publish', '1.0')
+        assert "Publishing release/1.0 was interrupted after 'fetch'." in output
+
+        workspace.git('checkout', '-q', '--theirs', 'file-1.txt')
+        workspace.git('commit', '-q', '-a', '--no-edit')
+        output = workspace.run('release', 'publish', '1.0', '--resume')
+
+        assert " - Skipped fetch, done before the publish was interrupted" in output
+        assert " - New tag (1.0) created at master's tip" in output
+        assert workspace.tags(workspace.canon_path) == ['1.0']
+        assert workspace.git('rev-parse', 'master') == workspace.git('rev-parse', 'canon/master')
+        assert 'release/1.0' not in workspace.branches()
+        assert not os.path.exists(os.path.join(workspace.path, '.git', 'flowhub', 'publish', 'release', '1.0'))
+
+    def test_restart_after_giving_up(self, workspace):
+        workspace.run('release', 'start', '1.0')
+        workspace.commit('bump', filename='file-1.txt')
+        workspace.git('checkout', '-q', 'master')
+        workspace.commit('hotfixed meanwhile', filename='file-1.txt')
+        workspace.git('checkout', '-q', 'release/1.0')
+        with pytest.raises(git.GitCommandError):
+            workspace.run('release', 'publish', input=['', ''])
+        workspace.git('merge', '--abort')
+        # gives up on the hotfix that conflicted, instead.
+        workspace.git('checkout', '-q', 'master')
+        workspace.git('reset', '-q', '--hard', 'HEAD~1')
+        workspace.git('checkout', '-q', 'release/1.0')
+
+        output = workspace.run('release', 'publish', '1.0')
+        assert ".git/flowhub/publish/release/1.0" in output
+
+        output = workspace.run('release', 'publish', '1.0', '--restart', input=[''])
+
+        assert "Gave up the interrupted publish of release/1.0; starting over." in output
+        assert workspace.tags(workspace.canon_path) == ['1.0']
+        assert not os.path.exists(os.path.join(workspace.path, '.git', 'flowhub', 'publish', 'release', '1.0'))
+
+    def test_publish_pr_notes(self, workspace, github):
+        workspace.run('release', 'start', '1.0')
+        workspace.run('release', 'publish', input=[''])
+        old = github.add_pull(workspace.canon_repo, 'suzy:feature/old', 'develop', title='Old work', merged=True)
+        old['merged_at'] = '2000-01-01T00:00:00Z'
+        github.add_pull(workspace.canon_repo, 'suzy:feature/login', 'develop', title='Fix login', merged=True)
+        github.add_pull(workspace.canon_repo, 'suzy:feature/open', 'develop', title='Still open')
+        workspace.run('release', 'start', '1.1')
+        # the tag is taken, so the first attempt stops short
+        workspace.git('tag', '1.1')
+        github.reset()
+
+        output = workspace.run('release', 'publish', '--pr-notes', input=[''])
+        assert '1.1 has already been tagged' in output
+        assert github.count('GET', '^/search/issues') == 1
+        workspace.git('tag', '-d', '1.1')
+        github.reset()
+
+        workspace.run('release', 'publish', '--pr-notes', input=[''])
+
+        assert github.count('GET', '^/search/issues') == 0
+        message = workspace.git('tag', '-l', '--format=%(contents)', '1.1', cwd=workspace.canon_path)
+        assert message.splitlines() == [
+            "Pull-requests merged since 1.0:",
+            " - #2 Fix login (@suzy)",
+        ]
+
+    def test_contribute(self, workspace, github):
+        workspace.run('release', 'start', '1.0')
+        workspace.git('checkout', '-q', '-b', 'notes')
+        workspace.commit('release notes')
+
+        workspace.run('release', 'contribute', input=['n', 'Release notes'])
+
+        assert 'notes' in workspace.remote_branches(workspace.origin_path)
+        pulls = github.repos[workspace.canon_repo]['pulls'].values()
+        assert [(p['head'], p['base']) for p in pulls] == [('suzy:notes', 'release/1.0')]
+
+
+class HotfixTestCase(object):
+    def test_start(self, workspace):
+        workspace.run('hotfix', 'start', '1.0.1')
+
+        assert workspace.current_branch() == 'hotfix/1.0.1'
+        assert 'hotfix/1.0.1' in workspace.remote_branches(workspace.canon_path)
+
+    def test_start_suggests_next_version(self, workspace):
+        workspace.git('tag', '1.0')
+        workspace.git('tag', '1.0.1')
+
+        output = workspace.run('hotfix', 'start', input=[''])
+
+        assert 'Latest version: 1.0.1; next major 2.0.0, minor 1.1.0, patch 1.0.2' in output
+        assert workspace.current_branch() == 'hotfix/1.0.2'
+
+    def test_publish(self, workspace):
+        workspace.run('hotfix', 'start', '1.0.1')
+        workspace.commit('fix')
+
+        workspace.run('hotfix', 'publish', input=[''])
+
+        assert workspace.current_branch() == 'develop'
+        assert workspace.tags(workspace.canon_path) == ['1.0.1']
+        assert workspace.remote_branches(workspace.canon_path) == ['develop', 'master']
+        assert workspace.git('rev-parse', 'master', cwd=workspace.canon_path) == \
+            workspace.git('rev-parse', 'master')
+
+    def test_contribute(self, workspace, github):
+        workspace.run('hotfix', 'start', '1.0.1')
+        workspace.git('checkout', '-q', '-b', 'the-fix')
+        workspace.commit('fix')
+
+        workspace.run('hotfix', 'contribute', input=['n', 'The fix'])
+
+        assert 'the-fix' in workspace.remote_branches(workspace.origin_path)
+        pulls = github.repos[workspace.canon_repo]['pulls'].values()
+        assert [(p['head'], p['base']) for p in pulls] == [('suzy:the-fix', 'hotfix/1.0.1')]
+
+
+class HookTestCase(object):
+    def write_hook(self, workspace, name, body):
+        path = os.path.join(workspace.path, '.git', 'hooks', name)
+        with open(path, 'w') as f:
+            f.write("#!/bin/sh\n" + body)
+        os.chmod(path, 0o755)
+
+    def test_failing_script_stops_publish(self, workspace):
+        self.write_hook(workspace, 'pre-release-publish', 'exit 1')
+        workspace.run('release', 'start', '1.0')
+
+        workspace.run('release', 'publish', input=[''])
+        assert workspace.tags(workspace.canon_path) == []
+
+        workspace.run('--no-verify', 'release', 'publish', input=[''])
+        assert workspace.tags(workspace.canon_path) == ['1.0']
+
+    def test_python_hook(self, workspace):
+        with open(os.path.join(workspace.path, 'ci_hooks.py'), 'w') as f:
+            f.write(
+                "def announce(context):\n"
+                "    context.summary.append('Announced {} from {} ({})'.format(\n"
+                "        context.tag, context.branch, ' '.join(context.args)))\n"
+            )
+        workspace.git('config', 'flowhub.hooks.post-release-publish', 'ci_hooks.py:announce')
+        workspace.run('release', 'start', '1.0')
+
+        output = workspace.run('release', 'publish', input=['v1.0'])
+
+        assert 'Announced v1.0 from develop (1.0)' in output
+
+
+    def test_detached_post_hook(self, workspace):
+        self.write_hook(workspace, 'post-feature-start', 'sleep 0.2; echo "started $FLOWHUB_BRANCH"')
+        workspace.git('config', 'flowhub.hooks.detach', 'true')
+
+        output = workspace.run('feature', 'start', 'the-feature')
+
+        assert 'Started hook post-feature-start in the background' in output
+        log = os.path.join(workspace.path, '.git', 'flowhub', 'hooks', 'post-feature-start.log')
+        deadline = time.time() + 5
+        while 'post-feature-start passed' not in (open(log).read() if os.path.exists(log) else ''):
+            assert time.time() < deadline
+            time.sleep(0.02)
+        assert 'started feature/the-feature' in open(log).read()
+
+
+class IssueTestCase(object):
+    def test_start(self, workspace, github):
+        workspace.run('issue', 'start', 'A bug', '-b', input=[''])
+
+        issues = github.repos[workspace.canon_repo]['issues']
+        assert [i['title'] for i in issues.values()] == ['A bug']
+        assert 'feature/1-a-bug' in workspace.branches()
+
+
+class CleanupTestCase(object):
+    def test_all(self, workspace):
+        workspace.run('feature', 'start', 'the-feature')
+        workspace.run('feature', 'start', 'other')
+        workspace.git('checkout', '-q', 'develop')
+
+        workspace.run('cleanup', '-a')
+
+        assert workspace.branches() == ['develop', 'master']
+
+
+class SyncTestCase(object):
+    def test_offline_then_sync(self, workspace, github):
+        workspace.run('--offline', 'feature', 'start', '--track', 'the-feature')
+        workspace.commit('work')
+        workspace.run('--offline', 'feature', 'publish')
+        assert workspace.remote_branches(workspace.origin_path) == ['develop', 'master']
+        assert github.requests == []
+
+        workspace.run('sync', input=['n', 'The feature'])
+
+        assert 'feature/the-feature' in workspace.remote_branches(workspace.origin_path)
+        assert len(github.repos[workspace.canon_repo]['pulls']) == 1
+        # one push, however many were recorded.
+        assert len([c for c in workspace.git_calls if c[1:2] == ['push']]) == 1
+
+    def test_sync_to_existing_pull_request_jsonl(self, workspace, github):
+        workspace.run('--offline', 'feature', 'start', '--track', 'the-feature')
+        workspace.commit('work')
+        workspace.run('--offline', 'feature', 'publish')
+        pull = github.add_pull(workspace.canon_repo, 'suzy:feature/the-feature', 'develop')
+
+        output = workspace.run('--output=jsonl', 'sync')
+
+        events = [json.loads(line) for line in output.splitlines()]
+        assert [(e['refs'], e['number']) for e in events if e['step'] == 'pull-request'] == [
+            (['suzy:feature/the-feature', 'develop'], pull['number']),
+        ]
+
+    def test_index(self, workspace, github):
+        github.add_issue(workspace.canon_repo, 'Faster sync')
+        assert 'Indexed 0 pull-requests and 1 issues' in workspace.run('sync')
+        assert os.path.exists(os.path.join(workspace.path, '.git', 'flowhub', 'github.sqlite'))
+
+        workspace.run('feature', 'start', '1-faster-sync')
+        workspace.commit('work')
+        github.reset()
+        workspace.run('feature', 'publish')
+
+        # answered from the index: no listing of pull-requests, no issue lookup
+        assert github.count('GET', r'/pulls$') == 0
+        assert github.count('GET', r'/issues/1$') == 0
+        [pull] = github.repos[workspace.canon_repo]['pulls'].values()
+        assert pull['number'] == 1
+
+        github.reset()
+        workspace.run('sync')
+
+        # only what's changed since the last sync
+        listings = [r for r in github.requests if r.path.endswith(('/pulls', '/issues'))]
+        assert [r.query.get('state') for r in listings] == ['all', 'all']
+        assert 'since' in listings[1].query
+
+    def test_stale_index(self, workspace, github):
+        workspace.run('sync')
+        workspace.git('config', 'flowhub.index.maxage', '0')
+        workspace.run('feature', 'start', 'the-feature')
+        workspace.commit('work')
+        github.reset()
+
+        workspace.run('feature', 'publish', input=['n', 'The feature'])
+
+        assert github.count('GET', r'/pulls$') == 1
+
+
+class OutputTestCase(object):
+    def test_jsonl(self, workspace):
+        output = workspace.run('--output=jsonl', 'feature', 'start', '--track', 'the-feature')
+
+        events = [json.loads(line) for line in output.splitlines()]
+        assert [e['step'] for e in events] == ['branch', 'push', 'checkout']
+        assert events[0]['refs'] == ['feature/the-feature']
+        assert events[0]['sha'] == workspace.git('rev-parse', 'develop')
+        assert events[1]['remote'] == 'origin'
+        assert all(e['duration'] >= 0 for e in events)
+
+    def test_jsonl_existing_pull_request(self, workspace, github):
+        workspace.run('feature', 'start', 'the-feature')
+        workspace.commit('work')
+        workspace.run('feature', 'publish', input=['n', 'The feature'])
+        workspace.commit('more work')
+
+        output = workspace.run('--output=jsonl', 'feature', 'publish')
+
+        events = [json.loads(line) for line in output.splitlines()]
+        pull = [e for e in events if e['step'] == 'pull-request']
+        assert len(pull) == 1
+        assert pull[0]['existing']
+        assert pull[0]['refs'] == ['suzy:feature/the-feature', 'develop']
+        assert pull[0]['number'] == github.repos[workspace.canon_repo]['pulls'].keys()[0]
+
+    def test_text(self, workspace):
+        output = workspace.run('feature', 'start', '--track', 'the-feature')
+
+        assert output.strip().splitlines() == [
+            "Summary of actions:",
+            " - New branch feature/the-feature created, from branch develop",
+            " - Created a remote tracking branch on origin for feature/the-feature",
+            " - Checked out branch feature/the-feature",
+        ]
+
+
+class StatusTestCase(object):
+    def test_status(self, workspace):
+        workspace.run('feature', 'start', '--track', 'the-feature')
+        workspace.commit('work')
+        workspace.git('checkout', '-q', 'develop')
+        workspace.commit('elsewhere')
+        workspace.commit('and again')
+        workspace.run('hotfix', 'start', '1.0.1')
+
+        output = workspace.run('status')
+
+        lines = output.splitlines()
+        assert lines[0].split()[:4] == ['feature/the-feature', '+1', '-2', 'develop']
+        assert lines[0].endswith('origin/feature/the-feature [ahead 1]')
+        assert lines[1].split()[:5] == ['*', 'hotfix/1.0.1', '+0', '-0', 'master']
+        assert [c[1] for c in workspace.git_calls if c[1] != 'cat-file'] == ['for-each-ref', 'rev-list']
+
+    def test_no_branches(self, workspace):
+        assert 'There are no feature, release or hotfix branches.' in workspace.run('status')
+
+
+class StatsTestCase(object):
+    def test_stats_json(self, workspace, github):
+        workspace.run('feature', 'start', 'the-feature')
+        workspace.commit('work')
+        github.reset()
+
+        output = workspace.run('--stats-json', 'feature', 'publish', input=['n', 'The feature'])
+
+        stats = json.loads(output.strip().splitlines()[-1])
+        assert stats['requests'] == len(github.requests)
+        assert stats['endpoints']['POST /repos/:owner/:repo/pulls']['requests'] == 1
+        assert stats['callers']['PullRequestManager.create_pull']['requests'] >= 1
+        [push] = stats['transfers']
+        assert (push['operation'], push['remote']) == ('push', 'origin')
+        assert push['caller'] == 'FeatureManager.publish'
+        assert push['objects'] == 3
+        assert push['bytes'] > 0
+
+    def test_failed_push(self, workspace):
+        workspace.run('feature', 'start', 'the-feature')
+        workspace.git('config', 'remote.origin.url', '/no/such/repo')
+
+        with pytest.raises(git.GitCommandError) as failure:
+            workspace.run('feature', 'publish', input=['n'])
+
+        assert "'/no/such/repo' does not appear to be a git repository" in str(failure.value)
+
+    def test_stats_text(self, workspace):
+        output = workspace.run('--stats', 'feature', 'list')
+
+        assert 'GitHub requests: ' in output
+        assert 'GET /user' in output
+
+
+class ProfileTestCase(object):
+    def test_profile(self, workspace, tmpdir):
+        path = str(tmpdir.join('publish.prof'))
+        workspace.run('feature', 'start', 'the-feature')
+        workspace.commit('work')
+
+        output = workspace.run('--profile={}'.format(path), 'feature', 'publish', input=['n', 'The feature'])
+
+        assert 'Profile written to {}'.format(path) in output
+        with open(str(tmpdir.join('publish.trace.json'))) as f:
+            names = set(e['name'] for e in json.load(f)['traceEvents'])
+        assert {
+            'Engine.__init__', 'Engine.publish_feature', 'FeatureManager.publish',
+            'git push', 'POST /repos/:owner/:repo/pulls',
+        } <= names
+        assert os.path.getsize(path) > 0
+
+
+class MultiTestCase(object):
+    def test_feature_start(self, workspace, other_workspace, tmpdir):
+        manifest = tmpdir.join('repos')
+        manifest.write("work\n# not this one\nother/work\n")
+
+        output = workspace.run('multi', str(manifest), 'feature', 'start', '--track', 'the-feature')
+
+        assert '2 succeeded, 0 failed' in output
+        for w in (workspace, other_workspace):
+            assert w.current_branch() == 'feature/the-feature'
+            assert 'feature/the-feature' in w.remote_branches(w.origin_path)
+
+    def test_failures_are_reported(self, workspace, other_workspace, tmpdir):
+        other_workspace.git('config', '--unset', 'flowhub.structure.name')
+        manifest = tmpdir.join('repos')
+        manifest.write("work\nother/work\n")
+
+        output = workspace.run('multi', str(manifest), 'feature', 'list')
+
+        assert '1 succeeded, 1 failed' in output
+        assert 'other/work: FAILED' in output
+
+
+class TrainTestCase(object):
+    def test_publish(self, workspace, other_workspace, tmpdir):
+        for w in (workspace, other_workspace):
+            w.run('release', 'start', '1.0')
+            w.commit('bump')
+        manifest = tmpdir.join('repos')
+        manifest.write("other/work: work\nwork\n")
+
+        output = workspace.run('train', str(manifest), '-m', 'The big one')
+
+        assert '2 succeeded, 0 failed' in output
+        for w in (workspace, other_workspace):
+            assert w.tags(w.canon_path) == ['1.0']
+            assert w.git('tag', '-l', '--format=%(contents)', '1.0', cwd=w.canon_path) == 'The big one'
+            assert w.remote_branches(w.canon_path) == ['develop', 'master']
+            assert w.current_branch() == 'develop'
+
+    def test_nothing_published_unless_all_ready(self, workspace, other_workspace, tmpdir):
+        for w in (workspace, other_workspace):
+            w.run('release', 'start', '1.0')
+        with open(os.path.join(other_workspace.path, 'file-1.txt'), 'a') as f:
+            f.write('uncommitted\n')
+        manifest = tmpdir.join('repos')
+        manifest.write("work\nother/work\n")
+
+        output = workspace.run('train', str(manifest))
+
+        assert 'other/work: FAILED\n    uncommitted changes' in output
+        assert 'nothing was published' in output
+        assert workspace.tags(workspace.canon_path) == []
+
+    def test_conflicts_found_before_publishing(self, workspace, tmpdir):
+        workspace.run('release', 'start', '1.0')
+        workspace.commit('bump', filename='file-1.txt')
+        workspace.git('checkout', '-q', 'master')
+        workspace.commit('hotfixed meanwhile', filename='file-1.txt')
+        workspace.git('push', '-q', 'canon', 'master')
+        workspace.git('reset', '-q', '--hard', 'HEAD~1')
+        workspace.git('checkout', '-q', 'release/1.0')
+        manifest = tmpdir.join('repos')
+        manifest.write("work\n")
+
+        output = workspace.run('train', str(manifest))
+
+        assert 'Fast-forwarded master to canon/master' in output
+        assert "release/1.0 doesn't merge cleanly into master" in output
+        assert workspace.tags(workspace.canon_path) == []
+
+    def test_interrupted_publish_found_before_publishing(self, workspace, tmpdir):
+        workspace.run('release', 'start', '1.0')
+        workspace.commit('bump', filename='file-1.txt')
+        workspace.git('checkout', '-q', 'master')
+        workspace.commit('hotfixed meanwhile', filename='file-1.txt')
+        workspace.git('checkout', '-q', 'release/1.0')
+        with pytest.raises(git.GitCommandError):
+            workspace.run('release', 'publish', input=['', ''])
+        workspace.git('merge', '--abort')
+        manifest = tmpdir.join('repos')
+        manifest.write("work\n")
+
+        output = workspace.run('train', str(manifest))
+
+        assert "publishing release/1.0 was interrupted" in output
+        assert 'nothing was published' in output
+        assert workspace.tags(workspace.canon_path) == []
+
+    def test_tagged_version_found_before_publishing(self, workspace, tmpdir):
+        workspace.run('release', 'start', '1.0')
+        workspace.commit('bump')
+        workspace.git('tag', '1.0', 'develop')
+        manifest = tmpdir.join('repos')
+        manifest.write("work\n")
+
+        output = workspace.run('train', str(manifest))
+
+        assert 'work: FAILED\n    1.0 is already tagged' in output
+        assert 'nothing was published' in output
+        assert workspace.git('rev-parse', 'master') == workspace.git('rev-parse', 'canon/master')
@@ -0,0 +1,196 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+import BaseHTTPServer
+import json
+import os
+import re
+import threading
+
+import github
+import mock
+import pytest
+
+from flowhub.managers.graphql import (
+    GraphQLClient, GraphQLError, GraphQLPullRequestManager, graphql_url,
+)
+from flowhub.state import State
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'graphql')
+
+
+class ReplayHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers GraphQL requests with the recorded response for their operation."""
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        operation = re.search('(query|mutation) (\w+)', payload['query']).group(2)
+        self.server.requests.append((operation, payload['variables']))
+
+        fixture = self.server.overrides.get(operation, operation)
+        with open(os.path.join(FIXTURES, '{}.json'.format(fixture))) as f:
+            body = f.read()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.yield_fixture
+def graphql_server():
+    server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), ReplayHandler)
+    server.requests = []
+    server.overrides = {}
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(graphql_server):
+    return GraphQLClient(
+        'the-token',
+        'http://127.0.0.1:{}/graphql'.format(graphql_server.server_port),
+    )
+
+
+@pytest.fixture
+def manager(client):
+    origin = mock.MagicMock()
+    canon = mock.MagicMock()
+    return GraphQLPullRequestManager(
+        debug=0,
+        prefix='the_repo',
+        origin=origin,
+        canon=canon,
+        master=mock.MagicMock(),
+        develop=mock.MagicMock(),
+        release=mock.MagicMock(),
+        hotfix=mock.MagicMock(),
+        repo=mock.MagicMock(),
+        gh=mock.MagicMock(),
+        offline=False,
+        graphql=client,
+        bootstrap=client.bootstrap('the_repo'),
+    )
+
+
+def branch(name):
+    head = mock.MagicMock()
+    head.name = name
+    return head
+
+
+class GraphQLUrlTestCase(object):
+    def test_github_dot_com(self):
+        assert graphql_url('https://api.github.com') == 'https://api.github.com/graphql'
+
+    def test_enterprise(self):
+        assert graphql_url('https://ghe.example.com/api/v3/') == 'https://ghe.example.com/api/graphql'
+
+
+class GraphQLClientTestCase(object):
+    def test_bootstrap(self, client, graphql_server):
+        data = client.bootstrap('the_repo')
+
+        assert data['viewer']['login'] == 'suzy'
+        assert data['viewer']['repository']['parent']['nameWithOwner'] == 'canon-org/the_repo'
+        assert graphql_server.requests == [('Bootstrap', {'name': 'the_repo'})]
+
+    def test_bootstrap_missing_repo(self, client, graphql_server):
+        graphql_server.overrides['Bootstrap'] = 'Bootstrap-missing'
+
+        with pytest.raises(GraphQLError):
+            client.bootstrap('no_such_repo')
+
+
+class GraphQLPullRequestManagerTestCase(object):
+    def test_targets_parent_of_fork(self, manager):
+        assert manager.login == 'suzy'
+        assert manager.gh_repo_name == 'canon-org/the_repo'
+        manager.gh.get_repo.assert_called_once_with('canon-org/the_repo', lazy=True)
+
+    def test_add_to_existing_pull(self, manager, graphql_server):
+        summary = []
+        pr = manager.add_to_pull(branch('develop'), branch('feature/40-frobnicate'), summary)
+
+        assert pr.number == 41
+        assert pr.issue_url == '/repos/canon-org/the_repo/issues/41'
+        assert len(summary) == 1
+        assert [op for op, _ in graphql_server.requests] == ['Bootstrap', 'PullRequestState']
+        assert graphql_server.requests[-1][1]['issue'] == 40
+
+    def test_no_existing_pull(self, manager):
+        summary = []
+
+        assert not manager.add_to_pull(branch('develop'), branch('feature/docs'), summary)
+        assert summary == []
+
+    def test_state_is_fetched_once(self, manager, graphql_server):
+        manager.add_to_pull(branch('develop'), branch('feature/12-slow'), [])
+        issue = manager.get_issue(12)
+        labels = [l.name for l in manager._labels()]
+
+        assert issue.number == 12
+        assert issue.title == 'The frobnicator is slow'
+        assert labels == ['bug', 'enhancement', 'question']
+        assert [op for op, _ in graphql_server.requests] == ['Bootstrap', 'PullRequestState']
+        assert manager.gh_repo.get_issue.call_count == 0
+
+    def test_branch_state_kept_apart(self, manager, graphql_server, tmpdir):
+        manager.repo.git_dir = str(tmpdir)
+
+        assert isinstance(manager.state, State)
+        pr = manager.add_to_pull(branch('develop'), branch('feature/40-frobnicate'), [])
+
+        assert pr.number == 41
+        assert isinstance(manager.state, State)
+
+    def test_unknown_issue_falls_back_to_rest(self, manager):
+        manager.get_issue(99)
+
+        manager.gh_repo.get_issue.assert_called_once_with(99)
+
+    def test_branch_named_for_missing_issue(self, manager, graphql_server):
+        graphql_server.overrides['PullRequestState'] = 'PullRequestState-unknown-issue'
+        manager.gh_repo.get_issue.side_effect = github.GithubException(404, {})
+
+        assert not manager.add_to_pull(branch('develop'), branch('feature/123-foo'), [])
+        assert manager.get_issue(123) is None
+        assert graphql_server.requests[-1][1]['issue'] == 123
+        manager.gh_repo.get_issue.assert_called_once_with(123)
+
+    def test_open_issue_uses_cached_labels(self, manager, graphql_server):
+        manager.open_issue('title', 'body', ['bug', 'nonexistent'], [])
+
+        _, kwargs = manager.gh_repo.create_issue.call_args
+        assert [l.name for l in kwargs['labels']] == ['bug']
+        assert [op for op, _ in graphql_server.requests] == ['Bootstrap', 'PullRequestState']
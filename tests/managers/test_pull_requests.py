@@ -0,0 +1,166 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+import mock
+import pytest
+from github import GithubException
+
+from flowhub.managers.pull_request import PullRequestManager
+
+
+class CreatePullsTestCase(object):
+    MANAGER_CLASS = PullRequestManager
+    PREFIX = 'repo'
+
+    @pytest.fixture(autouse=True)
+    def setup(self, manager):
+        manager._login = 'suzy'
+        manager.gh.rate_limiting = (5000, 5000)
+        manager.gh_repo.get_issue.side_effect = lambda n: 'issue {}'.format(n)
+        # pull-requests are opened from several threads; mocks mustn't create
+        # their attributes on the fly there.
+        manager.gh_repo.create_pull.return_value = mock.MagicMock(number=1, html_url='url', issue_url='url')
+        manager.develop.name = 'develop'
+
+    def test_existing(self, manager):
+        pr = mock.MagicMock()
+        summary = []
+
+        results = manager.create_pulls(
+            manager.develop, ['feature/a'], summary, pulls={'suzy:feature/a': pr},
+        )
+
+        assert [(r.head, r.status, r.pr) for r in results] == [('feature/a', 'existing', pr)]
+        assert manager.gh_repo.create_pull.call_count == 0
+        assert summary[0].startswith("Pull-request already open for feature/a")
+
+    def test_created(self, manager):
+        summary = []
+
+        results = manager.create_pulls(
+            manager.develop, ['feature/some-thing', 'feature/12-fix'], summary, pulls={},
+        )
+
+        assert [(r.head, r.status) for r in results] == [
+            ('feature/some-thing', 'created'),
+            ('feature/12-fix', 'created'),
+        ]
+        manager.gh_repo.create_pull.assert_has_calls([
+            mock.call(title="Some thing", body="", base=manager.develop.name, head='suzy:feature/some-thing'),
+            mock.call(issue='issue 12', base=manager.develop.name, head='suzy:feature/12-fix'),
+        ], any_order=True)
+        assert len(summary) == 2
+
+    def test_skipped_over_budget(self, manager):
+        manager.gh.rate_limiting = (102, 5000)
+
+        results = manager.create_pulls(
+            manager.develop, ['feature/a', 'feature/3-b', 'feature/c'], [], pulls={},
+        )
+
+        # the issue-named branch costs two requests; the last one still fits
+        assert [r.status for r in results] == ['created', 'skipped', 'created']
+        assert manager.gh_repo.create_pull.call_count == 2
+
+    def test_client_per_thread(self, manager):
+        clients = []
+
+        def new_client():
+            client = mock.MagicMock()
+            gh_repo = client.get_repo.return_value
+            gh_repo.create_pull.return_value = mock.MagicMock(number=len(clients))
+            gh_repo.get_issue.side_effect = lambda n: 'issue {}'.format(n)
+            clients.append(client)
+            return client
+        manager.new_client = new_client
+        heads = ['feature/{}-work'.format(n) for n in range(7)]
+
+        results = manager.create_pulls(manager.develop, heads, [], pulls={}, concurrency=3)
+
+        assert [r.status for r in results] == ['created'] * 7
+        assert len(clients) == 3
+        # each client opens every third pull-request, one at a time.
+        for i, client in enumerate(clients):
+            client.get_repo.assert_called_once_with(manager.gh_repo.full_name, lazy=True)
+            gh_repo = client.get_repo.return_value
+            assert [c[1]['head'] for c in gh_repo.create_pull.call_args_list] == \
+                ['suzy:{}'.format(h) for h in heads[i::3]]
+            assert [r.pr.number for r in results[i::3]] == [i] * len(heads[i::3])
+        assert manager.gh_repo.create_pull.call_count == 0
+        assert manager.gh_repo.get_issue.call_count == 0
+
+    def test_failed(self, manager):
+        manager.gh_repo.create_pull.side_effect = GithubException(422, {'message': 'No commits'})
+        summary = []
+
+        results = manager.create_pulls(manager.develop, ['feature/a'], summary, pulls={})
+
+        assert results[0].status == 'failed'
+        assert results[0].pr is None
+        assert 'No commits' in results[0].error
+        assert summary[0].startswith("Couldn't open a pull-request for feature/a")
+
+
+class IndexTestCase(object):
+    MANAGER_CLASS = PullRequestManager
+    PREFIX = 'repo'
+
+    @pytest.fixture(autouse=True)
+    def setup(self, manager):
+        manager._login = 'suzy'
+        manager.index = mock.MagicMock()
+        manager.index.fresh.return_value = True
+        manager.index.open_pulls.return_value = [{
+            'number': 4, 'title': 'A', 'state': 'open', 'url': 'api/pulls/4',
+            'html_url': 'html/pull/4', 'issue_url': 'api/issues/4',
+            'head_label': 'suzy:feature/a', 'head_ref': 'feature/a', 'base_ref': 'develop',
+        }]
+        manager.index.issue.side_effect = lambda n: {
+            'number': n, 'title': 'Issue', 'state': 'open', 'url': 'api/issues/{}'.format(n),
+            'html_url': 'html/issues/{}'.format(n),
+        } if n == 12 else None
+
+    def test_find_pull(self, manager):
+        pr = manager.find_pull(manager.develop, 'feature/a')
+
+        assert (pr.number, pr.issue_url, pr.head.label) == (4, 'api/issues/4', 'suzy:feature/a')
+        assert manager.gh_repo.get_pulls.call_count == 0
+        manager.index.fresh.assert_called_with(manager.gh_repo.full_name)
+
+    def test_get_issue(self, manager):
+        assert manager.get_issue(12).html_url == 'html/issues/12'
+        assert manager.gh_repo.get_issue.call_count == 0
+
+        # not in the index: ask GitHub
+        assert manager.get_issue(13) is manager.gh_repo.get_issue.return_value
+
+    def test_stale(self, manager):
+        manager.index.fresh.return_value = False
+
+        assert manager.find_pull(manager.develop, 'feature/a') is None
+        manager.gh_repo.get_pulls.assert_called_once_with('open')
+        assert manager.get_issue(12) is manager.gh_repo.get_issue.return_value
+
+    def test_remembers_new_pulls(self, manager):
+        manager.develop.name = 'develop'
+
+        pr = manager.create_pull(manager.develop, 'feature/b', 'issue', [])
+
+        manager.index.put_pull.assert_called_once_with(pr)
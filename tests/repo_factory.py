@@ -0,0 +1,199 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from collections import namedtuple
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+
+# Bump when the generated history changes, so cached repositories are rebuilt.
+FORMAT = 1
+
+EPOCH = 1300000000
+
+RepoSpec = namedtuple("RepoSpec", [
+    "commits",   # develop's first-parent history
+    "files",     # files in the worktree
+    "features",  # feature/f0, feature/f1, ...
+    "merged",    # how many of those features develop has merged
+    "releases",  # release/r0, ...
+    "hotfixes",  # hotfix/h0, ...
+    "tags",      # 0.1.0, 0.2.0, ... along master
+])
+
+
+def spec(commits=10, files=5, features=0, merged=0, releases=0, hotfixes=0, tags=0):
+    """A RepoSpec, with defaults for everything left out."""
+    if merged > features:
+        raise ValueError("can't merge {} of {} features".format(merged, features))
+    return RepoSpec(commits, files, features, merged, releases, hotfixes, tags)
+
+
+class _Stream(object):
+    """Writes the commands for git fast-import, numbering the commits."""
+
+    def __init__(self, out):
+        self.out = out
+        self.marks = 0
+
+    def data(self, text):
+        self.out.write("data {}\n{}\n".format(len(text), text))
+
+    def commit(self, ref, message, parent=None, merge=None, files=()):
+        self.marks += 1
+        self.out.write("commit {}\nmark :{}\n".format(ref, self.marks))
+        self.out.write("committer Suzy <suzy@example.com> {} +0000\n".format(EPOCH + self.marks))
+        self.data(message)
+        if parent is not None:
+            self.out.write("from :{}\n".format(parent))
+        if merge is not None:
+            self.out.write("merge :{}\n".format(merge))
+        for path in files:
+            self.out.write("M 644 inline {}\n".format(path))
+            self.data("{}: {}\n".format(path, message))
+        return self.marks
+
+    def reset(self, ref, mark):
+        self.out.write("reset {}\nfrom :{}\n\n".format(ref, mark))
+
+
+def write_history(out, spec):
+    """Streams the repository described by spec to out, for git fast-import.
+
+    develop is spec.commits commits long, each changing one file. Features
+    fork from points spread along it, newest first: feature/f0 from the tip,
+    the last from near the root. The oldest spec.merged of them are merged
+    back with --no-ff merges a couple of commits after they forked. master
+    sits a tenth of the way back, with the tags spread along the way to it,
+    and releases fork from develop's tip, hotfixes from master.
+    """
+    stream = _Stream(out)
+    mainline = [stream.commit(
+        'refs/heads/develop', "Initial commit",
+        files=["file-{}.txt".format(n) for n in range(spec.files)],
+    )]
+
+    # forks[p] are the features forking from mainline[p]; merges[p] are
+    # those to merge into develop once it's p commits long.
+    forks, merges = {}, {}
+    for n in range(spec.features):
+        base = max(0, spec.commits - 1 - n * spec.commits // max(spec.features, 1))
+        forks.setdefault(base, []).append(n)
+        if n >= spec.features - spec.merged:
+            merges.setdefault(min(base + 2, spec.commits - 1), []).append(n)
+
+    tips = {}
+
+    def fork(position):
+        for n in forks.get(position, ()):
+            tips[n] = stream.commit(
+                'refs/heads/feature/f{}'.format(n), "Work on f{}".format(n),
+                parent=mainline[position], files=["feature-{}.txt".format(n)],
+            )
+
+    fork(0)
+    for position in range(1, spec.commits):
+        merging = merges.pop(position, [])
+        ready = [n for n in merging if n in tips]
+        # one merge per commit; the rest wait for the next
+        merges.setdefault(position + 1, []).extend(n for n in merging if n not in ready[:1])
+        if ready:
+            mark = stream.commit(
+                'refs/heads/develop', "Merge branch 'feature/f{}' into develop".format(ready[0]),
+                parent=mainline[-1], merge=tips[ready[0]],
+            )
+        else:
+            mark = stream.commit(
+                'refs/heads/develop', "Change {}".format(position),
+                parent=mainline[-1], files=["file-{}.txt".format(position % max(spec.files, 1))],
+            )
+        mainline.append(mark)
+        fork(position)
+
+    master = mainline[spec.commits * 9 // 10 if spec.commits > 1 else 0]
+    stream.reset('refs/heads/master', master)
+    master_position = mainline.index(master)
+    for n in range(1, spec.tags + 1):
+        stream.reset('refs/tags/0.{}.0'.format(n), mainline[master_position * n // spec.tags])
+
+    for n in range(spec.releases):
+        stream.commit('refs/heads/release/r{}'.format(n), "Prepare r{}".format(n),
+                      parent=mainline[-1], files=["VERSION"])
+    for n in range(spec.hotfixes):
+        stream.commit('refs/heads/hotfix/h{}'.format(n), "Fix h{}".format(n),
+                      parent=master, files=["hotfix-{}.txt".format(n)])
+
+
+def build(path, spec):
+    """Generates the bare repository described by spec at path.
+
+    The history is streamed through one git fast-import, then the refs are
+    packed and a commit-graph written, as on a well-kept clone.
+    """
+    subprocess.check_call(['git', 'init', '-q', '--bare', path])
+    importer = subprocess.Popen(
+        ['git', 'fast-import', '--quiet'], cwd=path, stdin=subprocess.PIPE,
+    )
+    write_history(importer.stdin, spec)
+    importer.stdin.close()
+    if importer.wait() != 0:
+        raise RuntimeError("git fast-import failed for {}".format(spec))
+
+    subprocess.check_call(['git', 'symbolic-ref', 'HEAD', 'refs/heads/develop'], cwd=path)
+    subprocess.check_call(['git', 'pack-refs', '--all'], cwd=path)
+    subprocess.check_call(['git', 'commit-graph', 'write', '--reachable'], cwd=path)
+    return path
+
+
+def key(spec):
+    """Names a generated repository after everything that shaped it."""
+    described = json.dumps([FORMAT, spec._asdict()], sort_keys=True)
+    return hashlib.sha1(described).hexdigest()[:16]
+
+
+def cached(cache_dir, spec):
+    """The repository for spec in cache_dir, generating it the first time.
+
+    Repositories are built under a temporary name and renamed into place,
+    so a half-built one is never picked up, even by a concurrent session.
+    """
+    path = os.path.join(cache_dir, '{}.git'.format(key(spec)))
+    if os.path.isdir(path):
+        return path
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    building = tempfile.mkdtemp(dir=cache_dir, prefix='building-')
+    try:
+        build(os.path.join(building, 'repo.git'), spec)
+        try:
+            os.rename(os.path.join(building, 'repo.git'), path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+    finally:
+        shutil.rmtree(building, ignore_errors=True)
+
+    return path
@@ -0,0 +1,67 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import threading
+
+import pytest
+
+from flowhub.background import TaskTimeout, in_background
+
+
+class BackgroundTestCase(object):
+    def test_result(self):
+        task = in_background(lambda a, b=0: a + b, 1, b=2)
+
+        assert task.result() == 3
+
+    def test_runs_concurrently(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def wait():
+            started.set()
+            release.wait(5)
+            return 'done'
+
+        task = in_background(wait)
+        assert started.wait(5)
+        release.set()
+
+        assert task.result() == 'done'
+
+    def test_reraises(self):
+        def fail():
+            raise ValueError("nope")
+
+        task = in_background(fail)
+
+        with pytest.raises(ValueError):
+            task.result()
+
+    def test_timeout(self):
+        release = threading.Event()
+        task = in_background(release.wait, 5)
+
+        with pytest.raises(TaskTimeout):
+            task.result(timeout=0.01)
+
+        release.set()
+        assert task.result(timeout=5)
@@ -0,0 +1,116 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import subprocess
+
+import git
+import pytest
+
+from flowhub.changelog import Changelog, changelog, first_parent_log, previous_tag
+
+
+MERGE = ['a', 'b']
+COMMIT = ['a']
+
+
+@pytest.fixture
+def repo(tmpdir):
+    path = str(tmpdir)
+
+    def run(*args):
+        subprocess.check_output(('git',) + args, cwd=path, stderr=subprocess.STDOUT)
+
+    run('init', '-q')
+    run('config', 'user.name', 'Suzy')
+    run('config', 'user.email', 'suzy@example.com')
+    run('commit', '-q', '--allow-empty', '-m', 'Initial')
+    run('tag', '-a', '1.0', '-m', 'first')
+    run('checkout', '-q', '-b', 'feature/12-fix-login')
+    run('commit', '-q', '--allow-empty', '-m', 'Inner work')
+    run('checkout', '-q', 'master')
+    run('commit', '-q', '--allow-empty', '-m', 'Bump version (#3)')
+    run('merge', '-q', '--no-ff', '--no-edit', 'feature/12-fix-login')
+    return git.Repo(path)
+
+
+class ChangelogTestCase(object):
+    def test_groups(self):
+        log = Changelog(prefixes=['feature/'], ignore=['master', 'develop'])
+        log.add(MERGE, "Merge pull request #40 from suzy/feature/new-header")
+        log.add(MERGE, "Merge branch 'feature/7-crash' into develop")
+        log.add(MERGE, "Merge branch 'master' into develop")
+        log.add(MERGE, "Merge remote-tracking branch 'canon/develop'")
+        log.add(COMMIT, "Tidy up")
+        log.add(COMMIT, "Really fix the crash (#7)")
+
+        assert log.render('1.0') == "\n".join([
+            "Changes since 1.0:",
+            "",
+            "Issue #7",
+            " - Really fix the crash (#7)",
+            " - crash (feature/7-crash)",
+            "",
+            "Features",
+            " - new header (feature/new-header)",
+            "",
+            "Other changes",
+            " - Tidy up",
+        ])
+
+    def test_limit(self):
+        log = Changelog(limit=2)
+        for n in range(5):
+            log.add(COMMIT, "Change {}".format(n))
+
+        assert log.count == 5
+        assert log.render().splitlines()[-1] == "...and 3 more"
+        assert sum(len(entries) for entries in log.groups.values()) == 2
+
+    def test_nothing_new(self):
+        assert Changelog().render('1.0') == ""
+
+
+class GitChangelogTestCase(object):
+    def test_previous_tag(self, repo):
+        assert previous_tag(repo, 'master') == '1.0'
+        assert previous_tag(repo, 'master~2') == '1.0'
+
+    def test_no_previous_tag(self, repo):
+        repo.git.tag('-d', '1.0')
+
+        assert previous_tag(repo, 'master') is None
+
+    def test_first_parent_log(self, repo):
+        assert [(len(p), s) for p, s in first_parent_log(repo, '1.0..master')] == [
+            (2, "Merge branch 'feature/12-fix-login'"),
+            (1, "Bump version (#3)"),
+        ]
+
+    def test_changelog(self, repo):
+        assert changelog(repo, 'master', prefixes=['feature/']) == "\n".join([
+            "Changes since 1.0:",
+            "",
+            "Issue #3",
+            " - Bump version (#3)",
+            "",
+            "Issue #12",
+            " - fix login (feature/12-fix-login)",
+        ])
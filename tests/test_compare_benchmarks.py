@@ -0,0 +1,106 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import json
+
+import compare_benchmarks
+from compare_benchmarks import Regression, compare, main, slower
+
+
+def timings(median, spread=0.01, git=4, github=4):
+    return {
+        'min': median - spread,
+        'median': median,
+        'max': median + spread,
+        'git_processes': git,
+        'github_requests': github,
+    }
+
+
+def run(**commands):
+    return {'results': dict(
+        (command.replace('_', ' '), {'small': result}) for command, result in commands.items()
+    )}
+
+
+class SlowerTestCase(object):
+    def test_within_threshold(self):
+        assert not slower(timings(1.0), timings(1.4))
+        assert slower(timings(1.0), timings(1.6))
+
+    def test_floor(self):
+        assert not slower(timings(0.01), timings(0.05))
+        assert slower(timings(0.01), timings(0.08))
+
+    def test_spread(self):
+        assert not slower(timings(1.0, spread=0.8), timings(2.6))
+        assert slower(timings(1.0, spread=0.8), timings(2.9))
+
+
+class CompareTestCase(object):
+    def test_counts(self):
+        baselines = run(feature_list=timings(0.1), release_start=timings(0.1, git=4))
+        results = run(feature_list=timings(0.1, github=5), release_start=timings(0.1, git=3))
+
+        assert compare(results, baselines) == [
+            Regression('feature list', 'small', 'github_requests', 4, 5),
+        ]
+
+    def test_timings(self):
+        baselines = run(feature_list=timings(0.1))
+        results = run(feature_list=timings(0.5))
+
+        assert compare(results, baselines) == [
+            Regression('feature list', 'small', 'seconds', 0.1, 0.49),
+        ]
+        assert compare(results, baselines, timings=False) == []
+
+    def test_new_command(self):
+        assert compare(run(feature_list=timings(0.1)), run()) == []
+
+
+class MainTestCase(object):
+    def write(self, tmpdir, name, contents):
+        path = tmpdir.join(name)
+        path.write(json.dumps(contents))
+        return str(path)
+
+    def test_regression(self, tmpdir, capsys):
+        baselines = self.write(tmpdir, 'baselines.json', run(feature_list=timings(0.1)))
+        results = self.write(tmpdir, 'results.json', run(feature_list=timings(0.1, github=5)))
+
+        assert main([results, '--baselines', baselines]) == 1
+        output = capsys.readouterr()[0]
+        assert 'REGRESSED' in output
+        assert 'feature list (small): github requests went from 4 to 5' in output
+
+    def test_update(self, tmpdir):
+        baselines = str(tmpdir.join('baselines.json'))
+        results = self.write(tmpdir, 'results.json', run(feature_list=timings(0.1)))
+
+        assert main([results, '--baselines', baselines, '--update']) == 0
+        assert main([results, '--baselines', baselines]) == 0
+
+    def test_committed_baselines(self):
+        with open(compare_benchmarks.BASELINES) as f:
+            baselines = json.load(f)
+
+        assert compare(baselines, baselines) == []
@@ -21,22 +21,24 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
 import itertools
 import pytest
-import os
 import string
-from subprocess import CalledProcessError
 
+import json
 import mock
 
 from flowhub.core import (
     do_hook, handle_init_call, handle_issue_call, handle_hotfix_call,
     handle_cleanup_call, handle_feature_call, handle_release_call, create_tag_info
 )
+from flowhub.hooks import HookContext
 from flowhub.managers import TagInfo
 
 
 @pytest.yield_fixture
 def engine():
     with mock.patch("flowhub.engine.Engine") as engine_mock:
+        engine_mock.publish_log.return_value.started = False
+        engine_mock.tag_index.taken.return_value = False
         yield engine_mock
 
 
@@ -70,13 +72,14 @@ class CreateTagInfoTestCase(object):
         # "default" includes the editor being available and working
         subprocess_check_call.return_value = 0
         self.open.return_value.readlines.return_value = [
-            'a bunch of',
-            'individual',
-            'lines',
+            'a bunch of\n',
+            'individual\n',
+            'lines\n',
+            '# Write the tag description above',
         ]
         tag_info = create_tag_info(args, lambda s: "the_tag")
 
-        assert tag_info == TagInfo("the_tag", "a bunch of individual lines")
+        assert tag_info == TagInfo("the_tag", "a bunch of\nindividual\nlines")
         subprocess_check_call.assert_called_once_with(
             "$EDITOR {}".format(self.tempfile.return_value.name),
             shell=True,
@@ -85,6 +88,24 @@ class CreateTagInfoTestCase(object):
         self.open.return_value.close.assert_called_once_with()
         self.tempfile.return_value.close.assert_called_once_with()
 
+    def test_template(self, args, subprocess_check_call):
+        subprocess_check_call.return_value = 0
+        self.open.return_value.readlines.return_value = ['Changes:\n', ' - one']
+
+        tag_info = create_tag_info(args, lambda s: "", "1.0", template="Changes:\n - one")
+
+        self.tempfile.return_value.file.write.assert_called_once_with(
+            "Changes:\n - one\n\n# Write the tag description above",
+        )
+        assert tag_info == TagInfo("1.0", "Changes:\n - one")
+
+    def test_template_without_editor(self, args, subprocess_check_call):
+        subprocess_check_call.side_effect = OSError
+
+        tag_info = create_tag_info(args, lambda s: "", "1.0", template="Changes:\n - one")
+
+        assert tag_info == TagInfo("1.0", "Changes:\n - one")
+
     def test_handles_editor_failure(self, args, subprocess_check_call):
         subprocess_check_call.side_effect = OSError
 
@@ -98,37 +119,47 @@ class CreateTagInfoTestCase(object):
 
 
 class HookTestCase(object):
-    def test_no_verify(self, engine, args, id_generator, subprocess_check_call):
+    def test_no_verify(self, engine, args, id_generator):
         args.no_verify = True
 
         assert do_hook(args, engine, id_generator())
-        assert subprocess_check_call.call_count == 0
+        assert engine.hooks.run.call_count == 0
 
-    def test_successful_hook(self, args, engine, subprocess_check_call, id_generator):
+    def test_successful_hook(self, args, engine, id_generator):
         args.no_verify = False
         hook_name = id_generator()
-        engine._repo.git_dir = id_generator()
+        engine.hooks.run.return_value = True
+
+        assert do_hook(args, engine, hook_name, 'arg', 3, tag='v1')
+        engine.hooks.defines.assert_called_once_with(hook_name)
+        engine.hooks.run.assert_called_once_with(HookContext(
+            name=hook_name,
+            args=('arg', '3'),
+            branch=engine._repo.head.reference.name,
+            tag='v1',
+            summary=engine.summary,
+            engine=engine,
+        ))
+
+    def test_branch_context(self, args, engine, id_generator):
+        args.no_verify = False
 
-        assert do_hook(args, engine, hook_name)
-        subprocess_check_call.assert_has_calls([
-            mock.call(
-                ((os.path.join(engine._repo.git_dir, 'hooks', hook_name)),),
-            ),
-        ])
+        do_hook(args, engine, id_generator(), branch='release/1.0')
+
+        assert engine.hooks.run.call_args[0][0].branch == 'release/1.0'
 
-    def test_no_such_hook(self, args, engine, subprocess_check_call, id_generator):
+    def test_no_such_hook(self, args, engine, id_generator):
         args.no_verify = False
-        hook_name = id_generator()
-        subprocess_check_call.side_effect = OSError
+        engine.hooks.defines.return_value = False
 
-        assert do_hook(args, engine, hook_name)
+        assert do_hook(args, engine, id_generator())
+        assert engine.hooks.run.call_count == 0
 
-    def test_with_failed_hook(self, args, engine, subprocess_check_call, id_generator):
+    def test_with_failed_hook(self, args, engine, id_generator):
         args.no_verify = False
-        hook_name = id_generator()
-        subprocess_check_call.side_effect = CalledProcessError(None, None, None)
+        engine.hooks.run.return_value = False
 
-        assert not do_hook(args, engine, hook_name)
+        assert not do_hook(args, engine, id_generator())
 
 
 class InitCallTestCase(object):
@@ -245,7 +276,10 @@ class FeatureCallTestCase(object):
             handle_feature_call(args, engine)
 
             patch.assert_has_calls([
-                mock.call(args, engine, "pre-feature-publish")
+                mock.call(
+                    args, engine, "pre-feature-publish",
+                    branch="{}{}".format(engine.feature_manager._prefix, args.name),
+                ),
             ])
 
             engine.assert_has_calls([
@@ -260,6 +294,25 @@ class FeatureCallTestCase(object):
 
             assert engine.call_count == 0
 
+    def test_bulk_publish(self, id_generator, args, engine, capsys):
+        args.action = "bulk-publish"
+        args.names = [id_generator(), id_generator()]
+        engine.publish_features.return_value = [
+            {'branch': 'feature/a', 'status': 'created', 'number': 3, 'url': 'u'},
+            {'branch': 'feature/b', 'status': 'skipped', 'error': 'e'},
+        ]
+        with mock.patch('flowhub.core.do_hook') as patch:
+            patch.return_value = True
+
+            handle_feature_call(args, engine)
+
+            engine.assert_has_calls([
+                mock.call.publish_features(names=args.names),
+            ])
+
+        out, _ = capsys.readouterr()
+        assert [json.loads(l) for l in out.splitlines()] == engine.publish_features.return_value
+
     def test_abandon(self, id_generator, args, engine):
         args.action = "abandon"
         args.name = id_generator()
@@ -271,6 +324,7 @@ class FeatureCallTestCase(object):
     def test_accepted(self, id_generator, args, engine):
         args.action = 'accepted'
         args.name = id_generator()
+        args.merged = False
         args.no_delete = False
 
         handle_feature_call(args, engine)
@@ -285,6 +339,7 @@ class FeatureCallTestCase(object):
     def test_accepted_no_delete(self, id_generator, args, engine):
         args.action = 'accepted'
         args.name = id_generator()
+        args.merged = False
         args.no_delete = True
 
         handle_feature_call(args, engine)
@@ -296,6 +351,28 @@ class FeatureCallTestCase(object):
             ),
         ])
 
+    def test_accepted_merged(self, args, engine):
+        args.action = 'accepted'
+        args.name = None
+        args.merged = True
+        args.no_delete = False
+
+        handle_feature_call(args, engine)
+
+        engine.assert_has_calls([
+            mock.call.accept_merged_features(delete_feature_branches=True),
+        ])
+        assert engine.accept_feature.call_count == 0
+
+    def test_accepted_merged_with_name(self, id_generator, args, engine):
+        args.action = 'accepted'
+        args.name = id_generator()
+        args.merged = True
+
+        assert handle_feature_call(args, engine) is False
+
+        assert engine.accept_merged_features.call_count == 0
+
     def test_list(self, args, engine):
         args.action = "list"
         handle_feature_call(args, engine)
@@ -327,9 +404,39 @@ class ReleaseCallTestCase(object):
                 mock.call.start_release(name=args.name),
             ])
 
+    def test_start_suggests_next_version(self, args, engine):
+        args.action = "start"
+        args.name = None
+        engine.tag_index.suggestions.return_value = [
+            ('major', '2.0.0'), ('minor', '1.3.0'), ('patch', '1.2.4'),
+        ]
+        prompts = []
+
+        def input_func(query_str):
+            prompts.append(query_str)
+            return ""
+
+        with mock.patch('flowhub.core.do_hook'):
+            handle_release_call(args, engine, input_func=input_func)
+
+        assert prompts == ["Release name [1.3.0]: "]
+        engine.start_release.assert_called_once_with(name='1.3.0')
+
+    def test_start_already_tagged(self, id_generator, args, engine):
+        args.action = "start"
+        args.name = id_generator()
+        engine.tag_index.taken.return_value = True
+
+        assert handle_release_call(args, engine) is False
+
+        engine.tag_index.taken.assert_called_once_with(args.name)
+        assert engine.start_release.call_count == 0
+
     def test_publish_with_name(self, id_generator, args, engine, create_tag_info_mock):
         args.action = "publish"
         args.no_cleanup = False
+        args.pr_notes = False
+        args.resume = False
         args.name = id_generator()
 
         with mock.patch('flowhub.core.do_hook') as patch:
@@ -339,9 +446,12 @@ class ReleaseCallTestCase(object):
             handle_release_call(args, engine, input_func=input_func)
 
             patch.assert_has_calls([
-                mock.call(args, engine, "pre-release-publish"),
+                mock.call(args, engine, "pre-release-publish", branch=engine.release.name),
                 mock.call().__nonzero__(),  # the if check
-                mock.call(args, engine, "post-release-publish", mock.ANY),
+                mock.call(
+                    args, engine, "post-release-publish", mock.ANY,
+                    tag=create_tag_info_mock.return_value.label,
+                ),
             ])
 
             engine.assert_has_calls([
@@ -349,6 +459,7 @@ class ReleaseCallTestCase(object):
                     name=args.name,
                     with_delete=not args.no_cleanup,
                     tag_info=create_tag_info_mock.return_value,
+                    resume=False,
                 ),
             ])
 
@@ -356,7 +467,24 @@ class ReleaseCallTestCase(object):
                 args,
                 input_func,
                 engine.release.name.replace.return_value,
+                template=engine.changelog.return_value,
             )
+            engine.changelog.assert_called_once_with(engine.release)
+
+    def test_publish_with_pr_notes(self, args, engine, create_tag_info_mock):
+        args.action = "publish"
+        args.pr_notes = True
+        args.resume = False
+        engine.changelog.return_value = "Changes:"
+        engine.release_notes.return_value = "Pull-requests merged:"
+
+        with mock.patch('flowhub.core.do_hook'):
+            handle_release_call(args, engine)
+
+        engine.release_notes.assert_called_once_with(engine.release)
+        assert create_tag_info_mock.call_args[1] == {
+            'template': "Changes:\n\nPull-requests merged:",
+        }
 
     def test_publish_failed_hook(self, id_generator, args, engine):
         args.action = "publish"
@@ -368,11 +496,52 @@ class ReleaseCallTestCase(object):
             handle_release_call(args, engine)
 
             patch.assert_has_calls([
-                mock.call(args, engine, "pre-release-publish"),
+                mock.call(args, engine, "pre-release-publish", branch=engine.release.name),
             ])
 
             assert engine.call_count == 0
 
+    def test_publish_interrupted(self, args, engine):
+        args.action = "publish"
+        args.resume = False
+        args.restart = False
+        engine.publish_log.return_value.started = True
+
+        with mock.patch('flowhub.core.do_hook') as patch:
+            assert handle_release_call(args, engine) is False
+
+        engine.publish_log.assert_called_once_with(engine.release)
+        assert patch.call_count == 0
+        assert engine.publish_release.call_count == 0
+
+    def test_publish_restart(self, args, engine, create_tag_info_mock):
+        args.action = "publish"
+        args.resume = False
+        args.restart = True
+        args.pr_notes = False
+        engine.publish_log.return_value.started = True
+
+        with mock.patch('flowhub.core.do_hook'):
+            handle_release_call(args, engine)
+
+        engine.publish_log.return_value.finish.assert_called_once_with()
+        assert create_tag_info_mock.call_count == 1
+        assert engine.publish_release.call_args[1]['resume'] is False
+
+    def test_publish_resume(self, args, engine, create_tag_info_mock):
+        args.action = "publish"
+        args.resume = True
+        args.pr_notes = False
+        engine.publish_log.return_value.started = True
+        engine.publish_log.return_value.tag_info = ["1.0", "The first"]
+
+        with mock.patch('flowhub.core.do_hook'):
+            handle_release_call(args, engine)
+
+        assert create_tag_info_mock.call_count == 0
+        assert engine.publish_release.call_args[1]['tag_info'] == TagInfo("1.0", "The first")
+        assert engine.publish_release.call_args[1]['resume'] is True
+
     def test_contribute(self, args, engine):
         args.action = "contribute"
 
@@ -414,6 +583,7 @@ class HotfixCallTestCase(object):
         args.action = "publish"
         args.name = id_generator()
         args.issue_numbers = []
+        args.resume = False
         with mock.patch('flowhub.core.do_hook') as patch:
             patch.return_value = True
 
@@ -427,8 +597,11 @@ class HotfixCallTestCase(object):
             )
 
             patch.assert_has_calls([
-                mock.call(args, engine, 'pre-hotfix-publish'),
-                mock.call(args, engine, 'post-hotfix-publish', mock.ANY),
+                mock.call(args, engine, 'pre-hotfix-publish', branch=engine.hotfix.name),
+                mock.call(
+                    args, engine, 'post-hotfix-publish', mock.ANY,
+                    tag=create_tag_info_mock.return_value.label,
+                ),
 
             ])
 
@@ -436,6 +609,7 @@ class HotfixCallTestCase(object):
                 mock.call.publish_hotfix(
                     name=args.name,
                     tag_info=create_tag_info_mock.return_value,
+                    resume=False,
                 ),
             ])
 
@@ -443,7 +617,9 @@ class HotfixCallTestCase(object):
                 args,
                 input_func,
                 engine.hotfix.name.replace.return_value,
+                template=engine.changelog.return_value,
             )
+            engine.changelog.assert_called_once_with(engine.hotfix)
 
     def test_contribute(self, args, engine):
         args.action = "contribute"
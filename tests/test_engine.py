@@ -19,11 +19,15 @@ along with this program; if not, write to the Free Software
 Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """
 
+import datetime
+import threading
+
 import mock
 import pytest
 
 from flowhub.engine import Engine
 from flowhub.managers import TagInfo
+from flowhub.managers.pull_request import PullResult
 
 
 @pytest.fixture
@@ -89,6 +93,19 @@ class EngineTestCase(object):
         with mock.patch('flowhub.engine.PullRequestManager', autospec=True) as f_mock:
             yield f_mock
 
+    @pytest.yield_fixture
+    def journal(self):
+        with mock.patch('flowhub.engine.Journal', autospec=True) as j_mock:
+            yield j_mock
+
+    @pytest.yield_fixture(autouse=True)
+    def state(self):
+        # nothing recorded, so the active release and hotfix come from the branches.
+        with mock.patch('flowhub.engine.State', autospec=True) as s_mock, \
+                mock.patch('flowhub.engine.refs_stamp'):
+            s_mock.return_value.get.return_value = None
+            yield s_mock
+
 
 class OfflineTestCase(object):
     @pytest.yield_fixture
@@ -133,7 +150,8 @@ class OfflineTestCase(object):
                 hotfix=mock.ANY,
                 repo=mock.ANY,
                 gh=None,
-                offline=True
+                offline=True,
+                stats=engine.stats,
             ),
         ])
 
@@ -149,7 +167,8 @@ class OfflineTestCase(object):
                 hotfix=mock.ANY,
                 repo=mock.ANY,
                 gh=None,
-                offline=True
+                offline=True,
+                stats=engine.stats,
             ),
         ])
 
@@ -165,7 +184,8 @@ class OfflineTestCase(object):
                 hotfix=mock.ANY,
                 repo=mock.ANY,
                 gh=None,
-                offline=True
+                offline=True,
+                stats=engine.stats,
             ),
         ])
 
@@ -181,7 +201,10 @@ class OfflineTestCase(object):
                 hotfix=mock.ANY,
                 repo=mock.ANY,
                 gh=None,
-                offline=True
+                offline=True,
+                stats=engine.stats,
+                index=engine.github_index,
+                new_client=engine._new_client,
             ),
         ])
 
@@ -225,7 +248,8 @@ class OnlineTestCase(object):
                 hotfix=mock.ANY,
                 repo=mock.ANY,
                 gh=github(),
-                offline=False
+                offline=False,
+                stats=engine.stats,
             ),
         ])
 
@@ -241,7 +265,8 @@ class OnlineTestCase(object):
                 hotfix=mock.ANY,
                 repo=mock.ANY,
                 gh=github(),
-                offline=False
+                offline=False,
+                stats=engine.stats,
             ),
         ])
 
@@ -257,7 +282,8 @@ class OnlineTestCase(object):
                 hotfix=mock.ANY,
                 repo=mock.ANY,
                 gh=github(),
-                offline=False
+                offline=False,
+                stats=engine.stats,
             ),
         ])
 
@@ -273,7 +299,10 @@ class OnlineTestCase(object):
                 hotfix=mock.ANY,
                 repo=mock.ANY,
                 gh=github(),
-                offline=False
+                offline=False,
+                stats=engine.stats,
+                index=engine.github_index,
+                new_client=engine._new_client,
             ),
         ])
 
@@ -368,6 +397,21 @@ class OfflineFeatureTestCase(EngineTestCase, OfflineTestCase):
             mock.call.checkout(),
         ])
 
+    def test_accept_merged(self, engine, feature_manager, git, repository_structure):
+        git().head.reference.name = repository_structure['feature'] + 'merged'
+        feature_manager.return_value.accept_merged.return_value = [
+            repository_structure['feature'] + 'merged',
+        ]
+
+        assert engine.accept_merged_features()
+
+        feature_manager.assert_has_calls([
+            mock.call().accept_merged(summary=mock.ANY, with_delete=True),
+        ])
+        engine.develop.assert_has_calls([
+            mock.call.checkout(),
+        ])
+
     def test_abandon_all_defaults(self, engine):
         assert not engine.abandon_feature()
 
@@ -404,10 +448,23 @@ class OfflineFeatureTestCase(EngineTestCase, OfflineTestCase):
     def test_publish_all_defaults(self, engine):
         assert not engine.publish_feature()
 
-    def test_publish(self, engine, id_generator):
+    def test_publish(self, engine, id_generator, feature_manager, journal):
         name = id_generator()
+        branch = feature_manager.return_value.publish.return_value
+
+        assert engine.publish_feature(name)
+
+        feature_manager.assert_has_calls([
+            mock.call().publish(name, mock.ANY),
+        ])
+        journal.return_value.record.assert_called_once_with(
+            'pull-request',
+            base=engine.develop.name,
+            head=branch.name,
+        )
 
-        assert not engine.publish_feature(name)
+    def test_sync(self, engine):
+        assert not engine.sync()
 
 
 class OnlineFeatureTestCase(EngineTestCase, OnlineTestCase):
@@ -423,6 +480,109 @@ class OnlineFeatureTestCase(EngineTestCase, OnlineTestCase):
             mock.call().publish(name, mock.ANY),
         ])
 
+    def test_publish_adds_to_existing_pull(self, id_generator, feature_manager, pull_manager, engine):
+        name = id_generator()
+        branch = feature_manager.return_value.get.return_value
+        pr = pull_manager.return_value.find_pull.return_value
+
+        assert engine.publish_feature(name)
+
+        pull_manager.return_value.find_pull.assert_called_once_with(engine.develop, branch)
+        pull_manager.return_value.add_to_pull.assert_called_once_with(
+            engine.develop, branch, mock.ANY, pr=pr,
+        )
+        assert pull_manager.return_value.create_from_branch_name.call_count == 0
+        assert pull_manager.return_value.issue_for_branch.call_count == 0
+
+    def test_publish_looks_up_pull_and_issue_on_one_thread(self, id_generator, pull_manager, engine):
+        threads = []
+        pull_manager.return_value.find_pull.side_effect = \
+            lambda *args: threads.append(threading.current_thread())
+        pull_manager.return_value.issue_for_branch.side_effect = \
+            lambda *args: threads.append(threading.current_thread())
+
+        assert engine.publish_feature(id_generator())
+
+        assert len(threads) == 2
+        assert threads[0] is threads[1]
+
+    def test_publish_creates_pull_from_prefetched_issue(self, id_generator, feature_manager, pull_manager, engine):
+        name = id_generator()
+        branch = feature_manager.return_value.get.return_value
+        pull_manager.return_value.find_pull.return_value = None
+        issue = pull_manager.return_value.issue_for_branch.return_value
+
+        assert engine.publish_feature(name)
+
+        feature_manager.assert_has_calls([
+            mock.call().publish(name, mock.ANY),
+        ])
+        pull_manager.return_value.create_from_branch_name.assert_called_once_with(
+            engine.develop, branch, mock.ANY, issue=issue,
+        )
+        assert pull_manager.return_value.add_to_pull.call_count == 0
+
+    def test_publish_no_such_feature(self, id_generator, feature_manager, engine):
+        feature_manager.return_value.get.return_value = None
+
+        assert not engine.publish_feature(id_generator())
+        assert feature_manager.return_value.publish.call_count == 0
+
+    def test_publish_features(self, feature_manager, pull_manager, engine, repository_structure):
+        prefix = repository_structure['feature']
+        branches = [mock.MagicMock(), mock.MagicMock()]
+        branches[0].name = prefix + 'a'
+        branches[1].name = prefix + 'b'
+        feature_manager.return_value.get.side_effect = [branches[0], None, branches[1]]
+        pr = mock.MagicMock(number=7, html_url='url')
+        pull_manager.return_value.create_pulls.return_value = [
+            PullResult(prefix + 'a', 'created', pr, None),
+            PullResult(prefix + 'b', 'skipped', None, 'budget'),
+        ]
+
+        results = engine.publish_features(['a', 'missing', prefix + 'b'])
+
+        feature_manager.return_value.get.assert_has_calls([
+            mock.call('a'), mock.call('missing'), mock.call('b'),
+        ])
+        feature_manager.return_value.publish_many.assert_called_once_with(branches, mock.ANY)
+        pull_manager.return_value.create_pulls.assert_called_once_with(
+            engine.develop, branches, mock.ANY,
+            pulls=pull_manager.return_value.open_pulls_by_head.return_value,
+        )
+        assert results == [
+            {'branch': prefix + 'a', 'status': 'created', 'number': 7, 'url': 'url'},
+            {'branch': prefix + 'missing', 'status': 'failed', 'error': 'no such feature'},
+            {'branch': prefix + 'b', 'status': 'skipped', 'error': 'budget'},
+        ]
+
+    def test_sync_nothing_recorded(self, engine, journal):
+        journal.return_value.entries.return_value = []
+
+        assert engine.sync()
+        assert journal.return_value.replace.call_count == 0
+
+    def test_sync(self, engine, journal, feature_manager, pull_manager):
+        journal.return_value.entries.return_value = [
+            {'op': 'push', 'params': {'remote': 'origin', 'refspecs': ['feature/a'], 'set_upstream': True}},
+            {'op': 'pull-request', 'params': {'base': 'develop', 'head': 'feature/a'}},
+            {'op': 'push', 'params': {'remote': 'origin', 'refspecs': ['feature/a'], 'set_upstream': True}},
+            {'op': 'pull-request', 'params': {'base': 'develop', 'head': 'feature/a'}},
+        ]
+        pull_manager.return_value.add_to_pull.return_value = True
+
+        with mock.patch('flowhub.engine.git.Head'):
+            assert engine.sync()
+
+        push_calls = [
+            c for c in feature_manager.return_value.method_calls if c[0] == 'push'
+        ]
+        assert push_calls == [
+            mock.call.push(mock.ANY, 'feature/a', set_upstream=True, tags=False),
+        ]
+        assert pull_manager.return_value.add_to_pull.call_count == 1
+        journal.return_value.replace.assert_called_once_with([])
+
 
 class OfflineReleaseTestCase(EngineTestCase, OfflineTestCase):
 
@@ -454,6 +614,16 @@ class OfflineReleaseTestCase(EngineTestCase, OfflineTestCase):
 
         assert release_manager.return_value.call_count == 0
 
+    def test_start_with_recorded_release(self, id_generator, git, state, engine, release_manager):
+        state.return_value.get.return_value = {'name': 'release/1.0', 'refs': None}
+        git().branches = []
+
+        with mock.patch('flowhub.engine.git.Head') as head:
+            head.return_value.is_valid.return_value = True
+            assert not engine.start_release(id_generator())
+
+        assert release_manager.return_value.start.call_count == 0
+
     def test_publish_all_defaults(self, engine):
         assert not engine.publish_release()
 
@@ -463,7 +633,7 @@ class OfflineReleaseTestCase(EngineTestCase, OfflineTestCase):
         assert engine.publish_release(name)
 
         release_manager.assert_has_calls([
-            mock.call().publish(name, True, None, mock.ANY)
+            mock.call().publish(name, True, None, mock.ANY, resume=False)
         ])
 
     def test_publish_on_release_branch(self, engine, git, id_generator, repository_structure):
@@ -488,13 +658,18 @@ class OfflineReleaseTestCase(EngineTestCase, OfflineTestCase):
         )
 
         release_manager.assert_has_calls([
-            mock.call().publish(name, False, TagInfo(tag_label, tag_message), mock.ANY)
+            mock.call().publish(name, False, TagInfo(tag_label, tag_message), mock.ANY, resume=False)
         ])
 
     def test_contribute(self, engine):
         assert not engine.contribute_release()
 
 
+    def test_release_notes(self, engine, pull_manager):
+        assert engine.release_notes(engine.release) == ""
+        assert pull_manager.return_value.merged_since.call_count == 0
+
+
 class OnlineReleaseTestCase(EngineTestCase, OnlineTestCase):
 
     def test_contribute(self, git, engine, release_manager):
@@ -513,6 +688,38 @@ class OnlineReleaseTestCase(EngineTestCase, OnlineTestCase):
         ])
 
 
+    def test_release_notes(self, git, engine, pull_manager):
+        pull_manager.return_value.merged_since.return_value = [
+            {'number': 3, 'title': 'A fix', 'url': 'u', 'author': None},
+        ]
+        git().commit.return_value.committed_date = 0
+
+        with mock.patch('flowhub.engine.changelog.previous_tag') as previous_tag, \
+                mock.patch('flowhub.engine.release_notes.NotesCache') as cache:
+            previous_tag.return_value = '1.0'
+            cache.return_value.get.return_value = None
+
+            notes = engine.release_notes(engine.release)
+
+        assert notes == "Pull-requests merged since 1.0:\n - #3 A fix"
+        pull_manager.return_value.merged_since.assert_called_once_with(
+            engine.develop, datetime.datetime(1970, 1, 1),
+        )
+        cache.return_value.put.assert_called_once_with(
+            '1.0', git().commit.return_value.hexsha, pull_manager.return_value.merged_since.return_value,
+        )
+
+    def test_release_notes_cached(self, git, engine, pull_manager):
+        with mock.patch('flowhub.engine.changelog.previous_tag') as previous_tag, \
+                mock.patch('flowhub.engine.release_notes.NotesCache') as cache:
+            previous_tag.return_value = '1.0'
+            cache.return_value.get.return_value = []
+
+            assert engine.release_notes(engine.release) == ""
+
+        assert pull_manager.return_value.merged_since.call_count == 0
+
+
 class OfflineHotfixTestCase(EngineTestCase, OfflineTestCase):
 
     def test_start_all_defaults(self, engine):
@@ -570,7 +777,7 @@ class OfflineHotfixTestCase(EngineTestCase, OfflineTestCase):
         assert engine.publish_hotfix(name)
 
         hotfix_manager.assert_has_calls([
-            mock.call().publish(name, None, True, mock.ANY),
+            mock.call().publish(name, None, True, mock.ANY, resume=False),
         ])
 
         return_branch.assert_has_calls([
@@ -623,3 +830,49 @@ class OnlineHotfixTestCase(EngineTestCase, OnlineTestCase):
         git().head.reference.object.iter_parents.return_value = [True]
 
         assert not engine.contribute_hotfix()
+
+
+class OnlineGraphQLTestCase(EngineTestCase):
+    @pytest.yield_fixture
+    def graphql(self):
+        with mock.patch('flowhub.engine.GraphQLClient') as client_mock:
+            client_mock.return_value.bootstrap.return_value = {
+                'viewer': {
+                    'login': 'suzy',
+                    'repository': {'nameWithOwner': 'suzy/the_repo', 'parent': None},
+                },
+                'rateLimit': {'remaining': 5000},
+            }
+            yield client_mock
+
+    @pytest.yield_fixture
+    def graphql_pull_manager(self):
+        with mock.patch('flowhub.engine.GraphQLPullRequestManager', autospec=True) as f_mock:
+            yield f_mock
+
+    def test_uses_graphql_manager(self, git, github, configurator, graphql, graphql_pull_manager,
+                                  pull_manager, feature_manager, release_manager, hotfix_manager,
+                                  repository_structure):
+        for key in ["name", "origin", "canon", "master", "develop"]:
+            setattr(
+                configurator.return_value.flowhub.structure,
+                key,
+                repository_structure[key]
+            )
+        configurator.return_value.flowhub.api.graphql = 'true'
+        configurator.return_value.flowhub.api.url = 'https://ghe.example.com/api/v3'
+
+        engine = Engine()
+
+        graphql.assert_called_once_with(
+            configurator.return_value.flowhub.auth.token,
+            'https://ghe.example.com/api/graphql',
+            stats=engine.stats,
+        )
+        github.return_value.get_repo.assert_called_once_with('suzy/the_repo', lazy=True)
+        assert github.return_value.get_user.call_count == 0
+        assert pull_manager.call_count == 0
+        assert engine.pull_manager is graphql_pull_manager.return_value
+        _, kwargs = graphql_pull_manager.call_args
+        assert kwargs['graphql'] is graphql.return_value
+        assert kwargs['bootstrap'] is graphql.return_value.bootstrap.return_value
@@ -0,0 +1,118 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import json
+from StringIO import StringIO
+
+import mock
+import pytest
+
+from flowhub.events import Event, JSONLinesRenderer, Summary, TextRenderer
+
+
+@pytest.fixture
+def summary():
+    return Summary()
+
+
+class EventTestCase(object):
+    def test_is_its_message(self):
+        event = Event("Pushed feature/a to origin", 'push', remote='origin')
+
+        assert event == "Pushed feature/a to origin"
+        assert "\n - ".join(['Summary:', event]) == "Summary:\n - Pushed feature/a to origin"
+        assert event.step == 'push'
+        assert event.fields == {'remote': 'origin'}
+
+
+class SummaryTestCase(object):
+    def test_still_a_list(self, summary):
+        summary += ["one", Event("two", 'push')]
+        summary.append("three")
+
+        assert summary == ["one", "two", "three"]
+
+    def test_events(self, summary):
+        with mock.patch('time.time', side_effect=[10.0, 10.5]):
+            summary.started = summary._last = 9.0
+            summary += [
+                "Checked out develop",
+                Event("Pushed feature/a to origin", 'push', remote='origin', refs=['feature/a']),
+            ]
+
+        assert summary.events == [
+            {'step': 'note', 'message': "Checked out develop", 'time': 10.0, 'duration': 1.0},
+            {
+                'step': 'push', 'message': "Pushed feature/a to origin", 'time': 10.5,
+                'duration': 0.5, 'remote': 'origin', 'refs': ['feature/a'],
+            },
+        ]
+
+    def test_listeners_hear_events_as_they_happen(self, summary):
+        heard = []
+        summary.append("before")
+        summary.listen(heard.append)
+
+        assert [e['message'] for e in heard] == ["before"]
+        summary.append("after")
+        assert [e['message'] for e in heard] == ["before", "after"]
+
+    def test_amend(self, summary):
+        summary += [Event("Deleted feature/a locally", 'delete', refs=['feature/a'])]
+
+        summary[-1] += " and from remote origin"
+
+        assert summary == ["Deleted feature/a locally and from remote origin"]
+        amended = summary.events[-1]
+        assert amended['amends'] == 0
+        assert amended['step'] == 'delete'
+        assert amended['refs'] == ['feature/a']
+
+    def test_no_slices(self, summary):
+        with pytest.raises(TypeError):
+            summary[0:1] = ["nope"]
+
+
+class RendererTestCase(object):
+    def test_text(self, summary):
+        renderer = TextRenderer()
+        summary.listen(renderer)
+        summary += ["Deleted feature/a locally", "Checked out develop"]
+        summary[0] += " and from remote origin"
+
+        assert renderer.render() == "\n - ".join([
+            "\nSummary of actions:",
+            "Deleted feature/a locally and from remote origin",
+            "Checked out develop",
+        ])
+
+    def test_text_nothing_done(self):
+        assert TextRenderer().render() == ""
+
+    def test_jsonl(self, summary):
+        stream = StringIO()
+        summary.listen(JSONLinesRenderer(stream))
+        summary += [Event("Tagged 1.0", 'tag', tag='1.0', sha='abc')]
+
+        event = json.loads(stream.getvalue())
+        assert event['step'] == 'tag'
+        assert event['sha'] == 'abc'
+        assert stream.getvalue().endswith('\n')
@@ -0,0 +1,157 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import datetime
+import time
+
+import mock
+import pytest
+
+from flowhub.github_index import GitHubIndex, RECENTLY_CLOSED
+
+NOW = datetime.datetime(2014, 6, 1, 12, 0, 0)
+
+
+def days_ago(days):
+    return NOW - datetime.timedelta(days=days)
+
+
+def pull(number, updated_at, state='open', head='feature/x'):
+    return mock.Mock(
+        number=number, state=state, title='Pull {}'.format(number), updated_at=updated_at,
+        head=mock.Mock(label='suzy:{}'.format(head), ref=head), base=mock.Mock(ref='develop'),
+        url='api/pulls/{}'.format(number), html_url='html/pull/{}'.format(number),
+        issue_url='api/issues/{}'.format(number),
+    )
+
+
+def issue(number, updated_at, state='open'):
+    return mock.Mock(
+        number=number, state=state, title='Issue {}'.format(number), updated_at=updated_at,
+        url='api/issues/{}'.format(number), html_url='html/issues/{}'.format(number),
+    )
+
+
+class FakeRepo(object):
+    """Serves listings the way GitHub would, and remembers what was asked."""
+
+    def __init__(self, full_name='canon/repo'):
+        self.full_name = full_name
+        self.pulls = []
+        self.issues = []
+        self.calls = []
+
+    def get_pulls(self, state='open', sort=None, direction=None):
+        self.calls.append(('pulls', state))
+        pulls = [p for p in self.pulls if state == 'all' or p.state == state]
+        if sort == 'updated':
+            pulls.sort(key=lambda p: p.updated_at, reverse=direction == 'desc')
+        return iter(pulls)
+
+    def get_issues(self, state='open', since=None):
+        self.calls.append(('issues', state, since))
+        return iter([
+            i for i in self.issues
+            if (state == 'all' or i.state == state) and (since is None or i.updated_at >= since)
+        ])
+
+
+@pytest.fixture
+def index(tmpdir):
+    return GitHubIndex(str(tmpdir))
+
+
+@pytest.fixture
+def repo():
+    repo = FakeRepo()
+    repo.pulls = [
+        pull(1, days_ago(100)),
+        pull(2, days_ago(5), state='closed'),
+        pull(3, days_ago(40), state='closed'),
+    ]
+    repo.issues = [issue(10, days_ago(200)), issue(11, days_ago(60), state='closed')]
+    return repo
+
+
+class SyncTestCase(object):
+    def test_first_sync(self, index, repo):
+        assert index.sync(repo, now=NOW) == (2, 1)
+
+        # every open one, and those closed in the last RECENTLY_CLOSED
+        assert [p['number'] for p in index.open_pulls()] == [1]
+        assert index.issue(10)['title'] == 'Issue 10'
+        assert index.issue(11) is None
+        assert ('issues', 'closed', NOW - RECENTLY_CLOSED) in repo.calls
+        assert index.cursor('pulls', 'canon/repo') == days_ago(5)
+
+    def test_incremental(self, index, repo):
+        index.sync(repo, now=NOW)
+        del repo.calls[:]
+        repo.pulls[0].state = 'closed'
+        repo.pulls[0].updated_at = days_ago(1)
+        repo.pulls.append(pull(4, days_ago(2), head='feature/y'))
+        repo.issues.append(issue(12, days_ago(1)))
+
+        assert index.sync(repo, now=NOW) == (3, 1)
+
+        assert repo.calls == [('pulls', 'all'), ('issues', 'all', NOW - RECENTLY_CLOSED)]
+        assert [p['number'] for p in index.open_pulls()] == [4]
+        assert index.issue(12)['state'] == 'open'
+        assert index.cursor('pulls', 'canon/repo') == days_ago(1)
+
+    def test_another_repo(self, index, repo):
+        index.sync(repo, now=NOW)
+        other = FakeRepo('canon/other')
+        other.pulls = [pull(7, days_ago(1))]
+
+        index.sync(other, now=NOW)
+
+        assert [p['number'] for p in index.open_pulls()] == [7]
+        assert index.cursor('pulls', 'canon/repo') is None
+
+
+class LookupTestCase(object):
+    def test_fresh(self, index, repo):
+        assert not index.fresh('canon/repo')
+
+        index.sync(repo, now=NOW)
+
+        assert index.fresh('canon/repo')
+        assert not index.fresh('canon/other')
+        with mock.patch('flowhub.github_index.time.time', return_value=time.time() + 601):
+            assert not index.fresh('canon/repo')
+
+    def test_disabled(self, tmpdir, repo):
+        index = GitHubIndex(str(tmpdir), max_age=0)
+        index.sync(repo, now=NOW)
+
+        assert not index.fresh('canon/repo')
+
+    def test_put_only_once_synced(self, index, repo):
+        index.put_pull(pull(5, NOW))
+        assert not index.exists()
+
+        index.sync(repo, now=NOW)
+        index.put_pull(pull(5, NOW))
+        index.put_issue(issue(13, NOW))
+
+        assert [p['number'] for p in index.open_pulls()] == [1, 5]
+        assert index.issue(13)['number'] == 13
@@ -0,0 +1,246 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import os
+import stat
+import threading
+import time
+
+import mock
+import pytest
+
+from flowhub.hooks import HookContext, Hooks
+
+
+CALLS = []
+
+
+def record(context):
+    CALLS.append(context)
+
+
+def refuse(context):
+    return False
+
+
+def explode(context):
+    raise ValueError("no good")
+
+
+STUCK = threading.Event()
+
+
+def stuck(context):
+    STUCK.wait(5)
+
+
+@pytest.fixture
+def git_dir(tmpdir):
+    tmpdir.mkdir('hooks')
+    return tmpdir
+
+
+@pytest.yield_fixture(autouse=True)
+def no_entry_points():
+    del CALLS[:]
+    with mock.patch('pkg_resources.iter_entry_points') as iter_entry_points:
+        iter_entry_points.return_value = []
+        yield iter_entry_points
+
+
+def write_script(git_dir, name, body):
+    path = git_dir.join('hooks', name)
+    path.write("#!/bin/sh\n" + body)
+    os.chmod(str(path), stat.S_IRWXU)
+    return path
+
+
+def context(name, **kwargs):
+    values = dict(name=name, args=(), branch=None, tag=None, summary=[], engine=None)
+    values.update(kwargs)
+    return HookContext(**values)
+
+
+class HooksTestCase(object):
+    def test_directory_listed_once(self, git_dir):
+        write_script(git_dir, 'pre-feature-publish', 'exit 0')
+        git_dir.join('hooks', 'pre-commit.sample').write('')
+        hooks = Hooks(str(git_dir))
+
+        with mock.patch('os.listdir', wraps=os.listdir) as listdir:
+            assert hooks.defines('pre-feature-publish')
+            assert not hooks.defines('pre-commit')
+            assert not hooks.defines('post-release-start')
+
+        assert listdir.call_count == 1
+
+    def test_no_hooks_directory(self, tmpdir):
+        assert not Hooks(str(tmpdir)).defines('pre-feature-publish')
+
+    def test_script(self, git_dir, tmpdir):
+        out = tmpdir.join('out')
+        write_script(
+            git_dir, 'post-release-publish',
+            'echo "$1 $FLOWHUB_HOOK $FLOWHUB_BRANCH $FLOWHUB_TAG" > {}'.format(out),
+        )
+
+        assert Hooks(str(git_dir)).run(
+            context('post-release-publish', args=('1.0',), branch='develop', tag='v1.0'),
+        )
+        assert out.read() == "1.0 post-release-publish develop v1.0\n"
+
+    def test_failing_script(self, git_dir):
+        write_script(git_dir, 'pre-feature-publish', 'exit 1')
+
+        assert not Hooks(str(git_dir)).run(context('pre-feature-publish'))
+
+    def test_configured_callables(self, git_dir):
+        hooks = Hooks(str(git_dir), {
+            'pre-feature-publish': '{0}:record, {0}:record'.format(__name__),
+        })
+        ctx = context('pre-feature-publish', branch='feature/a')
+
+        assert hooks.defines('pre-feature-publish')
+        assert hooks.run(ctx)
+        assert CALLS == [ctx, ctx]
+
+    def test_configured_file(self, git_dir, tmpdir):
+        tmpdir.join('checks.py').write(
+            "def check(context):\n"
+            "    context.summary.append('checked ' + context.branch)\n"
+        )
+        hooks = Hooks(str(git_dir), {'pre-feature-publish': 'checks.py:check'}, working_dir=str(tmpdir))
+        summary = []
+
+        assert hooks.run(context('pre-feature-publish', branch='feature/a', summary=summary))
+        assert summary == ['checked feature/a']
+
+    def test_callables_run_before_script(self, git_dir, tmpdir):
+        out = tmpdir.join('out')
+        write_script(git_dir, 'pre-feature-publish', 'touch {}'.format(out))
+        hooks = Hooks(str(git_dir), {'pre-feature-publish': '{}:refuse'.format(__name__)})
+
+        assert not hooks.run(context('pre-feature-publish'))
+        assert not out.check()
+
+    def test_raising_callable_fails(self, git_dir, capsys):
+        hooks = Hooks(str(git_dir), {'pre-feature-publish': '{}:explode'.format(__name__)})
+
+        assert not hooks.run(context('pre-feature-publish'))
+        assert 'no good' in capsys.readouterr()[0]
+
+    def test_unloadable_callable_fails(self, git_dir):
+        hooks = Hooks(str(git_dir), {'pre-feature-publish': 'no_such_module:hook'})
+
+        assert not hooks.run(context('pre-feature-publish'))
+
+    def test_entry_points(self, git_dir, no_entry_points):
+        entry_point = mock.MagicMock()
+        entry_point.name = 'post-feature-start'
+        entry_point.load.return_value = record
+        no_entry_points.return_value = [entry_point]
+        hooks = Hooks(str(git_dir))
+        ctx = context('post-feature-start')
+
+        assert hooks.defines('post-feature-start')
+        assert hooks.run(ctx)
+        assert CALLS == [ctx]
+        no_entry_points.assert_called_once_with('flowhub.hooks')
+
+
+def wait_for(condition, seconds=5):
+    deadline = time.time() + seconds
+    while not condition():
+        assert time.time() < deadline, "gave up waiting"
+        time.sleep(0.02)
+
+
+class TimingTestCase(object):
+    def test_durations_logged(self, git_dir):
+        write_script(git_dir, 'pre-feature-publish', 'exit 0')
+        write_script(git_dir, 'pre-release-publish', 'exit 3')
+        hooks = Hooks(str(git_dir))
+
+        hooks.run(context('pre-feature-publish'))
+        hooks.run(context('pre-release-publish'))
+
+        history = hooks.history()
+        assert [(h['hook'], h['mode'], h['status']) for h in history] == [
+            ('pre-feature-publish', 'inline', 'passed'),
+            ('pre-release-publish', 'inline', 'failed'),
+        ]
+        assert all(h['duration'] >= 0 for h in history)
+        assert git_dir.join('flowhub', 'hooks', 'log').check()
+
+    def test_script_timeout(self, git_dir):
+        write_script(git_dir, 'pre-feature-publish', 'exec sleep 5')
+        hooks = Hooks(str(git_dir), {'timeout': '60', 'pre-feature-publish-timeout': '0.2'})
+
+        started = time.time()
+        assert not hooks.run(context('pre-feature-publish'))
+
+        assert time.time() - started < 4
+        assert hooks.history()[-1]['status'] == 'timed out'
+
+    def test_callable_timeout(self, git_dir):
+        hooks = Hooks(str(git_dir), {
+            'pre-feature-publish': '{}:stuck'.format(__name__),
+            'timeout': '0.1',
+        })
+
+        try:
+            assert not hooks.run(context('pre-feature-publish'))
+        finally:
+            STUCK.set()
+        assert hooks.history()[-1]['status'] == 'timed out'
+
+    def test_no_timeout(self, git_dir):
+        assert Hooks(str(git_dir)).timeout('pre-feature-publish') is None
+        assert Hooks(str(git_dir), {'timeout': 'soon'}).timeout('pre-feature-publish') is None
+
+
+class DetachTestCase(object):
+    def test_post_hooks_detach(self, git_dir, tmpdir):
+        release = tmpdir.join('release')
+        write_script(
+            git_dir, 'post-release-publish',
+            'while [ ! -e {} ]; do sleep 0.02; done; echo "published $1"'.format(release),
+        )
+        hooks = Hooks(str(git_dir), {'detach': 'true'})
+        summary = []
+
+        # returns while the hook is still waiting
+        assert hooks.run(context('post-release-publish', args=('1.0',), summary=summary))
+        assert hooks.history() == []
+        assert 'in the background' in summary[0]
+
+        release.write('')
+        wait_for(lambda: hooks.history())
+        assert hooks.history()[0]['mode'] == 'detached'
+        assert hooks.history()[0]['status'] == 'passed'
+        assert 'published 1.0' in git_dir.join('flowhub', 'hooks', 'post-release-publish.log').read()
+
+    def test_pre_hooks_still_gate(self, git_dir):
+        write_script(git_dir, 'pre-release-publish', 'exit 1')
+        hooks = Hooks(str(git_dir), {'detach': 'true'})
+
+        assert not hooks.run(context('pre-release-publish'))
+        assert hooks.history()[0]['mode'] == 'inline'
@@ -0,0 +1,116 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import os
+
+import pytest
+
+from flowhub.journal import (
+    CLOSE_ISSUE, Journal, OPEN_ISSUE, PULL_REQUEST, PUSH, plan,
+)
+
+
+@pytest.fixture
+def journal(tmpdir):
+    return Journal(str(tmpdir))
+
+
+def entry(op, **params):
+    return {'op': op, 'params': params}
+
+
+class JournalTestCase(object):
+    def test_lives_under_git_dir(self, journal, tmpdir):
+        assert journal.path == os.path.join(str(tmpdir), 'flowhub', 'journal')
+
+    def test_empty(self, journal):
+        assert journal.entries() == []
+
+    def test_record(self, journal):
+        journal.record(PUSH, remote='origin', refspecs=['feature/a'])
+        journal.record(CLOSE_ISSUE, number=3)
+
+        entries = Journal(os.path.dirname(os.path.dirname(journal.path))).entries()
+        assert [e['op'] for e in entries] == [PUSH, CLOSE_ISSUE]
+        assert entries[1]['params'] == {'number': 3}
+
+    def test_replace(self, journal):
+        first = journal.record(PUSH, remote='origin', refspecs=['feature/a'])
+        journal.record(PUSH, remote='origin', refspecs=['feature/b'])
+
+        journal.replace([first])
+        assert journal.entries() == [first]
+
+        journal.clear()
+        assert journal.entries() == []
+
+
+class PlanTestCase(object):
+    def test_one_push_per_remote(self):
+        batches = plan([
+            entry(PUSH, remote='origin', refspecs=['feature/a'], set_upstream=True),
+            entry(PUSH, remote='canon', refspecs=['master', 'develop'], tags=True),
+            entry(PUSH, remote='origin', refspecs=['feature/b'], set_upstream=True),
+            entry(PUSH, remote='origin', refspecs=['feature/a'], set_upstream=True),
+        ])
+
+        assert [b.kind for b in batches] == [PUSH, PUSH]
+        origin, canon = batches
+        assert origin.params == {
+            'remote': 'origin',
+            'refspecs': ['feature/b', 'feature/a'],
+            'set_upstream': True,
+            'tags': False,
+        }
+        assert len(origin.entries) == 3
+        assert canon.params['refspecs'] == ['master', 'develop']
+        assert canon.params['tags']
+
+    def test_delete_supersedes_push(self):
+        batches = plan([
+            entry(PUSH, remote='origin', refspecs=['feature/a'], set_upstream=True),
+            entry(PULL_REQUEST, base='develop', head='feature/a'),
+            entry(PUSH, remote='origin', refspecs=['feature/a'], delete=True, force=True),
+        ])
+
+        assert [b.kind for b in batches] == [PUSH]
+        assert batches[0].params['refspecs'] == [':feature/a']
+
+    def test_force_push(self):
+        batches = plan([
+            entry(PUSH, remote='origin', refspecs=['feature/a'], force=True),
+        ])
+
+        assert batches[0].params['refspecs'] == ['+feature/a']
+
+    def test_deduplicates_github_operations(self):
+        batches = plan([
+            entry(PULL_REQUEST, base='develop', head='feature/a'),
+            entry(CLOSE_ISSUE, number=4),
+            entry(OPEN_ISSUE, title='t', body='b', labels=[]),
+            entry(PULL_REQUEST, base='develop', head='feature/a'),
+            entry(CLOSE_ISSUE, number=4),
+            entry(OPEN_ISSUE, title='t', body='b', labels=['bug']),
+        ])
+
+        assert [b.kind for b in batches] == [PULL_REQUEST, OPEN_ISSUE, CLOSE_ISSUE]
+        assert batches[1].params['labels'] == ['bug']
+        assert all(len(b.entries) == 2 for b in batches)
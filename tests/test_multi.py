@@ -0,0 +1,100 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import multiprocessing
+import os
+
+import pytest
+
+from flowhub import multi
+from flowhub.multi import RepoResult, read_manifest, report, run_in_repo
+
+
+@pytest.yield_fixture
+def budget():
+    budget = multiprocessing.Value('i', -1)
+    multi._worker.update(budget=budget, sessions={})
+    yield budget
+    multi._worker.clear()
+
+
+def stats(requests, rate_remaining=None):
+    return {'requests': requests, 'rate_remaining': rate_remaining}
+
+
+class ManifestTestCase(object):
+    def test_read(self, tmpdir):
+        manifest = tmpdir.join('repos')
+        manifest.write("\n".join([
+            "# services",
+            "api",
+            "",
+            "  web  ",
+            "/srv/worker: api web",
+            "api",
+        ]))
+
+        assert read_manifest(str(manifest)) == [
+            ('api', os.path.join(str(tmpdir), 'api'), []),
+            ('web', os.path.join(str(tmpdir), 'web'), []),
+            ('/srv/worker', '/srv/worker', ['api', 'web']),
+        ]
+
+
+class BudgetTestCase(object):
+    def test_learns_from_github(self, budget):
+        multi._spend(budget, stats(3, rate_remaining=4000))
+
+        assert budget.value == 4000
+
+    def test_counts_down(self, budget):
+        budget.value = 4000
+        multi._spend(budget, stats(3, rate_remaining=4500))
+
+        assert budget.value == 3997
+
+    def test_skips_when_used_up(self, budget):
+        budget.value = multi.RESERVE
+
+        result = run_in_repo(('api', '/nonexistent', ['feature', 'list']))
+
+        assert not result.ok
+        assert 'budget' in result.error
+
+
+class ReportTestCase(object):
+    def test_report(self):
+        output = report(['feature', 'list'], [
+            RepoResult('api', True, None, "the-feature\n", stats(2, 4998)),
+            RepoResult('web', False, "GitCommandError: boom", "", stats(1, 4990)),
+        ])
+
+        assert output.splitlines() == [
+            "`flowhub feature list` in 2 repositories: 1 succeeded, 1 failed",
+            "",
+            "api",
+            "    the-feature",
+            "",
+            "web: FAILED",
+            "    GitCommandError: boom",
+            "",
+            "GitHub requests: 3; rate limit remaining: 4990",
+        ]
@@ -0,0 +1,91 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import json
+import pstats
+import threading
+
+from flowhub.profiling import PROFILE_PATH, Profile, profile_option, trace_path
+
+
+class Worker(object):
+    def outer(self):
+        return self.inner() + 1
+
+    def inner(self):
+        return 1
+
+
+class Specialist(Worker):
+    def inner(self):
+        return 2
+
+
+class ProfileOptionTestCase(object):
+    def test_without(self):
+        assert profile_option(['feature', 'list']) == (['feature', 'list'], None)
+
+    def test_default_path(self):
+        assert profile_option(['--profile', 'feature', 'list']) == \
+            (['feature', 'list'], PROFILE_PATH)
+
+    def test_path(self):
+        assert profile_option(['-v', '3', '--profile=/tmp/slow.prof', 'release', 'publish']) == \
+            (['-v', '3', 'release', 'publish'], '/tmp/slow.prof')
+
+    def test_trace_path(self):
+        assert trace_path('/tmp/slow.prof') == '/tmp/slow.trace.json'
+
+
+class ProfileTestCase(object):
+    def test_spans(self, tmpdir):
+        path = str(tmpdir.join('run.prof'))
+
+        with Profile(path, classes=[Worker, Specialist]):
+            Worker().outer()
+            thread = threading.Thread(target=Specialist().outer, name='helper')
+            thread.start()
+            thread.join()
+
+        with open(trace_path(path)) as f:
+            trace = json.load(f)
+        spans = [e for e in trace['traceEvents'] if e['ph'] == 'X']
+        assert [e['name'] for e in spans] == [
+            'flowhub',
+            'Worker.outer', 'Worker.inner',
+            'Specialist.outer', 'Specialist.inner',
+        ]
+        outer, inner = spans[1:3]
+        assert outer['ts'] <= inner['ts']
+        assert inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur']
+        assert spans[3]['tid'] != spans[1]['tid']
+        threads = [e['args']['name'] for e in trace['traceEvents'] if e['ph'] == 'M']
+        assert sorted(threads) == ['MainThread', 'helper']
+
+        assert 'outer' in {name for _, _, name in pstats.Stats(path).stats}
+
+    def test_restores(self, tmpdir):
+        inner = Worker.__dict__['inner']
+
+        with Profile(str(tmpdir.join('run.prof')), classes=[Worker]):
+            assert Worker.__dict__['inner'] is not inner
+
+        assert Worker.__dict__['inner'] is inner
@@ -0,0 +1,92 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+from StringIO import StringIO
+
+from flowhub.progress import TransferProgress, parse_size, terminal
+
+
+class Terminal(StringIO):
+    def isatty(self):
+        return True
+
+
+def feed(progress, *lines):
+    handler = progress.new_message_handler()
+    for line in lines:
+        handler(line)
+    return progress
+
+
+class ParseSizeTestCase(object):
+    def test_units(self):
+        assert parse_size("245 bytes | 245.00 KiB/s") == 245
+        assert parse_size("1.50 KiB | 2.00 MiB/s") == 1536
+        assert parse_size("2.00 MiB") == 2 << 20
+
+    def test_no_size(self):
+        assert parse_size("") is None
+        assert parse_size(None) is None
+
+
+class TransferProgressTestCase(object):
+    def test_receiving(self):
+        progress = feed(
+            TransferProgress('fetch', 'canon'),
+            "remote: Counting objects: 100% (12/12), done.\n",
+            "Receiving objects:  50% (6/12), 1.00 KiB | 1.00 MiB/s\r"
+            "Receiving objects: 100% (12/12), 2.50 KiB | 1.00 MiB/s, done.\n",
+            "Resolving deltas: 100% (3/3), done.\n",
+        )
+
+        assert (progress.objects, progress.bytes) == (12, 2560)
+
+    def test_writing(self):
+        progress = feed(
+            TransferProgress('push', 'origin'),
+            "Writing objects: 100% (3/3), 245 bytes | 245.00 KiB/s, done.\n",
+            "To ../origin\n",
+        )
+
+        assert (progress.objects, progress.bytes) == (3, 245)
+        assert progress.other_lines == ["To ../origin"]
+
+    def test_unpacking(self):
+        progress = feed(
+            TransferProgress('fetch', 'canon'),
+            "Unpacking objects:  33% (1/3)\rUnpacking objects: 100% (3/3), 210 bytes | 70.00 KiB/s, done.\n",
+        )
+
+        assert (progress.objects, progress.bytes) == (3, 210)
+
+    def test_drawn_on_a_terminal(self):
+        stream = Terminal()
+        progress = feed(
+            TransferProgress('push', 'origin', stream=terminal(stream)),
+            "Writing objects: 100% (3/3), 1.50 KiB | 1.50 MiB/s, done.\n",
+        ).finish()
+
+        assert stream.getvalue().startswith("\rpush origin: 3 objects, 1.50 KiB, ")
+        assert stream.getvalue().endswith("s\n")
+        assert progress.seconds >= 0
+
+    def test_not_drawn_otherwise(self):
+        assert terminal(StringIO()) is None
@@ -0,0 +1,75 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import pytest
+
+from flowhub.managers import TagInfo
+from flowhub.publish_log import PublishLog
+
+
+@pytest.fixture
+def log(tmpdir):
+    return PublishLog(str(tmpdir), 'release/1.0')
+
+
+class PublishLogTestCase(object):
+    def test_not_started(self, log):
+        assert not log.started
+        assert log.tag_info is None
+        assert log.last_step is None
+        assert not log.done('fetch')
+
+    def test_begin(self, log):
+        log.begin(TagInfo("1.0", "The first"))
+
+        assert log.started
+        assert log.path.endswith('flowhub/publish/release/1.0')
+        assert TagInfo(*log.tag_info) == TagInfo("1.0", "The first")
+        assert log.last_step is None
+
+    def test_begin_again_starts_over(self, log):
+        log.begin(None)
+        log.complete('fetch')
+
+        log.begin(None)
+
+        assert not log.done('fetch')
+        assert log.tag_info is None
+
+    def test_done_checks_what_was_left_behind(self, log):
+        log.begin(None)
+        log.complete('fetch')
+        log.complete('merge-master', sha='abc123')
+
+        assert log.done('fetch')
+        assert log.done('merge-master', sha='abc123')
+        assert not log.done('merge-master', sha='def456')
+        assert not log.done('tag')
+        assert log.last_step == 'merge-master'
+
+    def test_finish(self, log):
+        log.begin(None)
+        log.complete('fetch')
+
+        log.finish()
+
+        assert not log.started
+        assert not log.done('fetch')
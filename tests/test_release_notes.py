@@ -0,0 +1,72 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import os
+
+import pytest
+
+from flowhub.release_notes import NotesCache, render
+
+
+PULLS = [
+    {'number': 12, 'title': 'Fix login', 'url': 'u', 'author': 'suzy'},
+    {'number': 15, 'title': 'New header', 'url': 'u', 'author': None},
+]
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return NotesCache(str(tmpdir))
+
+
+class NotesCacheTestCase(object):
+    def test_miss(self, cache):
+        assert cache.get('1.0', 'abc') is None
+
+    def test_put_and_get(self, cache):
+        cache.put('1.0', 'abc', PULLS)
+
+        assert cache.get('1.0', 'abc') == PULLS
+        assert cache.get('1.0', 'def') is None
+        assert cache.get('0.9', 'abc') is None
+
+    def test_awkward_tag_names(self, cache, tmpdir):
+        cache.put('releases/1.0', 'abc', [])
+
+        assert cache.get('releases/1.0', 'abc') == []
+        assert os.listdir(str(tmpdir.join('flowhub', 'release-notes'))) == ['releases_1.0..abc.json']
+
+    def test_from_the_start(self, cache):
+        cache.put(None, 'abc', PULLS)
+
+        assert cache.get(None, 'abc') == PULLS
+
+
+class RenderTestCase(object):
+    def test_render(self):
+        assert render(PULLS, '1.0') == "\n".join([
+            "Pull-requests merged since 1.0:",
+            " - #12 Fix login (@suzy)",
+            " - #15 New header",
+        ])
+
+    def test_nothing_merged(self):
+        assert render([], '1.0') == ""
@@ -0,0 +1,77 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import os
+import subprocess
+
+import pytest
+
+import repo_factory
+
+
+def git(path, *args):
+    return subprocess.check_output(('git',) + args, cwd=path).strip()
+
+
+class RepoFactoryTestCase(object):
+    def test_build(self, tmpdir):
+        path = repo_factory.build(str(tmpdir.join('repo.git')), repo_factory.spec(
+            commits=50, files=7, features=6, merged=2, releases=1, hotfixes=2, tags=4,
+        ))
+
+        heads = git(path, 'for-each-ref', '--format=%(refname:short)', 'refs/heads').splitlines()
+        assert sorted(heads) == [
+            'develop', 'feature/f0', 'feature/f1', 'feature/f2', 'feature/f3',
+            'feature/f4', 'feature/f5', 'hotfix/h0', 'hotfix/h1', 'master', 'release/r0',
+        ]
+        assert git(path, 'tag').splitlines() == ['0.1.0', '0.2.0', '0.3.0', '0.4.0']
+        assert git(path, 'ls-tree', '--name-only', 'develop').splitlines() == \
+            ['file-{}.txt'.format(n) for n in range(7)]
+        assert git(path, 'rev-list', '--count', '--first-parent', 'develop') == '50'
+
+        merged = git(path, 'branch', '--merged', 'develop', '--format=%(refname:short)').split()
+        assert sorted(b for b in merged if b.startswith('feature/')) == ['feature/f4', 'feature/f5']
+        assert git(path, 'rev-list', '--count', '--merges', 'develop') == '2'
+        assert git(path, 'merge-base', '--is-ancestor', 'master', 'develop') == ''
+        assert git(path, 'merge-base', '--is-ancestor', '0.4.0', 'master') == ''
+
+        assert os.path.exists(os.path.join(path, 'packed-refs'))
+        assert not os.listdir(os.path.join(path, 'refs', 'heads'))
+        assert os.path.exists(os.path.join(path, 'objects', 'info', 'commit-graph'))
+
+    def test_cached(self, tmpdir):
+        cache_dir = str(tmpdir.join('cache'))
+        spec = repo_factory.spec(commits=5, features=1)
+
+        path = repo_factory.cached(cache_dir, spec)
+        stamp = os.stat(os.path.join(path, 'packed-refs')).st_mtime
+
+        assert repo_factory.cached(cache_dir, spec) == path
+        assert os.stat(os.path.join(path, 'packed-refs')).st_mtime == stamp
+        assert repo_factory.cached(cache_dir, spec._replace(features=2)) != path
+        assert sorted(os.listdir(cache_dir)) == sorted([
+            os.path.basename(path),
+            '{}.git'.format(repo_factory.key(spec._replace(features=2))),
+        ])
+
+    def test_too_many_merged(self):
+        with pytest.raises(ValueError):
+            repo_factory.spec(features=1, merged=2)
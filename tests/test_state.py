@@ -0,0 +1,86 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import os
+import subprocess
+
+import pytest
+
+from flowhub.state import RELEASE, State, refs_stamp
+
+
+@pytest.fixture
+def state(tmpdir):
+    return State(str(tmpdir))
+
+
+class StateTestCase(object):
+    def test_nothing_recorded(self, state):
+        assert state.get(RELEASE) is None
+
+    def test_start(self, state):
+        state.start(RELEASE, 'release/1.0', 'abc123')
+
+        recorded = State(os.path.dirname(os.path.dirname(state.path))).get(RELEASE)
+        assert recorded['name'] == 'release/1.0'
+        assert recorded['base'] == 'abc123'
+        assert recorded['started_at'] > 0
+
+    def test_finish(self, state):
+        state.start(RELEASE, 'release/1.0', 'abc123')
+
+        state.finish(RELEASE, 'release/0.9')
+        assert state.get(RELEASE)['name'] == 'release/1.0'
+
+        state.finish(RELEASE, 'release/1.0')
+        assert state.get(RELEASE) is None
+
+    def test_failed_update_changes_nothing(self, state):
+        state.start(RELEASE, 'release/1.0', 'abc123')
+
+        with pytest.raises(RuntimeError):
+            with state.update() as current:
+                del current[RELEASE]
+                raise RuntimeError()
+
+        assert state.get(RELEASE)['name'] == 'release/1.0'
+
+
+class RefsStampTestCase(object):
+    def test_changes_with_branches(self, tmpdir):
+        path = str(tmpdir)
+        for args in (['init', '-q'], ['commit', '-q', '--allow-empty', '-m', 'Initial']):
+            subprocess.check_call(
+                ['git', '-c', 'user.name=Suzy', '-c', 'user.email=suzy@example.com'] + args,
+                cwd=path,
+            )
+        git_dir = os.path.join(path, '.git')
+        before = refs_stamp(git_dir, 'release/')
+
+        os.utime(git_dir, None)
+        assert refs_stamp(git_dir, 'release/') == before
+
+        subprocess.check_call(['git', 'branch', 'release/1.0'], cwd=path)
+        created = refs_stamp(git_dir, 'release/')
+        assert created != before
+
+        subprocess.check_call(['git', 'branch', '-q', '-D', 'release/1.0'], cwd=path)
+        assert refs_stamp(git_dir, 'release/') != created
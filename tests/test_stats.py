@@ -0,0 +1,153 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import textwrap
+
+from github import Github
+import pytest
+
+from fakegithub import FakeGitHub
+from flowhub.stats import RequestStats, endpoint
+
+
+def define(module, source):
+    namespace = {'__name__': module}
+    exec textwrap.dedent(source) in namespace
+    return namespace
+
+
+@pytest.fixture
+def stats():
+    return RequestStats()
+
+
+@pytest.yield_fixture
+def github():
+    server = FakeGitHub(per_page=2).start()
+    server.add_repo('suzy/the_repo')
+    yield server
+    server.stop()
+
+
+class EndpointTestCase(object):
+    def test_repo_paths(self):
+        assert endpoint('/repos/suzy/the_repo/pulls/12?page=2') == '/repos/:owner/:repo/pulls/:number'
+
+    def test_labels(self):
+        assert endpoint('/repos/suzy/the_repo/labels/bug') == '/repos/:owner/:repo/labels/:name'
+
+    def test_prefix(self):
+        assert endpoint('/api/v3/users/suzy', prefix='/api/v3') == '/users/:user'
+
+
+class RequestStatsTestCase(object):
+    def test_record(self, stats):
+        stats.record('GET', '/repos/a/b/pulls', 200, '[{}]', 0.25,
+                     headers={'x-ratelimit-remaining': '4999'})
+        stats.record('GET', '/repos/a/b', 200, '{}', 0.25)
+
+        totals = stats.totals()
+        assert (totals.requests, totals.pages, totals.bytes) == (2, 1, 6)
+        assert stats.rate_remaining == 4999
+        assert [name for name, _ in stats.by_endpoint()] == [
+            'GET /repos/:owner/:repo',
+            'GET /repos/:owner/:repo/pulls',
+        ]
+
+    def test_charged_to_outermost_manager_method(self, stats):
+        managers = define('flowhub.managers.fake', """
+            class FakeManager(object):
+                def add_to_pull(self, stats):
+                    return self.helper(stats)
+
+                def helper(self, stats):
+                    return stats.record('GET', '/user', 200, '{}', 0)
+        """)
+        engine = define('flowhub.engine', """
+            class Engine(object):
+                def publish(self, manager, stats):
+                    return manager.add_to_pull(stats)
+        """)
+
+        call = engine['Engine']().publish(managers['FakeManager'](), stats)
+
+        assert call.caller == 'FakeManager.add_to_pull'
+
+    def test_charged_to_engine(self, stats):
+        engine = define('flowhub.engine', """
+            class Engine(object):
+                def __init__(self, stats):
+                    self.call = stats.record('GET', '/user', 200, '{}', 0)
+        """)
+
+        assert engine['Engine'](stats).call.caller == 'Engine.__init__'
+
+    def test_instrument(self, stats, github):
+        for n in range(3):
+            github.add_pull('suzy/the_repo', 'feature/{}'.format(n), 'develop')
+        gh = stats.instrument(Github('token', base_url=github.url))
+
+        gh.get_user().login
+        list(gh.get_repo('suzy/the_repo').get_pulls())
+
+        assert stats.totals().requests == len(github.requests) == 4
+        assert stats.totals().pages == 2
+        assert dict(
+            (name, totals.requests) for name, totals in stats.by_endpoint()
+        ) == {
+            'GET /user': 1,
+            'GET /repos/:owner/:repo': 1,
+            'GET /repos/:owner/:repo/pulls': 2,
+        }
+        assert stats.rate_remaining == FakeGitHub.RATE_LIMIT - 4
+
+    def test_report(self, stats):
+        stats.record('POST', '/repos/a/b/pulls', 201, '{}', 0.5)
+
+        report = stats.report()
+        assert report.startswith('GitHub requests: 1 (0 pages, 2 bytes')
+        assert 'POST /repos/:owner/:repo/pulls' in report
+
+    def test_as_dict(self, stats):
+        stats.record('POST', '/repos/a/b/pulls', 201, '{}', 0.5)
+
+        result = stats.as_dict()
+        assert result['requests'] == 1
+        assert result['endpoints']['POST /repos/:owner/:repo/pulls']['seconds'] == 0.5
+        assert list(result['callers']) == ['(unknown)']
+
+    def test_transfers(self, stats):
+        manager = define('flowhub.managers.release', """
+            class ReleaseManager(object):
+                def publish(self, stats):
+                    return stats.record_transfer('push', 'canon', 12, 2048, 1.5)
+        """)
+        manager['ReleaseManager']().publish(stats)
+
+        assert stats.as_dict()['transfers'] == [{
+            'operation': 'push',
+            'remote': 'canon',
+            'caller': 'ReleaseManager.publish',
+            'objects': 12,
+            'bytes': 2048,
+            'seconds': 1.5,
+        }]
+        assert '      12      2048    1.500  push canon (ReleaseManager.publish)' in stats.report()
@@ -0,0 +1,102 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import subprocess
+
+import git
+import mock
+import pytest
+
+import repo_factory
+from flowhub.status import BranchStatus, age, branch_status, format_status
+
+
+@pytest.fixture(scope='module')
+def repo(tmpdir_factory):
+    path = str(tmpdir_factory.mktemp('status').join('repo.git'))
+    repo_factory.build(path, repo_factory.spec(
+        commits=40, files=3, features=8, merged=3, releases=1, hotfixes=1, tags=2,
+    ))
+    repo = git.Repo(path)
+    # a branch from a merged feature's side of develop, and one from nowhere
+    repo.git.branch('feature/side', 'feature/f7')
+    repo.git.branch('feature/same', 'develop')
+    return repo
+
+
+def counted(repo, base, branch):
+    output = subprocess.check_output(
+        ['git', 'rev-list', '--count', '--left-right', '{}...{}'.format(branch, base)],
+        cwd=repo.git_dir,
+    )
+    return tuple(int(n) for n in output.split())
+
+
+class BranchStatusTestCase(object):
+    def test_matches_rev_list(self, repo):
+        statuses = branch_status(repo, [
+            ('feature/', 'develop'), ('release/', 'develop'), ('hotfix/', 'master'),
+        ])
+
+        assert len(statuses) == 12
+        for s in statuses:
+            assert (s.ahead, s.behind) == counted(repo, s.base, s.name), s.name
+
+    def test_bases(self, repo):
+        statuses = dict((s.name, s) for s in branch_status(repo, [
+            ('release/', 'develop'), ('hotfix/', 'master'),
+        ]))
+
+        assert sorted(statuses) == ['hotfix/h0', 'release/r0']
+        assert statuses['hotfix/h0'].base == 'master'
+        assert (statuses['release/r0'].ahead, statuses['release/r0'].behind) == (1, 0)
+        assert statuses['hotfix/h0'].upstream is None
+
+    def test_one_walk(self, repo):
+        execute = git.cmd.Git.execute
+        with mock.patch.object(git.cmd.Git, 'execute', autospec=True, side_effect=execute) as calls:
+            branch_status(repo, [('feature/', 'develop'), ('hotfix/', 'master')])
+
+        assert [c[0][1][1] for c in calls.call_args_list] == ['for-each-ref', 'rev-list']
+
+    def test_nothing(self, repo):
+        assert branch_status(repo, [('bugfix/', 'develop')]) == []
+        assert branch_status(repo, [('feature/', 'no-such-base')]) == []
+
+
+class FormatTestCase(object):
+    def test_age(self):
+        assert age(30) == "just now"
+        assert age(60) == "1 minute"
+        assert age(3 * 3600 + 5) == "3 hours"
+        assert age(15 * 86400) == "2 weeks"
+
+    def test_format(self):
+        output = format_status([
+            BranchStatus('feature/long-name', 'develop', 2, 5, 'origin/feature/long-name',
+                         'ahead 1', 1000, True),
+            BranchStatus('hotfix/1.0.1', 'master', 1, 0, None, '', 1000 - 86400, False),
+        ], now=1000 + 7200)
+
+        assert output.splitlines() == [
+            "* feature/long-name      +2     -5 develop   2 hours     origin/feature/long-name [ahead 1]",
+            "  hotfix/1.0.1           +1     -0 master    1 day       (not pushed)",
+        ]
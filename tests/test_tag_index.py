@@ -0,0 +1,117 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import subprocess
+
+import git
+import mock
+import pytest
+
+from flowhub.tag_index import TagIndex, version_key
+
+
+@pytest.fixture
+def repo(tmpdir):
+    path = str(tmpdir)
+
+    def run(*args):
+        subprocess.check_output(('git',) + args, cwd=path, stderr=subprocess.STDOUT)
+
+    run('init', '-q')
+    run('config', 'user.name', 'Suzy')
+    run('config', 'user.email', 'suzy@example.com')
+    run('commit', '-q', '--allow-empty', '-m', 'Initial')
+    for tag in ('0.9', '1.0', '1.1.0-rc1', '1.1.0', '1.1.1', '1.2.0-rc1', 'v1.0.5', 'nightly'):
+        run('tag', tag)
+    run('pack-refs', '--all')
+    repo = git.Repo(path)
+    repo.run = run
+    return repo
+
+
+class VersionKeyTestCase(object):
+    def test_order(self):
+        tags = ['1.10.0', '1.2', '1.2.1', '1.2.1-rc1', 'v0.9', '2.0.0-beta']
+        assert sorted(tags, key=version_key) == [
+            'v0.9', '1.2', '1.2.1-rc1', '1.2.1', '1.10.0', '2.0.0-beta',
+        ]
+
+    def test_not_a_version(self):
+        assert version_key('nightly') is None
+        assert version_key('1') is None
+
+
+class TagIndexTestCase(object):
+    def test_versions(self, repo):
+        index = TagIndex(repo)
+
+        assert index.versions == [
+            '0.9', '1.0', 'v1.0.5', '1.1.0-rc1', '1.1.0', '1.1.1', '1.2.0-rc1',
+        ]
+        assert index.exists('nightly')
+
+    def test_latest(self, repo):
+        index = TagIndex(repo)
+
+        assert index.latest() == '1.1.1'
+        assert index.latest(1, 0) == 'v1.0.5'
+        assert index.latest(0) == '0.9'
+        assert index.latest(1, 2) is None
+        assert index.latest(3) is None
+
+    def test_suggest(self, repo):
+        index = TagIndex(repo)
+
+        assert index.suggestions() == [
+            ('major', '2.0.0'), ('minor', '1.2.0'), ('patch', '1.1.2'),
+        ]
+        assert index.suggest('patch', base='1.0') == '1.0.6'
+        assert index.suggest('minor', base='0.9') == '0.10'
+
+    def test_suggest_without_versions(self, tmpdir):
+        subprocess.check_call(['git', 'init', '-q', str(tmpdir)])
+        index = TagIndex(git.Repo(str(tmpdir)))
+
+        assert index.suggestions() == [
+            ('major', '1.0.0'), ('minor', '0.1.0'), ('patch', '0.0.1'),
+        ]
+
+    def test_taken(self, repo):
+        index = TagIndex(repo)
+
+        assert index.taken('1.1.1')
+        assert index.taken('1.0.0')  # same version as 1.0
+        assert not index.taken('1.2.0')
+        assert not index.taken('release-candidate')
+
+    def test_cached_until_tags_change(self, repo):
+        TagIndex(repo)
+        with mock.patch.object(git.cmd.Git, 'for_each_ref', create=True) as for_each_ref, \
+                mock.patch('flowhub.tag_index.version_key') as version_key:
+            index = TagIndex(repo)
+            assert index.latest() == '1.1.1'
+            assert index.taken('1.1.1')
+        assert for_each_ref.call_count == 0
+        assert version_key.call_count == 0
+
+        repo.run('tag', '1.2.0')
+
+        assert TagIndex(repo).latest() == '1.2.0'
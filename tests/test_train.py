@@ -0,0 +1,78 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import pytest
+
+from flowhub.configurator import ImproperlyConfigured
+from flowhub.multi import RepoResult
+from flowhub.train import check_dependencies, publish_in_order
+
+
+def manifest(**depends_on):
+    return [(name, '/srv/' + name, deps) for name, deps in sorted(depends_on.items())]
+
+
+class CheckDependenciesTestCase(object):
+    def test_ok(self):
+        check_dependencies(manifest(api=[], models=[], web=['api', 'models']))
+
+    def test_unknown(self):
+        with pytest.raises(ImproperlyConfigured) as e:
+            check_dependencies(manifest(web=['api']))
+        assert 'web depends on api' in str(e.value)
+
+    def test_cycle(self):
+        with pytest.raises(ImproperlyConfigured) as e:
+            check_dependencies(manifest(api=['web'], models=[], web=['api']))
+        assert str(e.value) == 'dependency cycle between api, web'
+
+
+class PublishInOrderTestCase(object):
+    def run(self, repos, failing=()):
+        started = []
+
+        def submit(name, done):
+            started.append(name)
+            done(RepoResult(name, name not in failing, None, '', None))
+
+        return started, publish_in_order(repos, submit)
+
+    def test_dependencies_first(self):
+        repos = manifest(web=['api', 'models'], api=['models'], models=[], docs=[])
+
+        started, results = self.run(repos)
+
+        # the independent ones go together
+        assert sorted(started[:2]) == ['docs', 'models']
+        assert started[2:] == ['api', 'web']
+        assert [r.name for r in results] == ['api', 'docs', 'models', 'web']
+        assert all(r.ok for r in results)
+
+    def test_failure_stops_dependents(self):
+        repos = manifest(web=['api'], api=['models'], models=[], docs=[])
+
+        started, results = self.run(repos, failing=['models'])
+
+        assert sorted(started) == ['docs', 'models']
+        results = dict((r.name, r) for r in results)
+        assert results['docs'].ok
+        assert results['api'].error == "not published, since models wasn't"
+        assert results['web'].error == "not published, since api wasn't"
@@ -0,0 +1,152 @@
+"""
+Copyright (C) 2012 Haak Saxberg
+
+This file is part of Flowhub, a command-line tool to enable various
+Git-based workflows that interacts with GitHub.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+import os
+import subprocess
+import sys
+from StringIO import StringIO
+
+import git
+import mock
+
+from flowhub import core
+
+
+CANON = 'canon-org/the_repo'
+ORIGIN = 'suzy/the_repo'
+
+
+class Workspace(object):
+    """A flowhub-initialized clone of a real repository.
+
+    canon.git and origin.git are bare repositories standing in for the
+    organization's repository and the user's fork; GitHub is a FakeGitHub.
+    """
+
+    def __init__(self, root, github):
+        self.root = root
+        self.github = github
+        self.path = os.path.join(root, 'work')
+        self.canon_path = os.path.join(root, 'canon.git')
+        self.origin_path = os.path.join(root, 'origin.git')
+        self.canon_repo = CANON
+        self.origin_repo = ORIGIN
+        self.git_calls = []
+
+    def git(self, *args, **kwargs):
+        return subprocess.check_output(
+            ('git',) + args,
+            cwd=kwargs.get('cwd', self.path),
+            stderr=subprocess.STDOUT,
+        ).strip()
+
+    def setup(self):
+        self.git('init', '-q', '--bare', self.canon_path, cwd=self.root)
+        self.git('init', '-q', '-b', 'master', self.path, cwd=self.root)
+        self.git('config', 'user.name', 'Suzy')
+        self.git('config', 'user.email', 'suzy@example.com')
+        self.commit('Initial commit')
+        self.git('branch', 'develop')
+
+        self.git('remote', 'add', 'canon', self.canon_path)
+        self.git('push', '-q', 'canon', 'master', 'develop')
+        self.git('clone', '-q', '--bare', self.canon_path, self.origin_path, cwd=self.root)
+        self.git('remote', 'add', 'origin', self.origin_path)
+        self.git('fetch', '-q', '--all')
+        self.git('branch', '--set-upstream-to', 'canon/develop', 'develop')
+        return self.configure()
+
+    def configure(self):
+        """Points flowhub at the remotes, and the fake GitHub at the repositories."""
+        for key, value in [
+            ('flowhub.structure.name', 'the_repo'),
+            ('flowhub.structure.origin', 'origin'),
+            ('flowhub.structure.canon', 'canon'),
+            ('flowhub.structure.master', 'master'),
+            ('flowhub.structure.develop', 'develop'),
+            ('flowhub.prefix.feature', 'feature/'),
+            ('flowhub.prefix.release', 'release/'),
+            ('flowhub.prefix.hotfix', 'hotfix/'),
+            ('flowhub.auth.token', 'fake-token'),
+            ('flowhub.api.url', self.github.url),
+        ]:
+            self.git('config', key, value)
+
+        self.github.add_repo(CANON)
+        self.github.add_repo(ORIGIN, parent=CANON)
+        return self
+
+    def commit(self, message, filename=None):
+        filename = filename or 'file-{}.txt'.format(len(os.listdir(self.path)))
+        with open(os.path.join(self.path, filename), 'a') as f:
+            f.write(message + '\n')
+        self.git('add', filename)
+        self.git('commit', '-q', '-m', message)
+        return self.git('rev-parse', 'HEAD')
+
+    def branches(self, remote=None):
+        if remote is None:
+            refs = 'refs/heads'
+        else:
+            refs = 'refs/remotes/{}'.format(remote)
+        output = self.git('for-each-ref', '--format=%(refname)', refs)
+        return sorted(
+            line[len(refs) + 1:] for line in output.splitlines()
+            if not line.endswith('/HEAD')
+        )
+
+    def remote_branches(self, bare_path):
+        output = self.git('for-each-ref', '--format=%(refname:short)', 'refs/heads', cwd=bare_path)
+        return sorted(output.splitlines())
+
+    def tags(self, path=None):
+        return sorted(self.git('tag', cwd=path or self.path).splitlines())
+
+    def current_branch(self):
+        return self.git('rev-parse', '--abbrev-ref', 'HEAD')
+
+    def run(self, *argv, **kwargs):
+        """Runs `flowhub <argv>` in the workspace, answering prompts from input.
+
+        Returns everything flowhub printed. git processes started by flowhub
+        are recorded in git_calls.
+        """
+        stdin = StringIO(''.join('{}\n'.format(line) for line in kwargs.get('input', ())))
+        stdout = StringIO()
+        del self.git_calls[:]
+        execute = git.cmd.Git.execute
+
+        def counting_execute(git_self, command, *args, **kwargs):
+            self.git_calls.append(command)
+            return execute(git_self, command, *args, **kwargs)
+
+        cwd = os.getcwd()
+        os.chdir(self.path)
+        try:
+            with mock.patch.object(sys, 'argv', ['flowhub'] + list(argv)), \
+                    mock.patch.object(sys, 'stdin', stdin), \
+                    mock.patch.object(sys, 'stdout', stdout), \
+                    mock.patch.object(git.cmd.Git, 'execute', counting_execute):
+                core.run()
+        finally:
+            os.chdir(cwd)
+
+        return stdout.getvalue()